@@ -1,5 +1,5 @@
 import uvicorn
-from app.main import app
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=7860)
+    # Imported by uvicorn, so spawned worker processes do not load the app again
+    uvicorn.run("app.main:app", host="0.0.0.0", port=7860)
@@ -0,0 +1,143 @@
+# admission.py
+import asyncio
+import threading
+from collections import deque
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status."""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps the candidates being scored at once across all requests.
+
+    Each request is charged its candidate count. Large requests may only use
+    `capacity - reserve`, so the reserved share always remains for small
+    requests (at most `small_cost` candidates, e.g. `/match/`), which also
+    skip ahead of queued large requests. Large requests wait in FIFO order;
+    one larger than its share is charged the whole share and runs alone.
+
+    A request that cannot start immediately waits up to `queue_timeout`
+    seconds; it is rejected with 429 when `max_queue` requests are already
+    waiting and with 503 when the wait times out. Release may be called
+    from any thread (e.g. a streaming generator).
+    """
+
+    def __init__(
+        self, capacity, reserve=0, small_cost=1, max_queue=64, queue_timeout=1.0, retry_after=1
+    ):
+        self.capacity = capacity
+        self.reserve = min(reserve, capacity - 1) if capacity > 0 else 0
+        self.small_cost = small_cost
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.rejected_busy = 0
+        self.rejected_timeout = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.capacity > 0
+
+    def _charge(self, cost, small):
+        if small:
+            return cost
+        return max(1, min(cost, self.capacity - self.reserve))
+
+    def _fits(self, charge, small):
+        limit = self.capacity if small else self.capacity - self.reserve
+        return self.in_flight + charge <= limit
+
+    def _grant(self, charge):
+        self.in_flight += charge
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.admitted += 1
+
+    async def acquire(self, cost):
+        """Wait for room for `cost` candidates; returns the charge to release."""
+        if not self.enabled:
+            return 0
+        small = cost <= self.small_cost
+        charge = self._charge(cost, small)
+
+        with self._lock:
+            # Small requests never queue behind large ones
+            if self._fits(charge, small) and (small or not self._waiters):
+                self._grant(charge)
+                return charge
+            if len(self._waiters) >= self.max_queue:
+                self.rejected_busy += 1
+                raise AdmissionRejected(429, "Too many queued requests", self.retry_after)
+            loop = asyncio.get_running_loop()
+            waiter = (charge, small, loop.create_future(), loop)
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter[2]), self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                # Still queued means not granted; otherwise it was granted
+                # just as the wait timed out
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    self.rejected_timeout += 1
+                    raise AdmissionRejected(503, "Server is saturated", self.retry_after)
+        except asyncio.CancelledError:
+            # The client went away: drop the place in the queue or the grant
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    self.in_flight -= charge
+                    self._wake()
+            raise
+        return charge
+
+    def release(self, charge):
+        """Return a charge and admit whichever waiters now fit, in order."""
+        if not charge:
+            return
+        with self._lock:
+            self.in_flight -= charge
+            self._wake()
+
+    def _wake(self):
+        blocked = False
+        for waiter in list(self._waiters):
+            charge, small, future, loop = waiter
+            # Keep FIFO order among large requests; small ones may pass
+            if (blocked and not small) or not self._fits(charge, small):
+                blocked = blocked or not small
+                continue
+            self._waiters.remove(waiter)
+            self._grant(charge)
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "reserve": self.reserve,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "queue_depth": len(self._waiters),
+                "admitted": self.admitted,
+                "rejected_busy": self.rejected_busy,
+                "rejected_timeout": self.rejected_timeout,
+            }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,51 @@
+# batching.py
+
+# Padded tokens allowed per encoder call: texts in the batch x the longest one
+TOKEN_BUDGET = 8192
+
+# Word pieces per whitespace word, used when the model has no tokenizer
+PIECES_PER_WORD = 1.3
+
+
+def token_lengths(model, texts):
+    """Token count of each text as the model sees it (after truncation)."""
+    max_length = getattr(model, "max_seq_length", None) or 512
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None:
+        try:
+            input_ids = tokenizer(
+                list(texts), add_special_tokens=True, truncation=True, max_length=max_length
+            )["input_ids"]
+            return [min(len(ids), max_length) for ids in input_ids]
+        except Exception:
+            pass
+    # Estimate from the word count, plus the two special tokens
+    return [min(int(len(text.split()) * PIECES_PER_WORD) + 2, max_length) for text in texts]
+
+
+def length_batches(lengths, batch_size=32, token_budget=TOKEN_BUDGET):
+    """Group text indices into batches of similar token length.
+
+    Indices are sorted longest first, so each batch pads to nearly the same
+    length. A batch is closed once it holds `batch_size` texts or the next
+    text would take its padded size (texts x longest length) past
+    `token_budget`; a text longer than the budget is batched alone. Short
+    texts therefore share large batches and long ones get small batches.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+    batches = []
+    current = []
+    longest = 0
+    for i in order:
+        if current and (
+            len(current) >= batch_size or longest * (len(current) + 1) > token_budget
+        ):
+            batches.append(current)
+            current = []
+        if not current:
+            # Sorted longest first, so the first text sets the padded length
+            longest = max(1, lengths[i])
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
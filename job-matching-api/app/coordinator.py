@@ -0,0 +1,309 @@
+# coordinator.py
+import asyncio
+import hashlib
+import logging
+import time
+
+import httpx
+
+from .ranking import TopK, paginate
+from .responses import dumps
+from .streaming import InvalidRecord
+
+
+def shard_for(profile_id, shards):
+    """Shard index owning a candidate id; stable across processes and restarts."""
+    digest = hashlib.sha1(str(profile_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+class ShardError(Exception):
+    """Raised when shards needed for a request failed or all rejected it.
+
+    `status_code` is 503 when shards did not answer, or the status the
+    shards rejected the request with.
+    """
+
+    def __init__(self, message, failed=(), status_code=503):
+        super().__init__(message)
+        self.failed = list(failed)
+        self.status_code = status_code
+
+
+def _rejection(response, failed):
+    """ShardError relaying a shard's 4xx response."""
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return ShardError(detail, failed, response.status_code)
+
+
+class Coordinator:
+    """Scatter-gather front for a candidate store partitioned across shard servers.
+
+    Each shard runs this same app. Candidates are assigned to a shard by a
+    hash of their id; jobs are small and stored on every shard, so any
+    shard can rank its candidates for a stored job. Queries are sent to all
+    shards in parallel over pooled keep-alive connections and their top-k
+    lists merged; a shard that errors or does not answer within `timeout`
+    is left out and the response is marked partial. Writes wait longer
+    (`write_timeout`) and fail when a shard they need does not answer.
+    """
+
+    def __init__(self, urls, timeout=2.0, write_timeout=60.0, connections=32):
+        self.urls = [url.rstrip("/") for url in urls]
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=connections * len(self.urls),
+                max_keepalive_connections=connections * len(self.urls),
+            ),
+            headers={"Accept": "application/json"},
+        )
+        self.requests = [0] * len(self.urls)
+        self.failures = [0] * len(self.urls)
+        self.seconds = [0.0] * len(self.urls)
+        self.partial = 0
+
+    def shard_for(self, profile_id):
+        return shard_for(profile_id, len(self.urls))
+
+    async def _call(self, shard, method, path, timeout, **kwargs):
+        """(shard, response) or (shard, None) when the shard did not answer."""
+        started = time.perf_counter()
+        self.requests[shard] += 1
+        try:
+            response = await self._client.request(
+                method, self.urls[shard] + path, timeout=timeout, **kwargs
+            )
+        except httpx.HTTPError as e:
+            self.failures[shard] += 1
+            logging.error(f"Shard {self.urls[shard]} failed on {method} {path}: {e!r}")
+            return shard, None
+        finally:
+            self.seconds[shard] += time.perf_counter() - started
+        if response.status_code >= 500:
+            self.failures[shard] += 1
+        return shard, response
+
+    async def _scatter(self, calls):
+        """Run (shard, method, path, timeout, kwargs) calls in parallel."""
+        return await asyncio.gather(
+            *(
+                self._call(shard, method, path, timeout, **kwargs)
+                for shard, method, path, timeout, kwargs in calls
+            )
+        )
+
+    async def write(self, method, path, profile_id=None, **kwargs):
+        """Send a write to the shard owning `profile_id`, or to every shard.
+
+        Returns the response of the owning shard, or when broadcast, the
+        first successful one.
+        """
+        shards = [self.shard_for(profile_id)] if profile_id is not None else range(len(self.urls))
+        answers = await self._scatter(
+            [(shard, method, path, self.write_timeout, kwargs) for shard in shards]
+        )
+        failed = [
+            self.urls[shard]
+            for shard, response in answers
+            if response is None or response.status_code >= 500
+        ]
+        if failed:
+            raise ShardError(f"{method} {path} failed on {len(failed)} shard(s)", failed)
+        responses = [response for _, response in answers]
+        return next((r for r in responses if r.status_code < 400), responses[0])
+
+    async def ingest(self, kind, records, offset=0):
+        """Forward a batch of profiles; candidates to their shards, jobs to all.
+
+        Returns (stored, rejected, [(row, error)]) with rows numbered like
+        the input; shards report only their first errors.
+        """
+        errors = []
+        rows = []
+        for i, record in enumerate(records):
+            if isinstance(record, InvalidRecord):
+                # Lines that could not be decoded are not forwarded
+                errors.append((offset + i, record.error))
+            elif kind == "candidates" and (not isinstance(record, dict) or record.get("id") is None):
+                errors.append((offset + i, "Stored profiles need an id"))
+            else:
+                rows.append(i)
+        if kind == "candidates":
+            parts = {}
+            for i in rows:
+                parts.setdefault(self.shard_for(records[i]["id"]), []).append(i)
+        else:
+            parts = {shard: rows for shard in range(len(self.urls))} if rows else {}
+        local_rejected = len(errors)
+
+        calls = [
+            (
+                shard,
+                "POST",
+                f"/ingest/{kind}/",
+                self.write_timeout,
+                {
+                    "content": b"".join(dumps(records[i]) + b"\n" for i in rows),
+                    "headers": {"Content-Type": "application/x-ndjson"},
+                },
+            )
+            for shard, rows in parts.items()
+        ]
+        answers = await self._scatter(calls)
+        failed = [
+            self.urls[shard]
+            for shard, response in answers
+            if response is None or response.status_code != 200
+        ]
+        if failed:
+            raise ShardError(f"Ingesting {kind} failed on {len(failed)} shard(s)", failed)
+
+        stored = []
+        rejected = []
+        seen = set()
+        for shard, response in answers:
+            body = response.json()
+            stored.append(body["stored"])
+            rejected.append(body["rejected"])
+            for error in body["errors"]:
+                # Jobs go to every shard, which all report the same rows
+                row = offset + parts[shard][error["row"]]
+                if row not in seen:
+                    seen.add(row)
+                    errors.append((row, error["error"]))
+        if kind == "candidates":
+            return sum(stored), local_rejected + sum(rejected), sorted(errors)
+        # Every shard holds every job, so count a job batch once
+        return min(stored, default=0), local_rejected + max(rejected, default=0), sorted(errors)
+
+    async def gather(self, method, path, **kwargs):
+        """Send a query to every shard; returns (bodies of shards that answered, failed urls).
+
+        Raises ShardError when no shard answered, or when every shard that
+        answered rejected the query (with the first rejection's status).
+        """
+        answers = await self._scatter(
+            [(shard, method, path, self.timeout, kwargs) for shard in range(len(self.urls))]
+        )
+        bodies = []
+        failed = []
+        rejected = None
+        for shard, response in answers:
+            if response is not None and response.status_code == 200:
+                bodies.append(response.json())
+                continue
+            failed.append(self.urls[shard])
+            if response is not None and response.status_code < 500 and rejected is None:
+                rejected = response
+        if not bodies:
+            if rejected is not None:
+                raise _rejection(rejected, failed)
+            raise ShardError(f"No shard answered {method} {path}", failed)
+        if failed:
+            self.partial += 1
+        return bodies, failed
+
+    async def top_candidates(self, method, path, top_k, **kwargs):
+        """Merge the per-shard top-k lists of a top-candidates query."""
+        bodies, failed = await self.gather(method, path, **kwargs)
+        ranking = TopK(top_k)
+        scanned = 0
+        for body in bodies:
+            scanned += body["total_candidates"]
+            for match in body["matches"]:
+                ranking.push(match["match_score"], match)
+        matches = [
+            dict(match, rank=rank) for rank, _, match in paginate(ranking.ranked())
+        ]
+        return {
+            "matches": matches,
+            "total_candidates": scanned,
+            "shards": {"answered": len(bodies), "failed": failed, "partial": bool(failed)},
+        }
+
+    async def match_matrix(self, job_ids, candidate_ids, weights=None):
+        """Scatter a match matrix by candidate shard and stitch the columns back."""
+        columns = {}
+        for j, candidate_id in enumerate(candidate_ids):
+            columns.setdefault(self.shard_for(candidate_id), []).append(j)
+        answers = await self._scatter(
+            [
+                (
+                    shard,
+                    "POST",
+                    "/match-matrix/",
+                    self.timeout,
+                    {
+                        "json": {
+                            "job_ids": job_ids,
+                            "candidate_ids": [candidate_ids[j] for j in js],
+                            "weights": weights,
+                        }
+                    },
+                )
+                for shard, js in columns.items()
+            ]
+        )
+
+        scores = [[None] * len(candidate_ids) for _ in job_ids]
+        missing_jobs = set(job_ids)
+        missing_candidates = []
+        unavailable = []
+        failed = []
+        rejected = None
+        answered = 0
+        for shard, response in answers:
+            js = columns[shard]
+            if response is None or response.status_code != 200:
+                failed.append(self.urls[shard])
+                unavailable.extend(candidate_ids[j] for j in js)
+                if response is not None and response.status_code < 500 and rejected is None:
+                    rejected = response
+                continue
+            answered += 1
+            body = response.json()
+            for i, row in enumerate(body["scores"]):
+                for j, score in zip(js, row):
+                    scores[i][j] = score
+            # A job counts as missing only if no shard that answered has it
+            missing_jobs &= set(body["missing_jobs"])
+            missing_candidates.extend(body["missing_candidates"])
+        if not answered:
+            if rejected is not None:
+                raise _rejection(rejected, failed)
+            raise ShardError("No shard answered the match matrix", failed)
+        if failed:
+            self.partial += 1
+        return {
+            "job_ids": job_ids,
+            "candidate_ids": candidate_ids,
+            "scores": scores,
+            "missing_jobs": [job_id for job_id in job_ids if job_id in missing_jobs],
+            "missing_candidates": missing_candidates,
+            "unavailable_candidates": unavailable,
+            "shards": {"answered": answered, "failed": failed, "partial": bool(failed)},
+        }
+
+    def stats(self):
+        return {
+            "partial_responses": self.partial,
+            "shards": [
+                {
+                    "url": url,
+                    "requests": requests,
+                    "failures": failures,
+                    "mean_ms": round(1000 * seconds / requests, 2) if requests else 0.0,
+                }
+                for url, requests, failures, seconds in zip(
+                    self.urls, self.requests, self.failures, self.seconds
+                )
+            ],
+        }
+
+    async def close(self):
+        await self._client.aclose()
@@ -0,0 +1,140 @@
+# deadlines.py
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+# Stop scoring this long before the deadline, leaving time to send the response
+DEADLINE_MARGIN_MS = 50
+
+# Weight of the latest micro-batch in the per-candidate cost estimate
+COST_SMOOTHING = 0.5
+
+# Client supplied time budget, in milliseconds
+DEADLINE_HEADER = "x-deadline-ms"
+
+
+class Deadline:
+    """A time budget for one request, measured from when it was created."""
+
+    def __init__(self, budget_ms, margin_ms=DEADLINE_MARGIN_MS):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.expires = self.started + budget_ms / 1000
+        self.margin = margin_ms / 1000
+
+    def remaining(self):
+        """Seconds left for work, excluding the response margin."""
+        return self.expires - self.margin - time.perf_counter()
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+
+def parse_deadline(header_value=None, deadline_ms=None):
+    """Build a Deadline from the query parameter or header (None if neither).
+
+    Raises ValueError for budgets that are not positive numbers.
+    """
+    value = deadline_ms if deadline_ms is not None else header_value
+    if value is None or value == "":
+        return None
+    budget_ms = float(value)
+    if budget_ms <= 0:
+        raise ValueError("deadline must be a positive number of milliseconds")
+    return Deadline(budget_ms)
+
+
+class CostEstimator:
+    """Smoothed seconds-per-candidate, tracked separately for each engine."""
+
+    def __init__(self):
+        self._per_candidate = {}
+
+    def observe(self, engine, candidates, seconds):
+        latest = seconds / max(1, candidates)
+        previous = self._per_candidate.get(engine)
+        if previous is not None:
+            latest = COST_SMOOTHING * latest + (1 - COST_SMOOTHING) * previous
+        self._per_candidate[engine] = latest
+
+    def estimate(self, engine, candidates):
+        """Expected seconds to score `candidates` (None before any observation)."""
+        per_candidate = self._per_candidate.get(engine)
+        return None if per_candidate is None else per_candidate * candidates
+
+
+async def score_within_deadline(
+    matcher,
+    prepared_job,
+    candidates,
+    deadline,
+    batch_size=32,
+    include_skills=False,
+    allow_degrade=True,
+    is_disconnected=None,
+    features=None,
+):
+    """Score candidates in micro-batches until done, out of time or abandoned.
+
+    Before each micro-batch the client connection and the remaining budget
+    are checked. When the next batch is not expected to fit with the model,
+    the remaining candidates switch to the lite engine (if `allow_degrade`);
+    when even that does not fit, scoring stops. Batches run in the thread
+    pool so disconnects are noticed. Already extracted candidate feature
+    records can be passed in `features`. Returns (results, report) where results
+    lists (index, candidate, match_result) and report describes how the
+    budget was spent, including the indices left unscored.
+    """
+    costs = CostEstimator()
+    engine = prepared_job.engine
+    results = []
+    degraded = 0
+    status = "complete"
+
+    start = 0
+    while start < len(candidates):
+        if is_disconnected is not None and await is_disconnected():
+            status = "disconnected"
+            break
+
+        batch = candidates[start:start + batch_size]
+        batch_features = features[start:start + batch_size] if features is not None else None
+        remaining = deadline.remaining()
+        expected = costs.estimate(engine, len(batch))
+        if remaining > 0 and expected is not None and expected > remaining:
+            if allow_degrade and engine == "model":
+                engine = "lite"
+                expected = costs.estimate(engine, len(batch))
+        if remaining <= 0 or (expected is not None and expected > remaining):
+            status = "partial"
+            break
+
+        started = time.perf_counter()
+        scored = await run_in_threadpool(
+            matcher.score_batch, prepared_job, batch, include_skills, batch_features, engine
+        )
+        # The batch may have fallen back to lite on a model failure
+        engine = scored[0][1]["engine"]
+        costs.observe(engine, len(batch), time.perf_counter() - started)
+
+        for offset, (candidate, match_result) in enumerate(scored):
+            if engine != prepared_job.engine:
+                match_result["degraded"] = True
+                degraded += 1
+            results.append((start + offset, candidate, match_result))
+        start += len(batch)
+
+    if status == "complete" and degraded:
+        status = "degraded"
+    report = {
+        "status": status,
+        "budget_ms": deadline.budget_ms,
+        "elapsed_ms": deadline.elapsed_ms(),
+        "scored": len(results),
+        "degraded": degraded,
+        "unscored": list(range(start, len(candidates))),
+    }
+    if status != "complete":
+        logging.info(f"Deadline scoring finished as {status}: {report['scored']} scored")
+    return results, report
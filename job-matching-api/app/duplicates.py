@@ -0,0 +1,142 @@
+# duplicates.py
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# Below this many profiles an exact all-pairs check is cheaper than LSH
+EXACT_LIMIT = 256
+
+# Random-hyperplane LSH parameters: a pair with cosine similarity 0.85
+# collides in at least one of 16 tables of 8 bits with probability ~0.98
+LSH_BITS = 8
+LSH_TABLES = 16
+
+# Buckets are verified this many rows at a time to bound temporary memory
+VERIFY_BLOCK = 1024
+
+
+class UnionFind:
+    """Disjoint sets over 0..n-1 with path compression and union by size."""
+
+    def __init__(self, n):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i == root_j:
+            return
+        if self.size[root_i] < self.size[root_j]:
+            root_i, root_j = root_j, root_i
+        self.parent[root_j] = root_i
+        self.size[root_i] += self.size[root_j]
+
+    def groups(self):
+        """Return the sets with more than one member, ordered by first index."""
+        members = defaultdict(list)
+        for i in range(len(self.parent)):
+            members[self.find(i)].append(i)
+        return sorted((m for m in members.values() if len(m) > 1), key=lambda m: m[0])
+
+
+def identity_keys(applied_candidate):
+    """Normalized contact details that identify the same applicant exactly."""
+    keys = []
+    email = (applied_candidate.get("applicantEmail") or "").strip().lower()
+    if email:
+        keys.append("email:" + email)
+    phone = re.sub(r"[\s\-\(\)\+]", "", applied_candidate.get("applicantPhone") or "")
+    if phone:
+        keys.append("phone:" + phone)
+    return keys
+
+
+def lsh_buckets(vectors, bits=LSH_BITS, tables=LSH_TABLES, seed=0):
+    """Yield index buckets whose random-hyperplane signatures collide.
+
+    Each of the `tables` hash tables signs the profiles against `bits`
+    random hyperplanes; profiles sharing a signature share a bucket. Only
+    buckets with at least two profiles are yielded, indices ascending.
+    """
+    dim = vectors.shape[1]
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((tables, bits, dim)).astype(np.float32)
+    weights = 1 << np.arange(bits, dtype=np.int64)
+
+    for table in range(tables):
+        # One integer signature per profile for this table
+        signatures = ((vectors @ planes[table].T) > 0).astype(np.int64) @ weights
+
+        order = np.argsort(signatures, kind="stable")
+        bounds = np.flatnonzero(np.diff(signatures[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) > 1:
+                yield bucket
+
+
+def verify_bucket(vectors, bucket, threshold):
+    """Exact cosine check of all pairs inside a bucket, in row blocks.
+
+    Returns (i, j, similarity) arrays for the pairs i < j at or above the
+    threshold.
+    """
+    found_i, found_j, found_scores = [], [], []
+    members = vectors[bucket]
+    for start in range(0, len(bucket), VERIFY_BLOCK):
+        scores = members[start:start + VERIFY_BLOCK] @ members.T
+        rows, cols = np.nonzero(scores >= threshold)
+        # Keep each unordered pair once
+        mask = cols > rows + start
+        rows, cols = rows[mask], cols[mask]
+        found_i.append(bucket[rows + start])
+        found_j.append(bucket[cols])
+        found_scores.append(scores[rows, cols])
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_scores)
+
+
+def find_duplicate_groups(vectors, threshold, keys=None):
+    """Group near-duplicate profiles.
+
+    `vectors` are L2-normalized profile embeddings (one row per profile) and
+    `keys` optional per-profile identity keys (shared email/phone always
+    marks a duplicate). Returns a list of index groups, each sorted with
+    its primary (earliest) profile first, plus a dict of verified pair
+    similarities keyed by (i, j) with i < j.
+    """
+    n = len(vectors)
+    union_find = UnionFind(n)
+    similarities = {}
+
+    if n > 1:
+        if n <= EXACT_LIMIT:
+            buckets = [np.arange(n)]
+        else:
+            buckets = lsh_buckets(vectors)
+
+        for bucket in buckets:
+            found_i, found_j, scores = verify_bucket(vectors, bucket, threshold)
+            for i, j, score in zip(found_i.tolist(), found_j.tolist(), scores.tolist()):
+                similarities[(i, j)] = score
+                union_find.union(i, j)
+
+    # Exact identity matches are duplicates regardless of profile content
+    owners = {}
+    for i, profile_keys in enumerate(keys or []):
+        for key in profile_keys:
+            if key in owners:
+                pair = (owners[key], i)
+                similarities[pair] = 1.0
+                union_find.union(*pair)
+            else:
+                owners[key] = i
+
+    return union_find.groups(), similarities
@@ -0,0 +1,63 @@
+# embedding_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def fingerprint(text):
+    """Stable content fingerprint of a section text."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of section embeddings keyed by text fingerprint.
+
+    Keys are content fingerprints, so any profile section that has been
+    encoded before (by any endpoint) is served without calling the model.
+    """
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Return cached embeddings for keys (None where missing)."""
+        found = []
+        with self._lock:
+            for key in keys:
+                embedding = self._entries.get(key)
+                if embedding is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                found.append(embedding)
+        return found
+
+    def put_many(self, keys, embeddings):
+        """Store embeddings, evicting the least recently used entries."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for key, embedding in zip(keys, embeddings):
+                self._entries[key] = embedding
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Entry count and hit/miss counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
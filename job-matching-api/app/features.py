@@ -0,0 +1,424 @@
+# features.py
+import re
+
+from .embedding_cache import fingerprint
+
+# Precompiled patterns and keyword tables shared by the extractors
+YEARS_RE = re.compile(r"(\d+)[\+]?\s*(?:years?|yrs?)")
+EDUCATION_TERMS_RE = re.compile(r"degree|education|bachelor|master|phd|diploma")
+EXPERIENCE_TERMS_RE = re.compile(r"experience|years|year|yr|yrs")
+SKILL_PREFIXES_RE = re.compile(r"technical skills:|soft skills:")
+
+EDUCATION_KEYWORDS = {
+    "bachelor": ["bscs", "bs", "bsc", "bachelor", "undergraduate", "degree"],
+    "master": ["ms", "msc", "master", "graduate"],
+    "computer science": [
+        "computer science",
+        "cs",
+        "software engineering",
+        "information technology",
+        "it",
+    ],
+}
+DEGREE_LEVELS = ("bachelor", "master")
+
+# Facets stored profiles can be filtered on before any similarity work;
+# candidates have no contract type
+FACETS = ("location", "job_type", "contract_type", "degree", "years")
+CANDIDATE_FACETS = ("location", "job_type", "degree", "years")
+
+# Whole-word degree names for the degree facet. Unlike the scoring keywords,
+# a hard filter must not find "ms" inside "systems" or count a bare "degree".
+DEGREE_FACET_RES = {
+    "bachelor": re.compile(r"\b(?:bachelor|bscs|bsc|bs|undergraduate)(?:'?s)?\b"),
+    "master": re.compile(r"\b(?:master|msc|ms)(?:'?s)?\b"),
+}
+
+# Lower bounds of the years-of-experience buckets used as a facet
+YEARS_BUCKETS = (0, 1, 3, 5, 10)
+
+# Section names, in the order they are encoded
+JOB_SECTIONS = (
+    "required_skills",
+    "preferred_skills",
+    "responsibilities",
+    "qualifications",
+    "tech_stack",
+    "work_requirements",
+)
+CANDIDATE_SECTIONS = ("skills", "education", "experience")
+
+# Candidate sections that together describe a whole profile
+PROFILE_SECTIONS = ("summary", "skills", "education", "experience")
+
+# Scoring categories with the (job, candidate) sections each depends on
+CATEGORY_SECTIONS = {
+    "required_skills": (("required_skills",), ("skills",)),
+    "preferred_skills": (("preferred_skills",), ("skills",)),
+    "qualification": (("qualifications",), ("education",)),
+    "work_experience": (("work_requirements", "responsibilities"), ("experience",)),
+    "tech_stack": (("tech_stack",), ("skills",)),
+}
+CATEGORIES = tuple(CATEGORY_SECTIONS)
+
+
+class JobFeatures:
+    """Everything the scorer needs from a job, extracted in one pass."""
+
+    __slots__ = (
+        "sections",
+        "summary",
+        "required_skill_terms",
+        "preferred_skill_terms",
+        "tech_stack_terms",
+        "skill_names",
+        "years_required",
+        "wants_cs_bachelor",
+        "job_type",
+    )
+
+
+class CandidateFeatures:
+    """Everything the scorer needs from a candidate, extracted in one pass."""
+
+    __slots__ = (
+        "sections",
+        "summary",
+        "skill_terms",
+        "skill_names",
+        "years",
+        "has_cs_degree",
+        "degree_levels",
+        "recent_job_types",
+    )
+
+
+FEATURE_TYPES = {record_type.__name__: record_type for record_type in (JobFeatures, CandidateFeatures)}
+
+
+def features_to_dict(features):
+    """JSON-ready form of a feature record, e.g. for index snapshots."""
+    return {
+        "type": type(features).__name__,
+        **{name: getattr(features, name) for name in features.__slots__},
+    }
+
+
+def features_from_dict(data):
+    """Rebuild a feature record from features_to_dict output."""
+    features = FEATURE_TYPES[data["type"]]()
+    for name in features.__slots__:
+        setattr(features, name, _as_tuples(data[name]))
+    return features
+
+
+def _as_tuples(value):
+    # JSON turns tuples into lists; fingerprints depend on the exact types
+    if isinstance(value, list):
+        return tuple(_as_tuples(item) for item in value)
+    return value
+
+
+def individual_skills(skills_text):
+    """Split a skills text into a tuple of lowercased, comma separated skills."""
+    if not skills_text:
+        return ()
+    skills_text = SKILL_PREFIXES_RE.sub("", skills_text.lower())
+    return tuple(dict.fromkeys(s for s in (s.strip() for s in skills_text.split(",")) if s))
+
+
+def extract_job_features(job_data):
+    """Walk a job payload once and build its feature record."""
+    description = job_data.get("description") or {}
+    required = description.get("required_skills") or []
+    preferred = description.get("preferred_skills") or []
+    responsibilities = description.get("responsibilities") or []
+    technical_skills = description.get("technical_skills") or {}
+
+    # Qualification and experience requirements come from the required skills
+    qualifications = []
+    work_requirements = []
+    for skill in required:
+        skill_lower = skill.lower()
+        if EDUCATION_TERMS_RE.search(skill_lower):
+            qualifications.append(skill)
+        if EXPERIENCE_TERMS_RE.search(skill_lower):
+            work_requirements.append(skill)
+
+    # Also include job type and contract type for better matching
+    if "job_type" in job_data:
+        work_requirements.append(f"Job type: {job_data['job_type']}")
+    if "contract_type" in job_data:
+        work_requirements.append(f"Contract: {job_data['contract_type']}")
+
+    tech_stack = []
+    tech_skill_names = []
+    for category, skills in technical_skills.items():
+        tech_stack.append(category + ": " + ", ".join(skills))
+        tech_skill_names.extend(skills)
+
+    summary = description.get("position_summary") or ""
+    if "title" in job_data:
+        summary = job_data["title"] + ": " + summary
+    if "company_name" in job_data:
+        summary = job_data["company_name"] + " - " + summary
+
+    # Years of experience are read from the top-level required skills
+    years_required = 0
+    for skill in job_data.get("required_skills") or []:
+        skill_lower = skill.lower()
+        if "year" in skill_lower and "experience" in skill_lower:
+            years_match = YEARS_RE.search(skill_lower)
+            if years_match:
+                years_required = int(years_match.group(1))
+
+    features = JobFeatures()
+    features.sections = {
+        "required_skills": " ".join(required),
+        "preferred_skills": " ".join(preferred),
+        "responsibilities": " ".join(responsibilities),
+        "qualifications": " ".join(qualifications).strip(),
+        "tech_stack": " ".join(tech_stack).strip(),
+        "work_requirements": " ".join(work_requirements).strip(),
+    }
+    qualifications_lower = features.sections["qualifications"].lower()
+
+    features.summary = summary
+    features.required_skill_terms = individual_skills(features.sections["required_skills"])
+    features.preferred_skill_terms = individual_skills(features.sections["preferred_skills"])
+    features.tech_stack_terms = individual_skills(features.sections["tech_stack"])
+    features.skill_names = tuple(
+        skill.lower() for skill in (*required, *preferred, *tech_skill_names)
+    )
+    features.years_required = years_required
+    features.wants_cs_bachelor = (
+        "bachelor" in qualifications_lower and "computer science" in qualifications_lower
+    )
+    features.job_type = (job_data["job_type"] or "").lower() if "job_type" in job_data else None
+    return features
+
+
+def extract_candidate_features(candidate_data):
+    """Walk a candidate payload once and build its feature record."""
+    technical = candidate_data.get("technicalSkills") or []
+    soft = candidate_data.get("softSkills") or []
+    certificates = candidate_data.get("certificates") or []
+    educations = candidate_data.get("educations") or []
+    work_experiences = candidate_data.get("workExperiences") or []
+    projects = candidate_data.get("projects") or []
+    raw_summary = candidate_data.get("summary") or ""
+    summary_lower = raw_summary.lower()
+
+    skills = []
+    if technical:
+        skills.append("Technical Skills: " + ", ".join(technical))
+    if soft:
+        skills.append("Soft Skills: " + ", ".join(soft))
+    # Certificates often indicate skills
+    for cert in certificates:
+        skills.append(f"Certificate: {cert.get('name', '')}")
+
+    education = []
+    has_cs_degree = False
+    degree_levels = set()
+    for edu in educations:
+        education.append(
+            f"{edu.get('degree', '')} in {edu.get('field', '')} from {edu.get('school', '')}."
+        )
+        degree = (edu.get("degree") or "").lower()
+        field = (edu.get("field") or "").lower()
+        for level in DEGREE_LEVELS:
+            if any(d in degree for d in EDUCATION_KEYWORDS[level]):
+                degree_levels.add(level)
+        # A bachelor's in a computer science field boosts qualification
+        if any(d in degree for d in EDUCATION_KEYWORDS["bachelor"]) and any(
+            f in field for f in EDUCATION_KEYWORDS["computer science"]
+        ):
+            has_cs_degree = True
+
+    experience = []
+    # Add years of experience from summary if available
+    if "experience" in summary_lower:
+        experience.append(raw_summary)
+    total_years = 0
+    recent_job_types = []
+    for i, exp in enumerate(work_experiences):
+        experience.append(
+            f"{exp.get('title', '')} at {exp.get('company', '')}. {exp.get('description', '')}"
+        )
+        if "jobType" in exp:
+            experience.append(f"Job type: {exp.get('jobType', '')}")
+            # Only the two most recent experiences count for job type
+            if i < 2:
+                recent_job_types.append((exp["jobType"] or "").lower())
+        if "durationInMonths" in exp:
+            total_years += exp.get("durationInMonths", 0) / 12
+    # Projects indicate practical experience
+    for project in projects:
+        experience.append(f"Project: {project.get('title', '')}. {project.get('description', '')}")
+
+    summary = raw_summary
+    if "name" in candidate_data:
+        summary = candidate_data["name"] + ": " + summary
+    if work_experiences:
+        latest_title = work_experiences[0].get("title", "")
+        if latest_title:
+            summary += f" Current position: {latest_title}"
+
+    features = CandidateFeatures()
+    features.sections = {
+        "skills": " ".join(skills).strip(),
+        "education": " ".join(education).strip(),
+        "experience": " ".join(experience).strip(),
+    }
+    features.summary = summary
+    features.skill_terms = individual_skills(features.sections["skills"])
+    features.skill_names = tuple((skill.lower(), skill) for skill in (*technical, *soft))
+    # Use the maximum of explicit years mentioned or the summed durations
+    years_match = YEARS_RE.search(summary_lower)
+    features.years = max(int(years_match.group(1)) if years_match else 0, total_years)
+    features.has_cs_degree = has_cs_degree
+    features.degree_levels = tuple(sorted(degree_levels))
+    features.recent_job_types = tuple(recent_job_types)
+    return features
+
+
+def years_bucket(years):
+    """Lower bound of the experience bucket holding `years`."""
+    return max(bound for bound in YEARS_BUCKETS if years >= bound)
+
+
+def _facet_value(value):
+    return (value or "").strip().lower()
+
+
+def _location_values(location):
+    """A location and each of its comma separated parts, e.g. its city."""
+    location = _facet_value(location)
+    if not location:
+        return ()
+    parts = (part.strip() for part in location.split(","))
+    return tuple(dict.fromkeys([location, *(part for part in parts if part)]))
+
+
+def _degree_levels(texts):
+    """Degree levels named in any of the texts, by DEGREE_FACET_RES."""
+    texts = [text.lower() for text in texts if text]
+    return [
+        level
+        for level in DEGREE_LEVELS
+        if any(DEGREE_FACET_RES[level].search(text) for text in texts)
+    ]
+
+
+def _degree_values(levels):
+    """Every degree level up to the highest one, so a master's also counts as a bachelor's."""
+    ranks = [DEGREE_LEVELS.index(level) for level in levels if level in DEGREE_LEVELS]
+    return DEGREE_LEVELS[:max(ranks) + 1] if ranks else ()
+
+
+def candidate_facets(candidate_data, candidate):
+    """Facet values of a candidate, from its payload and feature record."""
+    degrees = [edu.get("degree") for edu in candidate_data.get("educations") or []]
+    return {
+        "location": _location_values(candidate_data.get("location")),
+        "job_type": tuple(dict.fromkeys(t for t in candidate.recent_job_types if t)),
+        "degree": _degree_values(_degree_levels(degrees)),
+        "years": (years_bucket(candidate.years),),
+    }
+
+
+def job_facets(job_data, job):
+    """Facet values of a job, from its payload and feature record."""
+    levels = _degree_levels([job.sections["qualifications"]])
+    contract_type = _facet_value(job_data.get("contract_type"))
+    return {
+        "location": _location_values(job_data.get("location")),
+        "job_type": (job.job_type,) if job.job_type else (),
+        "contract_type": (contract_type,) if contract_type else (),
+        "degree": _degree_values(levels)[-1:],
+        "years": (years_bucket(job.years_required),),
+    }
+
+
+def skill_keys(features):
+    """Lowercased skill names of a job or candidate, for skill postings."""
+    if isinstance(features, CandidateFeatures):
+        return tuple(dict.fromkeys(lower.strip() for lower, _ in features.skill_names))
+    return tuple(dict.fromkeys(skill.strip() for skill in features.skill_names))
+
+
+def facet_filter(location=None, job_type=None, contract_type=None, degree=None, min_years=None, skills=None):
+    """Normalized ({facet: accepted values}, must-have skills), or None without filters.
+
+    A profile passes when, for every filtered facet, it has one of the
+    accepted values, and it lists every must-have skill. `min_years` is
+    matched at bucket granularity (see YEARS_BUCKETS).
+    """
+    facets = {}
+    for facet, values in (
+        ("location", location),
+        ("job_type", job_type),
+        ("contract_type", contract_type),
+        ("degree", degree),
+    ):
+        values = tuple(dict.fromkeys(_facet_value(v) for v in values or () if _facet_value(v)))
+        if values:
+            facets[facet] = values
+    if min_years is not None:
+        floor = years_bucket(max(0, min_years))
+        facets["years"] = tuple(bound for bound in YEARS_BUCKETS if bound >= floor)
+    skills = tuple(dict.fromkeys(_facet_value(s) for s in skills or () if _facet_value(s)))
+    if not facets and not skills:
+        return None
+    return facets, skills
+
+
+def passes_filter(facets, skills, profile_filter):
+    """Whether a profile's facet values and skill keys pass a facet_filter."""
+    wanted_facets, wanted_skills = profile_filter
+    for facet, accepted in wanted_facets.items():
+        if not set(facets.get(facet, ())).intersection(accepted):
+            return False
+    return set(wanted_skills).issubset(skills)
+
+
+def job_fingerprints(job):
+    """Fingerprint each job section with the derived values scored alongside it."""
+    extras = {
+        "required_skills": (job.required_skill_terms, job.skill_names),
+        "preferred_skills": (job.preferred_skill_terms, job.skill_names),
+        "responsibilities": (),
+        "qualifications": (job.wants_cs_bachelor,),
+        "tech_stack": (job.tech_stack_terms, job.skill_names),
+        "work_requirements": (job.years_required, job.job_type),
+    }
+    return {
+        section: fingerprint(repr((text, extras[section])))
+        for section, text in job.sections.items()
+    }
+
+
+def candidate_fingerprints(candidate):
+    """Fingerprint each candidate section with the derived values scored alongside it."""
+    extras = {
+        "skills": (candidate.skill_terms, candidate.skill_names),
+        "education": (candidate.has_cs_degree, candidate.degree_levels),
+        "experience": (candidate.years, candidate.recent_job_types),
+    }
+    fingerprints = {
+        section: fingerprint(repr((text, extras[section])))
+        for section, text in candidate.sections.items()
+    }
+    fingerprints["summary"] = fingerprint(candidate.summary)
+    return fingerprints
+
+
+def changed_categories(job_changed, candidate_changed):
+    """Scoring categories affected by changed job and candidate sections."""
+    return {
+        category
+        for category, (job_sections, candidate_sections) in CATEGORY_SECTIONS.items()
+        if job_changed.intersection(job_sections)
+        or candidate_changed.intersection(candidate_sections)
+    }
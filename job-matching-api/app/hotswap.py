@@ -0,0 +1,152 @@
+# hotswap.py
+import asyncio
+import logging
+import shutil
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from .admission import AdmissionRejected
+
+# Stored profiles re-embedded per step while a new model is prepared
+REEMBED_CHUNK = 256
+
+
+class ModelRuntime:
+    """Everything that depends on the embedding model, swapped as one unit.
+
+    A request takes the active runtime once (see PreparedJob.runtime) and
+    finishes on it, even if another runtime is activated meanwhile.
+    """
+
+    def __init__(
+        self,
+        version,
+        model_name,
+        model,
+        model_error,
+        embedding_cache,
+        score_cache,
+        candidate_store,
+        job_store,
+        store_dir=None,
+    ):
+        self.version = version
+        self.model_name = model_name
+        self.model = model
+        self.model_error = model_error
+        self.embedding_cache = embedding_cache
+        self.score_cache = score_cache
+        self.candidate_store = candidate_store
+        self.job_store = job_store
+        # Directory of the stores' full-precision files, removed on retirement
+        self.store_dir = store_dir
+        # Snapshot version the stores were loaded from (None when built here)
+        self.store_version = None
+        self.activated_at = None
+
+    def retire(self):
+        """Drop on-disk store files; requests still using them keep their mappings."""
+        if self.store_dir:
+            shutil.rmtree(self.store_dir, ignore_errors=True)
+
+
+class HotSwap:
+    """Prepares a new model or store snapshot in the background and flips to it.
+
+    The new runtime is built off the request path. Without a snapshot the
+    stored candidates and jobs are re-embedded with the new model in chunks,
+    each admitted like a request so live traffic keeps its share; profiles
+    written meanwhile go to both runtimes. Once complete the matcher's
+    active runtime is replaced in one assignment.
+    """
+
+    def __init__(self, matcher, admission, chunk_size=REEMBED_CHUNK):
+        self.matcher = matcher
+        self.admission = admission
+        self.chunk_size = chunk_size
+        self.state = "idle"
+        self.target = None
+        self.error = None
+        self.progress = {"done": 0, "total": 0}
+        self.started_at = None
+        self.flipped_at = None
+        self.flips = 0
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, model_name=None, snapshot_root=None, snapshot_version=None):
+        """Begin a swap in the background; raises RuntimeError if one is running."""
+        if self.running:
+            raise RuntimeError("A swap is already in progress")
+        self.state = "loading"
+        self.target = {"model_name": model_name, "snapshot_version": snapshot_version}
+        self.error = None
+        self.progress = {"done": 0, "total": 0}
+        self.started_at = time.time()
+        self._task = asyncio.create_task(self._run(model_name, snapshot_root, snapshot_version))
+
+    async def _run(self, model_name, snapshot_root, snapshot_version):
+        matcher = self.matcher
+        try:
+            runtime = await run_in_threadpool(
+                matcher.build_runtime, model_name, snapshot_root, snapshot_version
+            )
+            if runtime.model is None:
+                raise RuntimeError(f"Model failed to load: {runtime.model_error}")
+            if snapshot_version is None:
+                self.state = "reembedding"
+                matcher.pending = runtime
+                old = matcher.active
+                pairs = ((old.candidate_store, runtime.candidate_store), (old.job_store, runtime.job_store))
+                self.progress["total"] = sum(len(source) for source, _ in pairs)
+                for source, target in pairs:
+                    await self._reembed(source, target, runtime)
+            matcher.activate(runtime)
+            self.state = "complete"
+            self.flips += 1
+            self.flipped_at = time.time()
+            logging.info(f"Swapped to model {runtime.model_name} (runtime {runtime.version})")
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logging.error(f"Hot swap failed: {str(e)}")
+        finally:
+            matcher.pending = None
+
+    async def _reembed(self, source, target, runtime):
+        row = 0
+        # Rows appended to the source meanwhile are picked up as well
+        while row < len(source.ids):
+            end = min(row + self.chunk_size, len(source.ids))
+            try:
+                charge = await self.admission.acquire(end - row)
+            except AdmissionRejected as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            try:
+                done = await run_in_threadpool(
+                    self.matcher.reembed_rows, source, target, row, end, runtime
+                )
+            finally:
+                self.admission.release(charge)
+            self.progress["done"] += done
+            row = end
+
+    def stats(self):
+        active = self.matcher.active
+        return {
+            "state": self.state,
+            "active_model": active.model_name,
+            "active_runtime": active.version,
+            "activated_at": active.activated_at,
+            "target": self.target,
+            "progress": dict(self.progress),
+            "started_at": self.started_at,
+            "flipped_at": self.flipped_at,
+            "flips": self.flips,
+            "error": self.error,
+        }
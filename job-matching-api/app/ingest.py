@@ -0,0 +1,89 @@
+# ingest.py
+from typing import List
+
+from pydantic import TypeAdapter, ValidationError
+
+from .streaming import InvalidRecord, UploadFormatError
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+# Rejected rows whose validation errors are included in the response
+MAX_REPORTED_ERRORS = 20
+
+
+class RecordValidator:
+    """Validates a batch of records against a model in one pass.
+
+    The whole batch goes through a single `List[model]` validator, so the
+    per-record overhead of building a validator and raising is paid once
+    per batch. Invalid rows (and rows without an id, or NDJSON lines that
+    could not be decoded) are dropped and reported by their position in
+    the upload.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._adapter = TypeAdapter(List[model])
+
+    def validate(self, records, offset=0):
+        """Return (valid records as dicts, [(row, error)]) for a batch."""
+        records = list(records)
+        rejected = {}
+        for i, record in enumerate(records):
+            if isinstance(record, InvalidRecord):
+                rejected[i] = record.error
+            elif not isinstance(record, dict):
+                rejected[i] = "Record is not an object"
+            elif record.get("id") is None:
+                rejected[i] = "Stored profiles need an id"
+
+        while True:
+            kept = [i for i in range(len(records)) if i not in rejected]
+            try:
+                validated = self._adapter.validate_python([records[i] for i in kept])
+                break
+            except ValidationError as e:
+                # Errors are located by list index; drop those rows and retry
+                for error in e.errors():
+                    position = kept[error["loc"][0]]
+                    if position not in rejected:
+                        field = ".".join(str(part) for part in error["loc"][1:])
+                        rejected[position] = f"{field}: {error['msg']}" if field else error["msg"]
+
+        valid = [record.model_dump(exclude_none=True) for record in validated]
+        errors = [(offset + i, rejected[i]) for i in sorted(rejected)]
+        return valid, errors
+
+
+def dedupe_ids(records):
+    """Keep the last record for each id, in order of last appearance."""
+    latest = {}
+    for record in records:
+        profile_id = str(record["id"])
+        latest.pop(profile_id, None)
+        latest[profile_id] = record
+    return list(latest.values())
+
+
+def iter_arrow_batches(f, rows):
+    """Yield lists of up to `rows` records from an Arrow IPC stream file."""
+    if pa is None:
+        raise RuntimeError("Arrow uploads need pyarrow (pip install pyarrow)")
+    pending = []
+    try:
+        for batch in pa.ipc.open_stream(f):
+            # Columnar to rows once per record batch, not per value
+            pending.extend(batch.to_pylist())
+            while len(pending) >= rows:
+                yield pending[:rows]
+                pending = pending[rows:]
+    except (pa.ArrowInvalid, OSError) as e:
+        # A stream cut off inside a message raises OSError
+        raise UploadFormatError(f"Invalid Arrow stream: {str(e)}")
+    if pending:
+        yield pending
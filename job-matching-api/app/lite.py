@@ -0,0 +1,128 @@
+# lite.py
+import os
+import threading
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+# Hashed vocabulary size; collisions are rare at this size for profile texts
+LITE_FEATURES = 2 ** 18
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Keeps "c++", "c#" and similar skill names as single terms
+TOKEN_PATTERN = r"(?u)\b\w[\w+#]*"
+
+
+class LiteEncoder:
+    """Sparse BM25 section vectors, a model-free stand-in for embeddings.
+
+    Terms are hashed, so texts never seen during fitting still vectorize.
+    Fitting on a corpus of section texts learns document frequencies (IDF)
+    and the average section length; until fitted every term weighs the same.
+    Vectors are L2-normalized CSR rows, so cosine similarity is a dot product.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._vectorizer = HashingVectorizer(
+            n_features=LITE_FEATURES,
+            token_pattern=TOKEN_PATTERN,
+            alternate_sign=False,
+            norm=None,
+        )
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.average_length = 0.0
+        self._idf = None
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @property
+    def fitted(self):
+        return self._idf is not None
+
+    def fit(self, texts):
+        """Learn IDF and average length from section texts (empty ones skipped)."""
+        texts = [text for text in texts if text]
+        if not texts:
+            raise ValueError("No texts to fit the lite index on")
+        counts = self._vectorizer.transform(texts).tocsc()
+        n = counts.shape[0]
+        df = np.diff(counts.indptr).astype(np.float64)
+        # BM25 idf; terms unseen while fitting get the rarest-term weight
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        with self._lock:
+            self._idf = idf
+            self.documents = n
+            self.average_length = float(counts.sum()) / n
+
+    def encode(self, texts):
+        """Return one normalized sparse row per text (None for empty texts)."""
+        vectors = [None] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text]
+        if not indices:
+            return vectors
+
+        counts = self._vectorizer.transform([texts[i] for i in indices]).tocsr()
+        with self._lock:
+            idf = self._idf
+            average_length = self.average_length
+
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        if not average_length:
+            average_length = max(float(lengths.mean()), 1.0)
+        row_norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / average_length)
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+
+        tf = counts.data
+        counts.data = tf * (BM25_K1 + 1) / (tf + row_norm[rows])
+        if idf is not None:
+            counts.data *= idf[counts.indices]
+        counts = normalize(counts)
+
+        for position, i in enumerate(indices):
+            vectors[i] = counts[position]
+        return vectors
+
+    def save(self, path=None):
+        """Persist the fitted statistics (a single .npz file)."""
+        path = path or self.path
+        if not self.fitted or not path:
+            raise ValueError("Nothing to save: the lite index is not fitted")
+        with self._lock:
+            idf, documents, average_length = self._idf, self.documents, self.average_length
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f, idf=idf, documents=documents, average_length=average_length
+            )
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, path):
+        with np.load(path) as data:
+            idf = data["idf"].astype(np.float32)
+            documents = int(data["documents"])
+            average_length = float(data["average_length"])
+        if idf.shape != (LITE_FEATURES,):
+            raise ValueError(f"Lite index at {path} has an unexpected shape")
+        with self._lock:
+            self._idf = idf
+            self.documents = documents
+            self.average_length = average_length
+
+    def stats(self):
+        return {
+            "fitted": self.fitted,
+            "documents": self.documents,
+            "average_length": round(self.average_length, 2),
+            "path": self.path,
+        }
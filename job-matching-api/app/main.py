@@ -2,12 +2,72 @@
 import logging
 logging.basicConfig(level=logging.INFO)
 
-from fastapi import FastAPI, HTTPException
+import hmac
+import json
+import tempfile
+import time
+from typing import Dict, List, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from .models import MatchRequest, MatchResponse
-from .matcher import JobCandidateMatchingSystem
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import TypeAdapter, ValidationError
+from .models import (
+    AppliedCandidateMatchRequest,
+    BatchMatchRequest,
+    BulkCompareCandidatesRequest,
+    Candidate,
+    CompareCandidatesRequest,
+    DuplicateCheckRequest,
+    Job,
+    LiteFitRequest,
+    MatchMatrixRequest,
+    MatchRequest,
+    MatchResponse,
+    RerankRequest,
+    SwapRequest,
+    TopCandidatesRequest,
+)
+from .admission import AdmissionController, AdmissionRejected
+from .coordinator import Coordinator, ShardError
+from .deadlines import DEADLINE_HEADER, parse_deadline, score_within_deadline
+from .duplicates import find_duplicate_groups, identity_keys
+from .features import CANDIDATE_FACETS, facet_filter
+from .hotswap import HotSwap
+from .ingest import (
+    ARROW_STREAM_TYPE,
+    MAX_REPORTED_ERRORS,
+    RecordValidator,
+    dedupe_ids,
+    iter_arrow_batches,
+)
+from .matcher import ENGINES, JobCandidateMatchingSystem
+from .responses import (
+    dumps,
+    negotiated_response,
+    parse_fields,
+    project,
+    wants_field,
+)
+from .ranking import TopK, paginate, page_size
+from .result_sets import ResultSets
+from .sharding import ShardedScorer
+from .singleflight import SingleFlight, canonical_key
+from .snapshots import current_version, list_snapshots
+from .streaming import UploadFormatError, iter_batch_upload, iter_ndjson, iter_ndjson_upload
 import os
 
+# Scored upload results are spooled to disk beyond this size
+UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024
+
+# Category weight overrides as sent in streamed uploads
+_upload_weights = TypeAdapter(Optional[Dict[str, float]])
+
+# Profiles validated, encoded and written to a store per ingestion batch
+INGEST_BATCH_ROWS = int(os.environ.get("INGEST_BATCH_ROWS", 2048))
+
 app = FastAPI(
     title="Job Candidate Matching API",
     description="API for matching job candidates with job postings",
@@ -22,64 +82,1370 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-matcher = JobCandidateMatchingSystem()
+# Compress large bodies (batch results) for mobile clients
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+matcher = JobCandidateMatchingSystem(
+    model_name=os.environ.get("MODEL_NAME", "all-MiniLM-L6-v2"),
+    cache_size=int(os.environ.get("EMBEDDING_CACHE_SIZE", 20000)),
+    lite_path=os.environ.get("LITE_INDEX_PATH", "/tmp/lite/lite_index.npz"),
+    score_cache_size=int(os.environ.get("SCORE_CACHE_SIZE", 50000)),
+    score_cache_path=os.environ.get("SCORE_CACHE_PATH", "/tmp/scores/pair_scores.sqlite3") or None,
+    token_budget=int(os.environ.get("ENCODE_TOKEN_BUDGET", 8192)),
+    store_quantization=os.environ.get("STORE_QUANTIZATION", "int8"),
+    store_path=os.environ.get("STORE_PATH", "/tmp/store") or None,
+)
+
+# Published store snapshots; every worker maps the current one read-only
+SNAPSHOT_PATH = os.environ.get("SNAPSHOT_PATH", "/tmp/store/snapshots")
+
+# Bearer token for the endpoints that swap models or publish snapshots;
+# they are disabled while it is unset
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+if SNAPSHOT_PATH:
+    try:
+        loaded = matcher.load_stores(SNAPSHOT_PATH)
+        if loaded:
+            logging.info(f"Loaded store snapshot {loaded}")
+    except Exception as e:
+        logging.error(f"Could not load store snapshot: {str(e)}")
+
+# Cap on candidates scored at once; MAX_INFLIGHT_CANDIDATES=0 disables it
+admission = AdmissionController(
+    capacity=int(os.environ.get("MAX_INFLIGHT_CANDIDATES", 1024)),
+    reserve=int(os.environ.get("SMALL_REQUEST_RESERVE", 64)),
+    small_cost=int(os.environ.get("SMALL_REQUEST_CANDIDATES", 8)),
+    max_queue=int(os.environ.get("ADMISSION_QUEUE_SIZE", 64)),
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", 2000)) / 1000,
+    retry_after=int(os.environ.get("ADMISSION_RETRY_AFTER", 1)),
+)
+
+# Background model/store replacement, re-embedding within admission capacity
+hot_swap = HotSwap(matcher, admission)
+
+# Identical concurrent requests share one computation; results live briefly
+results_cache = SingleFlight(
+    ttl=float(os.environ.get("RESULT_CACHE_TTL_MS", 5000)) / 1000,
+    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 1024)),
+)
+
+# Raw category scores of recent result sets, for re-weighting via /rerank/
+result_sets = ResultSets(
+    ttl=float(os.environ.get("RESULT_SET_TTL_S", 1800)),
+    max_sets=int(os.environ.get("RESULT_SET_COUNT", 256)),
+)
+
+# Large /batch-match/ requests are split across worker processes
+sharded = ShardedScorer(
+    matcher,
+    processes=int(os.environ.get("SHARD_PROCESSES", 0)),
+    min_candidates=int(os.environ.get("SHARD_MIN_CANDIDATES", 2000)),
+    cache_size=int(os.environ.get("EMBEDDING_CACHE_SIZE", 20000)),
+)
+
+# Coordinator mode: candidates are partitioned across these shard servers
+# (each running this app) and store queries are fanned out to them
+SHARD_SERVERS = [url for url in os.environ.get("SHARD_SERVERS", "").split(",") if url.strip()]
+coordinator = (
+    Coordinator(
+        SHARD_SERVERS,
+        timeout=float(os.environ.get("SHARD_SERVER_TIMEOUT_MS", 2000)) / 1000,
+        write_timeout=float(os.environ.get("SHARD_SERVER_WRITE_TIMEOUT_MS", 60000)) / 1000,
+    )
+    if SHARD_SERVERS
+    else None
+)
+
+# Workers are started with the server, not on import, so spawned processes
+# that import this module do not start pools of their own
+@app.on_event("startup")
+async def start_sharding():
+    await run_in_threadpool(sharded.start)
+
+@app.on_event("shutdown")
+async def stop_sharding():
+    sharded.close()
+    if coordinator is not None:
+        await coordinator.close()
+    # Store files are only needed while this process serves; ones left by a
+    # crash are removed on the next start
+    for runtime in (matcher.active, matcher.pending):
+        if runtime is not None:
+            runtime.retire()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Job Candidate Matching API"}
 
-@app.post("/match/", response_model=dict)
-async def match_job_candidate(request: MatchRequest):
-    try:
-        logging.info(f"Received /match/ POST data:\nJob: {request.job}\nCandidate: {request.candidate}")
+@app.get("/metrics/")
+async def metrics():
+    """Admission queue, embedding cache and lite engine counters."""
+    return {
+        "admission": admission.stats(),
+        "embedding_cache": matcher.embedding_cache.stats(),
+        "lite": matcher.lite.stats(),
+        "result_cache": results_cache.stats(),
+        "score_cache": matcher.score_cache.stats(),
+        "result_sets": result_sets.stats(),
+        "candidate_store": matcher.candidate_store.stats(),
+        "job_store": matcher.job_store.stats(),
+        "store_version": matcher.store_version,
+        "model_available": matcher.model_available,
+        "hot_swap": hot_swap.stats(),
+        "sharding": sharded.stats(),
+        "coordinator": coordinator.stats() if coordinator is not None else None,
+    }
+
+def _request_key(name, http_request, body):
+    """Canonical content hash of an endpoint's query parameters and body."""
+    params = sorted(http_request.query_params.multi_items())
+    # Results of a previous model runtime or lite fit are not shared after a
+    # swap or refit
+    lite = (matcher.lite.documents, matcher.lite.average_length)
+    return canonical_key(
+        name, matcher.active.version, lite, params, body.model_dump(exclude_none=True)
+    )
 
-        match_result = matcher.calculate_match_score(
-            request.job.model_dump(exclude_none=True),
-            request.candidate.model_dump(exclude_none=True),
+async def _admit(candidates):
+    """Wait for room to score `candidates`, or raise a 429/503 with Retry-After."""
+    try:
+        return await admission.acquire(candidates)
+    except AdmissionRejected as e:
+        logging.info(f"Rejected request for {candidates} candidates: {str(e)}")
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
         )
 
-        matching_skills = matcher.get_matching_skills(
-            request.job.model_dump(exclude_none=True),
-            request.candidate.model_dump(exclude_none=True),
+def _check_engine(engine):
+    """Validate a requested scoring engine or raise a 400/503."""
+    if engine not in ENGINES:
+        raise HTTPException(
+            status_code=400, detail=f"engine must be one of: {', '.join(ENGINES)}"
+        )
+    if engine == "model" and not matcher.model_available:
+        raise HTTPException(
+            status_code=503, detail="Model is not available, use engine=lite or auto"
         )
+    return engine
+
+def _check_model():
+    """Raise a 503 for endpoints that need the model when it is not loaded."""
+    if not matcher.model_available:
+        raise HTTPException(status_code=503, detail=f"Model is not available: {matcher.model_error}")
+
+def _check_weights(*overrides):
+    """Resolve category weight overrides or raise a 400."""
+    try:
+        return matcher.resolve_weights(*overrides)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid weights: {str(e)}")
+
+def _check_top_k(top_k):
+    """Raise a 400 unless top_k is unset or positive (the same rule for every ranking)."""
+    if top_k is not None and top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be positive")
+
+def _store_result_set(scored, format_record, weights):
+    """Keep (record, raw scores, bonus) of every scored result with the weights used; returns the set id."""
+    return result_sets.put(
+        [
+            (format_record(item, match_result), match_result["raw_scores"], match_result["job_type_bonus"])
+            for item, match_result in scored
+        ],
+        weights,
+    )
+
+@app.post("/match/", response_model=dict)
+async def match_job_candidate(
+    request: MatchRequest, http_request: Request, engine: str = "auto"
+):
+    try:
+        logging.info(f"Received /match/ POST data:\nJob: {request.job}\nCandidate: {request.candidate}")
+        _check_engine(engine)
+        _check_weights(request.job.weights, request.weights)
 
-        match_result["matching_skills"] = matching_skills
+        async def compute():
+            # Validated models go straight to the matcher, dumped only once
+            charge = await _admit(1)
+            try:
+                return await run_in_threadpool(
+                    matcher.match, request.job, request.candidate, engine, request.weights
+                )
+            finally:
+                admission.release(charge)
 
+        match_result = await results_cache.run(
+            _request_key("match", http_request, request), compute
+        )
         return match_result
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in /match/: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error calculating match: {str(e)}")
 
+def _format_match(candidate, match_result, paths, include_candidate):
+    """Build one batch result record, honouring the field projection."""
+    result = {}
+    if include_candidate:
+        result["candidate"] = candidate
+    elif candidate.get("id") is not None:
+        result["candidate"] = {"id": candidate["id"]}
+    result["match_score"] = match_result["overall_match_score"]
+    result["category_scores"] = match_result["category_scores"]
+    result["engine"] = match_result["engine"]
+    if "matching_skills" in match_result:
+        result["matching_skills"] = match_result["matching_skills"]
+    if "prefilter_score" in match_result:
+        result["prefilter_score"] = match_result["prefilter_score"]
+    if "degraded" in match_result:
+        result["degraded"] = match_result["degraded"]
+    return project(result, paths)
+
+def _profile_filter(
+    location: Optional[List[str]] = Query(None),
+    job_type: Optional[List[str]] = Query(None),
+    contract_type: Optional[List[str]] = Query(None),
+    degree: Optional[List[str]] = Query(None),
+    min_years: Optional[int] = None,
+    skills: Optional[List[str]] = Query(None),
+):
+    """Facet filter from the query string; repeated values of a facet are alternatives."""
+    return facet_filter(location, job_type, contract_type, degree, min_years, skills)
+
+def _candidate_filter(profile_filter=Depends(_profile_filter)):
+    """Facet filter for candidates; raises a 400 for facets candidates do not have."""
+    if profile_filter is not None:
+        unsupported = [facet for facet in profile_filter[0] if facet not in CANDIDATE_FACETS]
+        if unsupported:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Candidates cannot be filtered by: {', '.join(unsupported)}",
+            )
+    return profile_filter
+
+def _validate_batch_request(request):
+    """Return (job, candidates) from a batch body or raise a 400."""
+    job = request.job
+    candidates = request.candidates
+
+    if not job or not candidates:
+        raise HTTPException(
+            status_code=400, detail="Both job and candidates are required"
+        )
+    return job, candidates
+
 @app.post("/batch-match/")
-async def batch_match_candidates(request: dict):
+async def batch_match_candidates(
+    request: BatchMatchRequest,
+    http_request: Request,
+    fields: Optional[str] = None,
+    include_candidate: bool = True,
+    batch_size: int = 32,
+    top_k: Optional[int] = None,
+    cascade: bool = False,
+    cascade_fraction: float = 0.2,
+    cascade_floor: Optional[float] = None,
+    recall_k: Optional[int] = None,
+    engine: str = "auto",
+    deadline_ms: Optional[float] = None,
+    result_set: bool = False,
+    profile_filter=Depends(_candidate_filter),
+):
     try:
         logging.info(f"Received /batch-match/ POST data:\n{request}")
 
-        job = request.get("job")
-        candidates = request.get("candidates", [])
+        job, candidates = _validate_batch_request(request)
+        _check_engine(engine)
+        weights = _check_weights(job.weights, request.weights)
+        _check_top_k(top_k)
+        try:
+            deadline = parse_deadline(http_request.headers.get(DEADLINE_HEADER), deadline_ms)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid deadline: {str(e)}")
+        if cascade and deadline is not None:
+            # The cascade has no budget checks, so the deadline would be ignored
+            raise HTTPException(
+                status_code=400, detail="cascade cannot be combined with a deadline"
+            )
+
+        # Only compute and echo what the client asked for
+        paths = parse_fields(fields)
+        include_candidate = include_candidate and wants_field(paths, "candidate")
+        include_skills = wants_field(paths, "matching_skills")
+
+        async def compute():
+            response = {}
+            kept = candidates
+            features = None
+            if profile_filter is not None:
+                # Hard filters drop candidates before anything is encoded; their
+                # feature records are reused for scoring
+                kept, features = await run_in_threadpool(
+                    matcher.filter_candidates, candidates, profile_filter
+                )
+                response["filter"] = {"kept": len(kept), "dropped": len(candidates) - len(kept)}
+            charge = await _admit(len(kept))
+            try:
+                if not kept:
+                    pairs = []
+                elif cascade:
+                    # Cheap prefilter first; only the best candidates are encoded
+                    scored, response["cascade"] = await run_in_threadpool(
+                        matcher.cascade_scores,
+                        job,
+                        kept,
+                        cascade_fraction,
+                        cascade_floor,
+                        top_k or 0,
+                        include_skills,
+                        batch_size,
+                        recall_k,
+                        engine,
+                        request.weights,
+                        features,
+                    )
+                    pairs = [(candidate, match_result) for _, candidate, match_result in scored]
+                elif deadline is not None:
+                    # Score until the client leaves or the budget runs out
+                    prepared_job = await run_in_threadpool(
+                        matcher.prepare_job, job, engine, request.weights
+                    )
+                    scored, response["deadline"] = await score_within_deadline(
+                        matcher,
+                        prepared_job,
+                        kept,
+                        deadline,
+                        batch_size,
+                        include_skills,
+                        allow_degrade=engine == "auto",
+                        is_disconnected=http_request.is_disconnected,
+                        features=features,
+                    )
+                    pairs = [(candidate, match_result) for _, candidate, match_result in scored]
+                elif sharded.applies(kept):
+                    pairs = await run_in_threadpool(
+                        sharded.score,
+                        job,
+                        kept,
+                        batch_size,
+                        include_skills,
+                        engine,
+                        request.weights,
+                    )
+                else:
+                    pairs = await run_in_threadpool(
+                        lambda: [
+                            pair
+                            for batch in matcher.iter_batch_scores(
+                                job,
+                                kept,
+                                batch_size,
+                                include_skills,
+                                engine,
+                                request.weights,
+                                features,
+                            )
+                            for pair in batch
+                        ]
+                    )
+            finally:
+                admission.release(charge)
+
+            if result_set:
+                # Every scored candidate, so re-weighting can promote any of them
+                response["result_set_id"] = _store_result_set(
+                    pairs,
+                    lambda candidate, match_result: _format_match(
+                        candidate, match_result, paths, include_candidate
+                    ),
+                    weights,
+                )
+
+            if top_k is not None:
+                ranking = TopK(top_k)
+                for candidate, match_result in pairs:
+                    ranking.push(match_result["overall_match_score"], (candidate, match_result))
+                pairs = [pair for _, pair in ranking.ranked()]
+
+            results = [
+                _format_match(candidate, match_result, paths, include_candidate)
+                for candidate, match_result in pairs
+            ]
+            logging.info(f"Received /batch-match/ matches:\n{results}")
+            return {"matches": results, **response}
+
+        if deadline is None:
+            response = await results_cache.run(
+                _request_key("batch-match", http_request, request), compute
+            )
+        else:
+            # Deadline-bound results depend on timing, so they are not shared
+            response = await compute()
+        return negotiated_response(response, http_request.headers.get("accept"))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in /batch-match/: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error in batch matching: {str(e)}")
+
+@app.post("/batch-match/stream/")
+async def batch_match_candidates_stream(
+    request: BatchMatchRequest,
+    fields: Optional[str] = None,
+    include_candidate: bool = True,
+    batch_size: int = 32,
+    summary: bool = False,
+    engine: str = "auto",
+):
+    """Stream batch results as NDJSON, one micro-batch at a time."""
+    job, candidates = _validate_batch_request(request)
+    _check_engine(engine)
+    _check_weights(job.weights, request.weights)
+    logging.info(f"Received /batch-match/stream/ POST with {len(candidates)} candidates")
+
+    paths = parse_fields(fields)
+    include_candidate = include_candidate and wants_field(paths, "candidate")
+    include_skills = wants_field(paths, "matching_skills")
+    charge = await _admit(len(candidates))
+
+    def generate():
+        started = time.perf_counter()
+        matches = 0
+        batches = 0
+        try:
+            for batch in matcher.iter_batch_scores(
+                job, candidates, batch_size, include_skills, engine, request.weights
+            ):
+                lines = [
+                    dumps(_format_match(candidate, match_result, paths, include_candidate))
+                    for candidate, match_result in batch
+                ]
+                matches += len(lines)
+                batches += 1
+                yield b"\n".join(lines) + b"\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logging.error(f"Error in /batch-match/stream/: {str(e)}")
+            yield dumps({"error": f"Error in batch matching: {str(e)}"}) + b"\n"
+            return
+
+        if summary:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            yield dumps(
+                {
+                    "summary": {
+                        "matches": matches,
+                        "batches": batches,
+                        "elapsed_ms": round(elapsed_ms, 2),
+                    }
+                }
+            ) + b"\n"
+
+    return _AdmittedStreamingResponse(charge, generate(), media_type="application/x-ndjson")
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """Streaming response that returns its admission charge however it ends.
+
+    A generator that was never started does not run its `finally` when
+    closed, and background tasks are skipped when the client disconnects,
+    so the charge is released around the whole response instead.
+    """
+
+    def __init__(self, charge, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.charge = charge
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.release(self.charge)
+
+@app.post("/batch-match/upload/")
+async def batch_match_upload(
+    http_request: Request,
+    fields: Optional[str] = None,
+    include_candidate: bool = True,
+    batch_size: int = 32,
+    summary: bool = False,
+    engine: str = "auto",
+):
+    """Score a large upload while it is still being received.
+
+    The body is either a JSON object whose `job` (and optional `weights`)
+    keys precede its `candidates` array, or NDJSON (`Content-Type:
+    application/x-ndjson`) whose first record is `{"job": ..., "weights": ...}`
+    followed by one candidate per line.
+    Candidates are parsed incrementally and scored one micro-batch at a
+    time, so memory is bounded by `batch_size` rather than the upload size.
+    Results are returned as NDJSON.
+    """
+    _check_engine(engine)
+    content_type = http_request.headers.get("content-type", "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = iter_ndjson_upload(http_request.stream())
+    else:
+        records = iter_batch_upload(http_request.stream())
+
+    paths = parse_fields(fields)
+    include_candidate = include_candidate and wants_field(paths, "candidate")
+    include_skills = wants_field(paths, "matching_skills")
 
-        if not job or not candidates:
+    async def score_and_write(prepared_job, batch):
+        # Uploads are admitted one micro-batch at a time
+        charge = await _admit(len(batch))
+        try:
+            await run_in_threadpool(write_scores, prepared_job, batch)
+        finally:
+            admission.release(charge)
+
+    def write_scores(prepared_job, batch):
+        scored = matcher.score_batch(prepared_job, batch, include_skills)
+        for candidate, match_result in scored:
+            output.write(
+                dumps(_format_match(candidate, match_result, paths, include_candidate))
+                + b"\n"
+            )
+
+    started = time.perf_counter()
+    output = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    job = None
+    weights = None
+    prepared_job = None
+    batch = []
+    matches = 0
+    batches = 0
+    try:
+        async for kind, record in records:
+            if kind == "job":
+                job = Job.model_validate(record)
+                continue
+            if kind == "weights":
+                weights = _upload_weights.validate_python(record)
+                continue
+
+            if prepared_job is None:
+                # Weights arrive before the first candidate, so the job is
+                # prepared once both are known
+                _check_weights(job.weights, weights)
+                prepared_job = await run_in_threadpool(matcher.prepare_job, job, engine, weights)
+            batch.append(Candidate.model_validate(record))
+            if len(batch) >= batch_size:
+                await score_and_write(prepared_job, batch)
+                matches += len(batch)
+                batches += 1
+                batch = []
+
+        if batch and prepared_job is not None:
+            await score_and_write(prepared_job, batch)
+            matches += len(batch)
+            batches += 1
+
+        if prepared_job is None or not matches:
             raise HTTPException(
                 status_code=400, detail="Both job and candidates are required"
             )
+    except HTTPException:
+        output.close()
+        raise
+    except (UploadFormatError, ValidationError, json.JSONDecodeError) as e:
+        output.close()
+        raise HTTPException(status_code=400, detail=f"Invalid upload body: {str(e)}")
+    except Exception as e:
+        output.close()
+        logging.error(f"Error in /batch-match/upload/: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error in batch matching: {str(e)}")
 
-        results = []
-        for candidate in candidates:
-            match_result = matcher.calculate_match_score(job, candidate)
-            matching_skills = matcher.get_matching_skills(job, candidate)
-
-            results.append(
+    logging.info(f"Scored /batch-match/upload/ with {matches} candidates in {batches} batches")
+    if summary:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        output.write(
+            dumps(
                 {
-                    "candidate": candidate,
-                    "match_score": match_result["overall_match_score"],
-                    "category_scores": match_result["category_scores"],
-                    "matching_skills": matching_skills,
+                    "summary": {
+                        "matches": matches,
+                        "batches": batches,
+                        "elapsed_ms": round(elapsed_ms, 2),
+                    }
                 }
             )
-        logging.info(f"Received /batch-match/ matches:\n{results}")
-        return {"matches": results}
-    
+            + b"\n"
+        )
+
+    output.seek(0)
+    return StreamingResponse(
+        iter(lambda: output.read(64 * 1024), b""),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(output.close),
+    )
+
+def _format_applicant(applicant, match_result):
+    """Build one ranked applicant record (without its rank)."""
+    result = {
+        "candidate_data": applicant,
+        "candidate_id": applicant.get("candidateId"),
+        "status": applicant.get("status"),
+        "match_score": match_result["overall_match_score"],
+        "category_scores": match_result["category_scores"],
+        "matching_skills": match_result["matching_skills"],
+        "engine": match_result["engine"],
+    }
+    if "prefilter_score" in match_result:
+        result["prefilter_score"] = match_result["prefilter_score"]
+    return result
+
+@app.post("/applied-candidates-match/")
+async def applied_candidates_match(
+    request: AppliedCandidateMatchRequest,
+    http_request: Request,
+    top_k: Optional[int] = None,
+    min_score: float = 0.0,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    batch_size: int = 32,
+    cascade: bool = False,
+    cascade_fraction: float = 0.2,
+    cascade_floor: Optional[float] = None,
+    recall_k: Optional[int] = None,
+    engine: str = "auto",
+    result_set: bool = False,
+):
+    """Rank a job's applicants, best match first.
+
+    The job is encoded once and applicants are scored together in encoded
+    micro-batches. A bounded heap keeps only the `top_k` (or the requested
+    page) applicants scoring at least `min_score`. With `cascade`, a cheap
+    keyword prefilter decides which applicants are encoded at all.
+    """
+    try:
+        logging.info(
+            f"Received /applied-candidates-match/ POST with "
+            f"{len(request.applied_candidates)} applicants"
+        )
+        _check_top_k(top_k)
+        if offset < 0 or (limit is not None and limit < 0):
+            raise HTTPException(status_code=400, detail="offset and limit must be non-negative")
+        _check_engine(engine)
+        weights = _check_weights(request.job.weights, request.weights)
+
+        async def compute():
+            applicants = [a.model_dump(exclude_none=True) for a in request.applied_candidates]
+            converted = (matcher.convert_applied_candidate_format(a) for a in applicants)
+
+            kept = page_size(top_k, offset, limit)
+            ranking = TopK(kept, min_score)
+            scored_all = []
+
+            def push(index, match_result):
+                ranking.push(match_result["overall_match_score"], (index, match_result))
+                if result_set:
+                    scored_all.append((index, match_result))
+
+            def score_all():
+                """Score applicants into the ranking; returns cascade stats if any."""
+                if cascade:
+                    scored, cascade_stats = matcher.cascade_scores(
+                        request.job,
+                        list(converted),
+                        cascade_fraction,
+                        cascade_floor,
+                        kept or 0,
+                        True,
+                        batch_size,
+                        recall_k,
+                        engine,
+                        request.weights,
+                    )
+                    for index, _, match_result in scored:
+                        push(index, match_result)
+                    return cascade_stats
+
+                index = 0
+                for batch in matcher.iter_batch_scores(
+                    request.job,
+                    converted,
+                    batch_size,
+                    include_skills=True,
+                    engine=engine,
+                    weights=request.weights,
+                ):
+                    for _, match_result in batch:
+                        push(index, match_result)
+                        index += 1
+                return None
+
+            charge = await _admit(len(applicants))
+            try:
+                cascade_stats = await run_in_threadpool(score_all)
+            finally:
+                admission.release(charge)
+
+            matches = [
+                {"rank": rank, **_format_applicant(applicants[i], match_result)}
+                for rank, _, (i, match_result) in paginate(ranking.ranked(), offset, limit)
+            ]
+
+            total_matches = ranking.accepted if top_k is None else min(top_k, ranking.accepted)
+            response = {
+                "matches": matches,
+                "total_candidates": len(applicants),
+                "total_matches": total_matches,
+                "offset": offset,
+                "limit": limit,
+            }
+            if cascade_stats is not None:
+                response["cascade"] = cascade_stats
+            if result_set:
+                response["result_set_id"] = _store_result_set(
+                    scored_all,
+                    lambda i, match_result: _format_applicant(applicants[i], match_result),
+                    weights,
+                )
+            return response
+
+        response = await results_cache.run(
+            _request_key("applied-candidates-match", http_request, request), compute
+        )
+        return negotiated_response(response, http_request.headers.get("accept"))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in /applied-candidates-match/: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error in applied candidates matching: {str(e)}")
+
+@app.post("/rerank/")
+async def rerank_result_set(request: RerankRequest, http_request: Request):
+    """Re-rank a stored result set under new category weights.
+
+    Overall scores are recomputed from the stored raw category scores, so
+    nothing is re-encoded or rescored. Weights override the weights the set
+    was scored with (including job and request weights) for the categories
+    they name.
+    """
+    stored = result_sets.get(request.result_set_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired result set")
+    entries, scored_weights = stored
+    weights = _check_weights(scored_weights, request.weights)
+    _check_top_k(request.top_k)
+    if request.offset < 0 or (request.limit is not None and request.limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must be non-negative")
+
+    ranking = TopK(page_size(request.top_k, request.offset, request.limit), request.min_score)
+    for record, raw_scores, job_type_bonus in entries:
+        ranking.push(matcher.overall_score(raw_scores, job_type_bonus, weights), record)
+
+    matches = [
+        {"rank": rank, **record, "match_score": score}
+        for rank, score, record in paginate(ranking.ranked(), request.offset, request.limit)
+    ]
+    total_matches = (
+        ranking.accepted if request.top_k is None else min(request.top_k, ranking.accepted)
+    )
+    return negotiated_response(
+        {
+            "result_set_id": request.result_set_id,
+            "weights": weights,
+            "matches": matches,
+            "total_candidates": ranking.seen,
+            "total_matches": total_matches,
+            "offset": request.offset,
+            "limit": request.limit,
+        },
+        http_request.headers.get("accept"),
+    )
+
+@app.post("/lite/fit/")
+async def fit_lite_engine(request: LiteFitRequest):
+    """Fit the lite (BM25) engine on a corpus of jobs and candidates.
+
+    The learned term statistics are saved to `LITE_INDEX_PATH` and loaded
+    again on startup.
+    """
+    try:
+        logging.info(
+            f"Received /lite/fit/ POST with {len(request.jobs)} jobs and "
+            f"{len(request.candidates)} candidates"
+        )
+        fitted = await run_in_threadpool(matcher.fit_lite, request.jobs, request.candidates)
+        results_cache.clear()
+        return fitted
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error in /lite/fit/: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error fitting lite engine: {str(e)}")
+
+@app.delete("/score-cache/jobs/{job_id}")
+async def invalidate_job_scores(job_id: str):
+    """Forget every cached pair score of a job (e.g. after it was edited)."""
+    removed = await run_in_threadpool(matcher.score_cache.invalidate, job_id=job_id)
+    # Cached responses may still carry the forgotten scores
+    results_cache.clear()
+    return {"job_id": job_id, "removed": removed}
+
+@app.delete("/score-cache/candidates/{candidate_id}")
+async def invalidate_candidate_scores(candidate_id: str):
+    """Forget every cached pair score of a candidate."""
+    removed = await run_in_threadpool(
+        matcher.score_cache.invalidate, candidate_id=candidate_id
+    )
+    results_cache.clear()
+    return {"candidate_id": candidate_id, "removed": removed}
+
+# Snapshot versions that failed to load (e.g. built with another model)
+_skipped_snapshots = set()
+
+async def _follow_snapshot():
+    """Switch to a snapshot published (by this or another worker) since the last check."""
+    if not SNAPSHOT_PATH or hot_swap.running:
+        return
+    version = current_version(SNAPSHOT_PATH)
+    if version is None or version == matcher.store_version or version in _skipped_snapshots:
+        return
+    try:
+        await run_in_threadpool(matcher.load_stores, SNAPSHOT_PATH, version)
+        logging.info(f"Switched to store snapshot {version}")
+    except Exception as e:
+        _skipped_snapshots.add(version)
+        logging.error(f"Could not load store snapshot {version}: {str(e)}")
+
+def _require_admin(authorization: Optional[str] = Header(None)):
+    """Reject requests without the admin bearer token (403 when none is configured)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)"
+        )
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@app.post("/admin/swap/", status_code=202, dependencies=[Depends(_require_admin)])
+async def start_hot_swap(request: SwapRequest):
+    """Prepare a new model and/or store snapshot in the background, then flip to it.
+
+    Without a snapshot the stored profiles are re-embedded with the new
+    model first. Progress and the flip are reported by `GET /admin/swap/`
+    and `GET /metrics/`.
+    """
+    if request.model_name is None and request.snapshot_version is None:
+        raise HTTPException(status_code=400, detail="Give a model_name and/or a snapshot_version")
+    if request.snapshot_version is not None:
+        if not SNAPSHOT_PATH:
+            raise HTTPException(status_code=400, detail="Snapshots are disabled (SNAPSHOT_PATH is empty)")
+        # Only published versions, so the name cannot point outside SNAPSHOT_PATH
+        if request.snapshot_version not in list_snapshots(SNAPSHOT_PATH):
+            raise HTTPException(status_code=404, detail="Snapshot version is not published")
+    try:
+        hot_swap.start(request.model_name, SNAPSHOT_PATH, request.snapshot_version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logging.info(f"Started hot swap to {request.model_dump(exclude_none=True)}")
+    return hot_swap.stats()
+
+@app.get("/admin/swap/")
+async def get_hot_swap():
+    return hot_swap.stats()
+
+@app.post("/snapshots/", dependencies=[Depends(_require_admin)])
+async def publish_snapshot():
+    """Publish the candidate and job stores as a new snapshot for all workers."""
+    if not SNAPSHOT_PATH:
+        raise HTTPException(status_code=400, detail="Snapshots are disabled (SNAPSHOT_PATH is empty)")
+    version = await run_in_threadpool(matcher.publish_stores, SNAPSHOT_PATH)
+    logging.info(f"Published store snapshot {version}")
+    return {"version": version}
+
+@app.get("/snapshots/")
+async def get_snapshots():
+    return {
+        "current": current_version(SNAPSHOT_PATH) if SNAPSHOT_PATH else None,
+        "loaded": matcher.store_version,
+        "versions": list_snapshots(SNAPSHOT_PATH) if SNAPSHOT_PATH else [],
+    }
+
+_ingest_validators = {
+    "candidates": RecordValidator(Candidate),
+    "jobs": RecordValidator(Job),
+}
+
+@app.post("/ingest/{kind}/")
+async def ingest_profiles(kind: str, http_request: Request, batch_size: int = 64):
+    """Bulk-load candidates or jobs into their store.
+
+    The body is NDJSON (one record per line) or, with `Content-Type:
+    application/vnd.apache.arrow.stream` and pyarrow installed, an Arrow
+    IPC stream whose columns are the record fields. Records are validated,
+    encoded and written `INGEST_BATCH_ROWS` at a time; identical section
+    texts within a batch are encoded once. Invalid rows (including NDJSON
+    lines that are not valid JSON) are skipped and reported; a later record
+    with the same id replaces an earlier one. When the body cannot be read
+    any further, the error detail says how many rows were stored, so the
+    client can resume after `received`.
+    A coordinator forwards candidates to the shards owning their ids and
+    jobs to every shard, where they are validated and encoded.
+    """
+    validator = _ingest_validators.get(kind)
+    if validator is None:
+        raise HTTPException(status_code=404, detail="kind must be candidates or jobs")
+    store_profiles = matcher.store_candidates if kind == "candidates" else matcher.store_jobs
+
+    content_type = http_request.headers.get("content-type", "").lower()
+    arrow = content_type.startswith(ARROW_STREAM_TYPE)
+
+    async def batches():
+        if not arrow:
+            batch = []
+            async for record in iter_ndjson(http_request.stream(), skip_invalid=True):
+                batch.append(record)
+                if len(batch) >= INGEST_BATCH_ROWS:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+        # The Arrow reader is synchronous, so the body is spooled first
+        with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES) as body:
+            async for chunk in http_request.stream():
+                body.write(chunk)
+            body.seek(0)
+            reader = iter_arrow_batches(body, INGEST_BATCH_ROWS)
+            while True:
+                batch = await run_in_threadpool(next, reader, None)
+                if batch is None:
+                    return
+                yield batch
+
+    started = time.perf_counter()
+    received = stored = 0
+    errors = []
+    rejected = 0
+
+    def failed(status_code, message):
+        # Earlier batches are already stored; rows from `received` on are not
+        return HTTPException(
+            status_code=status_code,
+            detail={"error": message, "received": received, "stored": stored, "rejected": rejected},
+        )
+
+    try:
+        async for batch in batches():
+            if coordinator is not None:
+                batch_stored, batch_rejected, batch_errors = await coordinator.ingest(
+                    kind, batch, received
+                )
+                received += len(batch)
+                stored += batch_stored
+                rejected += batch_rejected
+                errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                continue
+            valid, batch_errors = await run_in_threadpool(validator.validate, batch, received)
+            received += len(batch)
+            rejected += len(batch_errors)
+            errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+            if not valid:
+                continue
+            valid = dedupe_ids(valid)
+            charge = await _admit(len(valid))
+            try:
+                stored += await run_in_threadpool(store_profiles, valid, batch_size)
+            finally:
+                admission.release(charge)
+    except HTTPException:
+        raise
+    except (UploadFormatError, json.JSONDecodeError) as e:
+        raise failed(400, f"Invalid upload body: {str(e)}")
+    except ShardError as e:
+        raise failed(e.status_code, str(e))
+    except RuntimeError as e:
+        raise failed(503, str(e))
+    except Exception as e:
+        logging.error(f"Error in /ingest/{kind}/: {str(e)}")
+        raise failed(500, f"Error ingesting {kind}: {str(e)}")
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = round(received / elapsed, 1) if elapsed else 0.0
+    logging.info(
+        f"Ingested {stored} of {received} {kind} in {elapsed:.2f}s ({rows_per_second} rows/s)"
+    )
+    return {
+        "kind": kind,
+        "received": received,
+        "stored": stored,
+        "rejected": rejected,
+        "errors": [{"row": row, "error": error} for row, error in errors],
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_second": rows_per_second,
+    }
+
+async def _forward_write(method, path, profile_id=None, **kwargs):
+    """Relay a store write to the shard owning `profile_id`, or to every shard."""
+    try:
+        response = await coordinator.write(method, path, profile_id, **kwargs)
+    except ShardError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return JSONResponse(status_code=response.status_code, content=response.json())
+
+@app.put("/candidates/{candidate_id}")
+async def store_candidate(candidate_id: str, candidate: Candidate):
+    """Encode a candidate and add (or replace) it in the candidate store."""
+    candidate.id = candidate_id
+    if coordinator is not None:
+        return await _forward_write(
+            "PUT",
+            f"/candidates/{candidate_id}",
+            candidate_id,
+            json=candidate.model_dump(exclude_none=True),
+        )
+    try:
+        await run_in_threadpool(matcher.store_candidates, [candidate])
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"candidate_id": candidate_id, "stored": True}
+
+@app.delete("/candidates/{candidate_id}")
+async def remove_candidate(candidate_id: str):
+    if coordinator is not None:
+        return await _forward_write("DELETE", f"/candidates/{candidate_id}", candidate_id)
+    removed = matcher.remove_profile("candidate_store", candidate_id)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Candidate is not stored")
+    return {"candidate_id": candidate_id, "removed": removed}
+
+@app.put("/jobs/{job_id}")
+async def store_job(job_id: str, job: Job):
+    """Encode a job and add (or replace) it in the job store."""
+    job.id = job_id
+    if coordinator is not None:
+        # Jobs are kept on every shard
+        return await _forward_write("PUT", f"/jobs/{job_id}", json=job.model_dump(exclude_none=True))
+    try:
+        await run_in_threadpool(matcher.store_jobs, [job])
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"job_id": job_id, "stored": True}
+
+@app.get("/jobs/")
+async def list_jobs(http_request: Request, profile_filter=Depends(_profile_filter)):
+    """Ids of the stored jobs, optionally only those passing the facet filters."""
+    if coordinator is not None:
+        # Every shard holds every job
+        try:
+            bodies, _ = await coordinator.gather(
+                "GET", "/jobs/", params=list(http_request.query_params.multi_items())
+            )
+        except ShardError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return bodies[0]
+    await _follow_snapshot()
+    job_ids = matcher.stored_ids("job_store", profile_filter)
+    return {"job_ids": job_ids, "total": len(job_ids)}
+
+@app.delete("/jobs/{job_id}")
+async def remove_job(job_id: str):
+    if coordinator is not None:
+        return await _forward_write("DELETE", f"/jobs/{job_id}")
+    removed = matcher.remove_profile("job_store", job_id)
+    if not removed:
+        raise HTTPException(status_code=404, detail="Job is not stored")
+    return {"job_id": job_id, "removed": removed}
+
+async def _top_candidates(prepared_job, top_k, rerank_k, include_skills, profile_filter, http_request):
+    """Rank stored candidates for a prepared job and build the response."""
+    await _follow_snapshot()
+    if top_k < 1 or (rerank_k is not None and rerank_k < 1):
+        raise HTTPException(status_code=400, detail="top_k and rerank_k must be positive")
+    charge = await _admit(top_k)
+    try:
+        ranked, scanned = await run_in_threadpool(
+            matcher.top_candidates, prepared_job, top_k, rerank_k, include_skills, profile_filter
+        )
+    finally:
+        admission.release(charge)
+    matches = [
+        {
+            "rank": rank,
+            "candidate_id": candidate_id,
+            "match_score": score,
+            "category_scores": match_result["category_scores"],
+            "scan_score": match_result["scan_score"],
+            "engine": match_result["engine"],
+            **(
+                {"matching_skills": match_result["matching_skills"]}
+                if include_skills
+                else {}
+            ),
+        }
+        for rank, score, (candidate_id, match_result) in paginate(ranked)
+    ]
+    return negotiated_response(
+        {"matches": matches, "total_candidates": scanned},
+        http_request.headers.get("accept"),
+    )
+
+async def _gather_top_candidates(method, path, top_k, http_request, **kwargs):
+    """Fan a top-candidates query out to the shards and merge their top-k lists."""
+    try:
+        merged = await coordinator.top_candidates(
+            method, path, top_k, params=list(http_request.query_params.multi_items()), **kwargs
+        )
+    except ShardError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return negotiated_response(merged, http_request.headers.get("accept"))
+
+@app.get("/jobs/{job_id}/top-candidates/")
+async def stored_job_top_candidates(
+    job_id: str,
+    http_request: Request,
+    top_k: int = 10,
+    rerank_k: Optional[int] = None,
+    include_skills: bool = False,
+    profile_filter=Depends(_candidate_filter),
+):
+    """Best stored candidates for a stored job.
+
+    The candidate store is scanned with quantized section vectors and the
+    best `rerank_k` candidates are re-scored exactly. Facet filters in the
+    query string restrict the scan to the candidates passing them.
+    """
+    if coordinator is not None:
+        return await _gather_top_candidates(
+            "GET", f"/jobs/{job_id}/top-candidates/", top_k, http_request
+        )
+    await _follow_snapshot()
+    prepared_job = matcher.prepare_stored_job(job_id)
+    if prepared_job is None:
+        raise HTTPException(status_code=404, detail="Job is not stored")
+    return await _top_candidates(
+        prepared_job, top_k, rerank_k, include_skills, profile_filter, http_request
+    )
+
+@app.post("/top-candidates/")
+async def top_candidates(
+    request: TopCandidatesRequest,
+    http_request: Request,
+    top_k: int = 10,
+    rerank_k: Optional[int] = None,
+    include_skills: bool = False,
+    profile_filter=Depends(_candidate_filter),
+):
+    """Best stored candidates for the job in the request body."""
+    _check_weights(request.job.weights, request.weights)
+    if coordinator is not None:
+        return await _gather_top_candidates(
+            "POST", "/top-candidates/", top_k, http_request, json=request.model_dump(exclude_none=True)
+        )
+    try:
+        prepared_job = await run_in_threadpool(
+            matcher.prepare_job, request.job, "model", request.weights
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return await _top_candidates(
+        prepared_job, top_k, rerank_k, include_skills, profile_filter, http_request
+    )
+
+@app.post("/match-matrix/")
+async def match_matrix(request: MatchMatrixRequest, http_request: Request):
+    """Match scores of stored jobs (rows) against stored candidates (columns).
+
+    Scores come from the stored section vectors, so nothing is encoded.
+    Unknown ids get null scores and are listed as missing.
+    """
+    if not request.job_ids or not request.candidate_ids:
+        raise HTTPException(status_code=400, detail="Both job_ids and candidate_ids are required")
+    _check_weights(request.weights)
+    if coordinator is not None:
+        try:
+            response = await coordinator.match_matrix(
+                request.job_ids, request.candidate_ids, request.weights
+            )
+        except ShardError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        return negotiated_response(response, http_request.headers.get("accept"))
+
+    await _follow_snapshot()
+    charge = await _admit(len(request.job_ids) * len(request.candidate_ids))
+    try:
+        scores, missing_jobs, missing_candidates = await run_in_threadpool(
+            matcher.match_matrix, request.job_ids, request.candidate_ids, request.weights
+        )
+    finally:
+        admission.release(charge)
+    return negotiated_response(
+        {
+            "job_ids": request.job_ids,
+            "candidate_ids": request.candidate_ids,
+            "scores": scores,
+            "missing_jobs": missing_jobs,
+            "missing_candidates": missing_candidates,
+        },
+        http_request.headers.get("accept"),
+    )
+
+def _resolve_threshold(threshold):
+    """Default and validate a similarity threshold."""
+    if threshold is None:
+        return 0.85
+    if not 0.0 <= threshold <= 1.0:
+        raise HTTPException(
+            status_code=400, detail="similarity_threshold must be between 0 and 1"
+        )
+    return threshold
+
+async def _compare_one_to_many(candidate, others, threshold):
+    """Compare one applicant against others with a single vectorized product."""
+    _check_model()
+    # Encoding is CPU bound; keep it off the event loop
+    charge = await _admit(len(others) + 1)
+    try:
+        return await run_in_threadpool(_compare_profiles, candidate, others, threshold)
+    finally:
+        admission.release(charge)
+
+def _compare_profiles(candidate, others, threshold):
+    applicants = [candidate.model_dump(exclude_none=True)]
+    applicants += [c.model_dump(exclude_none=True) for c in others]
+
+    # Section embeddings come from the cache for applicants seen before
+    vectors = matcher.applicant_vectors(applicants)
+    scores = vectors[1:] @ vectors[0]
+
+    keys = set(identity_keys(applicants[0]))
+    comparisons = []
+    for i, (applicant, score) in enumerate(zip(applicants[1:], scores.tolist())):
+        same_identity = bool(keys.intersection(identity_keys(applicant)))
+        comparisons.append(
+            {
+                "candidate_index": i,
+                "candidate_name": applicant.get("applicantName", ""),
+                "similarity_score": round(max(score, 0.0), 4),
+                "is_likely_duplicate": same_identity or score >= threshold,
+            }
+        )
+    return applicants[0], comparisons
+
+@app.post("/compare-candidates/")
+async def compare_candidates(request: CompareCandidatesRequest):
+    """Compare two applicants on their profile embeddings."""
+    try:
+        threshold = _resolve_threshold(request.similarity_threshold)
+        first, comparisons = await _compare_one_to_many(
+            request.candidate1, [request.candidate2], threshold
+        )
+        comparison = comparisons[0]
+        return {
+            "similarity_score": comparison["similarity_score"],
+            "is_likely_duplicate": comparison["is_likely_duplicate"],
+            "candidate1_name": first.get("applicantName", ""),
+            "candidate2_name": comparison["candidate_name"],
+        }
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error in /batch-match/: {str(e)}")
+        logging.error(f"Error in /compare-candidates/: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error comparing candidates: {str(e)}")
+
+@app.post("/compare-candidates/bulk/")
+async def compare_candidates_bulk(request: BulkCompareCandidatesRequest, http_request: Request):
+    """Compare one applicant against a list in a single vectorized call."""
+    try:
+        threshold = _resolve_threshold(request.similarity_threshold)
+        first, comparisons = await _compare_one_to_many(
+            request.candidate, request.candidates, threshold
+        )
+        return negotiated_response(
+            {
+                "candidate_name": first.get("applicantName", ""),
+                "comparisons": comparisons,
+            },
+            http_request.headers.get("accept"),
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in /compare-candidates/bulk/: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Error comparing candidates: {str(e)}")
+
+def _duplicate_groups(applicants, threshold):
+    """Duplicate groups of applicants, each with its members' similarity to the primary."""
+    vectors = matcher.applicant_vectors(applicants)
+    groups, similarities = find_duplicate_groups(
+        vectors, threshold, [identity_keys(a) for a in applicants]
+    )
+
+    scored = []
+    for group in groups:
+        primary = group[0]
+        scores = []
+        for i in group[1:]:
+            # Members joined transitively have no verified pair with the primary
+            similarity = similarities.get((primary, i))
+            if similarity is None:
+                similarity = float(vectors[primary] @ vectors[i])
+            scores.append({"candidate_index": i, "similarity": round(similarity, 4)})
+        scored.append((group, scores))
+    return scored
+
+@app.post("/detect-duplicates/")
+async def detect_duplicates(request: DuplicateCheckRequest, http_request: Request):
+    """Group applicants that are likely the same person.
+
+    Applicants are compared on their profile embeddings. Large lists only
+    verify pairs that collide in random-hyperplane LSH buckets, and shared
+    emails or phone numbers always count as duplicates. Matching pairs are
+    merged into groups with union-find.
+    """
+    try:
+        threshold = _resolve_threshold(request.similarity_threshold)
+
+        applicants = [a.model_dump(exclude_none=True) for a in request.applied_candidates]
+        logging.info(f"Received /detect-duplicates/ POST with {len(applicants)} applicants")
+
+        _check_model()
+        # Encoding and LSH bucketing are CPU bound; keep them off the event loop
+        charge = await _admit(len(applicants))
+        try:
+            groups = await run_in_threadpool(_duplicate_groups, applicants, threshold)
+        finally:
+            admission.release(charge)
+
+        duplicate_groups = [
+            {
+                "primary_candidate": applicants[group[0]],
+                "candidates": [applicants[i] for i in group],
+                "similarity_scores": scores,
+            }
+            for group, scores in groups
+        ]
+
+        total_duplicates = sum(len(group) - 1 for group, _ in groups)
+        return negotiated_response(
+            {
+                "duplicate_groups": duplicate_groups,
+                "total_duplicates": total_duplicates,
+                "unique_candidates": len(applicants) - total_duplicates,
+            },
+            http_request.headers.get("accept"),
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in /detect-duplicates/: {str(e)}")
         raise HTTPException(
-            status_code=500, detail=f"Error in batch matching: {str(e)}")
\ No newline at end of file
+            status_code=500, detail=f"Error detecting duplicates: {str(e)}")
\ No newline at end of file
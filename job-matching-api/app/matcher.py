@@ -1,27 +1,141 @@
 import json
+import logging
 import numpy as np
-import re
 import os
+import re
+import shutil
+import time
+from itertools import islice
+from scipy.sparse import issparse
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
+from .batching import TOKEN_BUDGET, length_batches, token_lengths
+from .embedding_cache import EmbeddingCache, fingerprint
+from .features import (
+    CANDIDATE_SECTIONS,
+    CATEGORIES,
+    CATEGORY_SECTIONS,
+    EDUCATION_KEYWORDS,
+    JOB_SECTIONS,
+    PROFILE_SECTIONS,
+    candidate_facets,
+    candidate_fingerprints,
+    changed_categories,
+    extract_candidate_features,
+    extract_job_features,
+    job_facets,
+    job_fingerprints,
+    passes_filter,
+    skill_keys,
+)
+from .hotswap import ModelRuntime
+from .lite import LiteEncoder
+from .ranking import TopK, recall_at_k, select_survivors
+from .score_cache import PairScoreCache
+from .singleflight import canonical_key
+from .snapshots import load_snapshot, publish_snapshot
+from .stores import SectionStore
+
 # Set all cache directories to locations in /tmp
 os.environ["TRANSFORMERS_CACHE"] = "/tmp/huggingface/transformers"
 os.environ["HF_HOME"] = "/tmp/huggingface/hub"
 os.environ["XDG_CACHE_HOME"] = "/tmp/huggingface/cache"
 
+# Scoring engines: the sentence model, sparse BM25 ("lite"), or the model
+# with lite as the fallback when it is unavailable or fails
+ENGINES = ("auto", "model", "lite")
+
+# Runtime store directories under the store path are named "{pid}-{runtime}"
+STORE_DIR_RE = re.compile(r"(\d+)-\d+")
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+def remove_stale_store_dirs(store_path):
+    """Delete runtime store directories left behind by exited processes.
+
+    A runtime's directory is only removed when it is retired, so a restart or
+    crash leaves its full-precision vector files behind. Directories of this
+    process (from a previous process with the same pid) are stale as well,
+    since it has not built a runtime yet. Returns the directories removed.
+    """
+    if not store_path or not os.path.isdir(store_path):
+        return []
+    removed = []
+    for name in os.listdir(store_path):
+        match = STORE_DIR_RE.fullmatch(name)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        if pid == os.getpid() or not _process_alive(pid):
+            shutil.rmtree(os.path.join(store_path, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+
+class PreparedJob:
+    """A job's feature record and section vectors, encoded once per engine."""
+
+    __slots__ = (
+        "features", "engine", "fallback", "vectors", "job_id", "sections", "weights", "runtime"
+    )
+
+    def __init__(self, features, engine, fallback, job_id=None, weights=None, runtime=None):
+        self.features = features
+        self.engine = engine
+        self.fallback = fallback
+        self.vectors = {}
+        self.weights = weights
+        # The model runtime every batch scored against this job uses
+        self.runtime = runtime
+        # Identify the job and its section versions in the pair score cache
+        self.job_id = job_id
+        self.sections = job_fingerprints(features) if job_id is not None else None
+
 
 class JobCandidateMatchingSystem:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name="all-MiniLM-L6-v2",
+        cache_size=20000,
+        lite_path=None,
+        score_cache_size=50000,
+        score_cache_path=None,
+        score_cache_read_only=False,
+        token_budget=TOKEN_BUDGET,
+        store_quantization="int8",
+        store_path=None,
+    ):
         """Initialize the matching system with a SBERT model."""
         # Create cache directories with proper permissions
         os.makedirs("/tmp/huggingface/transformers", exist_ok=True)
         os.makedirs("/tmp/huggingface/hub", exist_ok=True)
         os.makedirs("/tmp/huggingface/cache", exist_ok=True)
 
-        print(f"Loading model: {model_name}")
-        self.model = SentenceTransformer(model_name)
-        print("Model loaded successfully!")
+        # Sparse BM25 section vectors, fitted on our corpus and persisted
+        self.lite = LiteEncoder(lite_path)
+
+        # Settings for building model runtimes (see build_runtime)
+        self.cache_size = cache_size
+        self.score_cache_size = score_cache_size
+        self.score_cache_path = score_cache_path
+        self.score_cache_read_only = score_cache_read_only
+        self.store_quantization = store_quantization
+        self.store_path = store_path
+        self._runtimes = 0
+
+        # Padded tokens per encoder call; texts are batched by length
+        self.token_budget = token_budget
 
         # Define category weights
         self.weights = {
@@ -33,18 +147,162 @@ class JobCandidateMatchingSystem:
         }
 
         # Define keyword mappings for better matching
-        self.education_keywords = {
-            "bachelor": ["bscs", "bs", "bsc", "bachelor", "undergraduate", "degree"],
-            "master": ["ms", "msc", "master", "graduate"],
-            "computer science": [
-                "computer science",
-                "cs",
-                "software engineering",
-                "information technology",
-                "it",
-            ],
+        self.education_keywords = EDUCATION_KEYWORDS
+
+        removed = remove_stale_store_dirs(store_path)
+        if removed:
+            logging.info(f"Removed {len(removed)} stale store directories from {store_path}")
+
+        # The model and everything derived from it; a hot swap prepares the
+        # next runtime in `pending` and then replaces `active`
+        self.active = self.build_runtime(model_name)
+        self.active.activated_at = time.time()
+        self.pending = None
+
+    def build_runtime(self, model_name=None, snapshot_root=None, snapshot_version=None):
+        """Load a model with fresh stores (from a snapshot if given).
+
+        The active model and its caches are reused when the model is unchanged.
+        """
+        active = getattr(self, "active", None)
+        model_name = model_name or active.model_name
+        if active is not None and active.model is not None and active.model_name == model_name:
+            model, model_error = active.model, None
+            embedding_cache, score_cache = active.embedding_cache, active.score_cache
+        else:
+            print(f"Loading model: {model_name}")
+            model = None
+            model_error = None
+            try:
+                model = SentenceTransformer(model_name)
+                print("Model loaded successfully!")
+            except Exception as e:
+                # Keep serving with the lite engine rather than failing to start
+                model_error = str(e)
+                print(f"Model failed to load, using lite scoring: {e}")
+
+            # Section embeddings keyed by text fingerprint, shared by all endpoints
+            embedding_cache = EmbeddingCache(self.cache_size)
+            # Raw category scores per (job, candidate) pair; they do not depend
+            # on the weights, but a new model invalidates every stored pair
+            score_cache = PairScoreCache(
+                canonical_key(model_name),
+                self.score_cache_size,
+                self.score_cache_path,
+                self.score_cache_read_only,
+            )
+
+        self._runtimes += 1
+        store_dir = self.store_path and os.path.join(
+            self.store_path, f"{os.getpid()}-{self._runtimes}"
+        )
+
+        # Model embeddings of stored candidates and jobs, quantized for scans
+        # with full-precision copies (on disk under store_dir) for re-ranking
+        dim = model.get_sentence_embedding_dimension() if model is not None else None
+        runtime = ModelRuntime(
+            self._runtimes,
+            model_name,
+            model,
+            model_error,
+            embedding_cache,
+            score_cache,
+            SectionStore(
+                CANDIDATE_SECTIONS,
+                dim,
+                self.store_quantization,
+                store_dir and os.path.join(store_dir, "candidates"),
+            ),
+            SectionStore(
+                JOB_SECTIONS, dim, self.store_quantization, store_dir and os.path.join(store_dir, "jobs")
+            ),
+            store_dir,
+        )
+        if snapshot_version is not None:
+            self._load_stores(runtime, snapshot_root, snapshot_version)
+        return runtime
+
+    def activate(self, runtime):
+        """Route new requests to a runtime; in-flight ones finish on the old one."""
+        previous = self.active
+        runtime.activated_at = time.time()
+        self.active = runtime
+        if previous is not runtime:
+            previous.retire()
+
+    # The active runtime's parts, read once per use
+    @property
+    def model(self):
+        return self.active.model
+
+    @property
+    def model_name(self):
+        return self.active.model_name
+
+    @property
+    def model_error(self):
+        return self.active.model_error
+
+    @property
+    def embedding_cache(self):
+        return self.active.embedding_cache
+
+    @property
+    def score_cache(self):
+        return self.active.score_cache
+
+    @property
+    def candidate_store(self):
+        return self.active.candidate_store
+
+    @property
+    def job_store(self):
+        return self.active.job_store
+
+    @property
+    def store_version(self):
+        return self.active.store_version
+
+    def convert_applied_candidate_format(self, applied_candidate):
+        """Convert applied candidate format to the expected format for matching."""
+        applied_candidate = self._as_dict(applied_candidate)
+        converted = {
+            "id": applied_candidate.get("candidateId"),
+            "name": applied_candidate.get("applicantName"),
+            "email": applied_candidate.get("applicantEmail"),
+            "phone": applied_candidate.get("applicantPhone"),
+            "location": applied_candidate.get("location"),
+            "summary": f"Applied for {applied_candidate.get('jobTitle', '')} at {applied_candidate.get('companyName', '')}",
+            "technicalSkills": applied_candidate.get("technicalSkills", []),
+            "softSkills": applied_candidate.get("softSkills", []),
+            "languages": applied_candidate.get("languages", []),
+            "educations": [],
+            "workExperiences": [],
+            "certificates": [],
+            "projects": [],
         }
 
+        # Convert education format
+        for edu in applied_candidate.get("educations") or []:
+            converted["educations"].append(
+                {
+                    "degree": edu.get("degree"),
+                    "field": edu.get("fieldOfStudy"),
+                    "school": edu.get("institution"),
+                    "startDate": edu.get("startYear"),
+                    "endDate": edu.get("endYear"),
+                }
+            )
+
+        # Applications store the job title as `position`
+        for exp in applied_candidate.get("workExperiences") or []:
+            converted_exp = dict(exp)
+            if "title" not in converted_exp and "position" in converted_exp:
+                converted_exp["title"] = converted_exp.pop("position")
+            converted["workExperiences"].append(converted_exp)
+
+        return converted
+
     def _get_text_embedding(self, text):
         """Convert text to embeddings using SBERT."""
         if not text:
@@ -62,6 +320,10 @@ class JobCandidateMatchingSystem:
         if embedding1 is None or embedding2 is None:
             return 0.0
 
+        # Lite vectors are L2-normalized sparse rows: cosine is their dot product
+        if issparse(embedding1):
+            return float(embedding1.multiply(embedding2).sum())
+
         # Reshape embeddings for sklearn's cosine_similarity
         emb1 = embedding1.reshape(1, -1)
         emb2 = embedding2.reshape(1, -1)
@@ -92,467 +354,918 @@ class JobCandidateMatchingSystem:
 
         return len(common_words) / len(total_unique_words) * boost_factor
 
-    def _extract_job_required_skills(self, job_data):
-        """Extract required skills from job data."""
-        if "description" in job_data and "required_skills" in job_data["description"]:
-            return " ".join(job_data["description"]["required_skills"])
-        return ""
-
-    def _extract_job_preferred_skills(self, job_data):
-        """Extract preferred skills from job data."""
-        if "description" in job_data and "preferred_skills" in job_data["description"]:
-            return " ".join(job_data["description"]["preferred_skills"])
-        return ""
-
-    def _extract_job_summary(self, job_data):
-        """Extract job summary from job data."""
-        summary = ""
-        if (
-            "description" in job_data
-            and job_data["description"]
-            and "position_summary" in job_data["description"]
-        ):
-            summary = job_data["description"]["position_summary"]
-
-        # Add title for better context
-        if "title" in job_data:
-            summary = job_data["title"] + ": " + summary
-
-        # Add company name for additional context
-        if "company_name" in job_data:
-            summary = job_data["company_name"] + " - " + summary
-
-        return summary
-
-    def _extract_job_responsibilities(self, job_data):
-        """Extract job responsibilities from job data."""
-        if "description" in job_data and "responsibilities" in job_data["description"]:
-            return " ".join(job_data["description"]["responsibilities"])
-        return ""
-
-    def _extract_job_tech_stack(self, job_data):
-        """Extract technical stack from job data."""
-        tech_stack_text = ""
-        if "description" in job_data and "technical_skills" in job_data["description"]:
-            for category, skills in job_data["description"]["technical_skills"].items():
-                tech_stack_text += category + ": " + ", ".join(skills) + " "
-        return tech_stack_text.strip()
-
-    def _extract_job_qualifications(self, job_data):
-        """Extract qualifications from job data."""
-        qualifications = ""
-        
-        # First check required skills for education requirements
-        if "description" in job_data and "required_skills" in job_data["description"]:
-            for skill in job_data["description"]["required_skills"]:
-                if any(
-                    edu_term in skill.lower()
-                    for edu_term in [
-                        "degree",
-                        "education",
-                        "bachelor",
-                        "master",
-                        "phd",
-                        "diploma",
-                    ]
-                ):
-                    qualifications += skill + " "
-        
-        return qualifications.strip()
-
-    def _extract_job_work_requirements(self, job_data):
-        """Extract work experience requirements from job data."""
-        experience_text = ""
-        
-        # Extract from required skills
-        if "description" in job_data and "required_skills" in job_data["description"]:
-            for skill in job_data["description"]["required_skills"]:
-                if any(
-                    exp_term in skill.lower()
-                    for exp_term in [
-                        "experience",
-                        "years",
-                        "year",
-                        "yr",
-                        "yrs",
-                    ]
-                ):
-                    experience_text += skill + " "
-        
-        # Also include job type and contract type for better matching
-        if "job_type" in job_data:
-            experience_text += f"Job type: {job_data['job_type']} "
-        
-        if "contract_type" in job_data:
-            experience_text += f"Contract: {job_data['contract_type']} "
-        
-        return experience_text.strip()
-
-    def _extract_candidate_skills(self, candidate_data):
-        """Extract candidate skills from candidate data."""
-        skills_text = ""
-
-        # Technical skills
-        if "technicalSkills" in candidate_data and candidate_data["technicalSkills"]:
-            skills_text += (
-                "Technical Skills: "
-                + ", ".join(candidate_data["technicalSkills"])
-                + " "
-            )
-
-        # Soft skills
-        if "softSkills" in candidate_data and candidate_data["softSkills"]:
-            skills_text += (
-                "Soft Skills: " + ", ".join(candidate_data["softSkills"]) + " "
-            )
-
-        # Add certificates as they often indicate skills
-        if "certificates" in candidate_data and candidate_data["certificates"]:
-            for cert in candidate_data["certificates"]:
-                skills_text += f"Certificate: {cert.get('name', '')} "
-
-        return skills_text.strip()
-
-    def _extract_candidate_education(self, candidate_data):
-        """Extract candidate education from candidate data."""
-        education_text = ""
-        if "educations" in candidate_data and candidate_data["educations"]:
-            for edu in candidate_data["educations"]:
-                education_text += f"{edu.get('degree', '')} in {edu.get('field', '')} from {edu.get('school', '')}. "
-        return education_text.strip()
-
-    def _extract_candidate_summary(self, candidate_data):
-        """Extract candidate summary from candidate data."""
-        summary = ""
-        if "summary" in candidate_data and candidate_data["summary"]:
-            summary = candidate_data["summary"]
-
-        # Add name and any workExperience titles for better context
-        if "name" in candidate_data:
-            summary = candidate_data["name"] + ": " + summary
-
-        # Add most recent work title if available
-        if "workExperiences" in candidate_data and candidate_data["workExperiences"]:
-            latest_title = candidate_data["workExperiences"][0].get("title", "")
-            if latest_title:
-                summary += f" Current position: {latest_title}"
-
-        return summary
-
-    def _extract_candidate_work_experience(self, candidate_data):
-        """Extract candidate work experience from candidate data."""
-        experience_text = ""
-
-        # Add years of experience from summary if available
-        if (
-            "summary" in candidate_data
-            and "experience" in candidate_data["summary"].lower()
-        ):
-            experience_text += candidate_data["summary"] + " "
-
-        # Add work experiences
-        if "workExperiences" in candidate_data and candidate_data["workExperiences"]:
-            for exp in candidate_data["workExperiences"]:
-                experience_text += f"{exp.get('title', '')} at {exp.get('company', '')}. {exp.get('description', '')} "
-                
-                # Add job type if available
-                if "jobType" in exp:
-                    experience_text += f"Job type: {exp.get('jobType', '')} "
-
-        # Include projects as they can indicate practical experience
-        if "projects" in candidate_data and candidate_data["projects"]:
-            for project in candidate_data["projects"]:
-                experience_text += f"Project: {project.get('title', '')}. {project.get('description', '')} "
-
-        return experience_text.strip()
-
-    def _extract_individual_skills(self, skills_text):
-        """Extract individual skills from a skills text."""
-        if not skills_text:
-            return set()
-
-        # Remove common prefixes
-        skills_text = skills_text.lower()
-        skills_text = skills_text.replace("technical skills:", "").replace(
-            "soft skills:", ""
-        )
-
-        # Split by commas and clean up
-        skills = [s.strip() for s in skills_text.split(",")]
-
-        # Remove empty strings
-        skills = [s for s in skills if s]
-
-        return set(skills)
-
-    def _calculate_direct_skill_match(self, job_skills_text, candidate_skills_text):
+    def _calculate_direct_skill_match(self, job_skills, candidate_skills):
         """Calculate direct skill match percentage based on individual skills."""
-        # Extract individual skills
-        job_skills = self._extract_individual_skills(job_skills_text)
-        candidate_skills = self._extract_individual_skills(candidate_skills_text)
-
         if not job_skills or not candidate_skills:
             return 0.0
 
-        # Count matches
+        # Count job skills that match a candidate skill exactly or as a substring
         matches = 0
         for job_skill in job_skills:
             for candidate_skill in candidate_skills:
-                # Check for exact match or if job skill is a substring of candidate skill or vice versa
-                if (
-                    job_skill == candidate_skill
-                    or job_skill in candidate_skill
-                    or candidate_skill in job_skill
-                ):
+                if job_skill in candidate_skill or candidate_skill in job_skill:
                     matches += 1
                     break
 
         # Calculate match percentage
-        return matches / len(job_skills) if len(job_skills) > 0 else 0.0
+        return matches / len(job_skills)
+
+    def _encode_batched(self, model, texts, batch_size=32):
+        """Encode texts in length-bucketed batches, returned in input order.
+
+        Section texts range from a few skills to long experience blobs, so
+        batching them in input order pads most rows to the longest one.
+        """
+        embeddings = [None] * len(texts)
+        lengths = token_lengths(model, texts)
+        for batch in length_batches(lengths, batch_size, self.token_budget):
+            encoded = model.encode([texts[i] for i in batch], batch_size=len(batch))
+            for i, embedding in zip(batch, encoded):
+                embeddings[i] = embedding
+        return embeddings
+
+    def _encode_texts(self, texts, batch_size=32, runtime=None):
+        """Encode a list of texts in batched model calls (None for empty texts).
+
+        Texts seen before are served from the embedding cache, and repeated
+        texts within the list are encoded only once. `batch_size` caps the
+        texts per call; the token budget caps their padded size. The active
+        runtime's model is used unless `runtime` is given.
+        """
+        runtime = runtime or self.active
+        embeddings = [None] * len(texts)
+        indices = [i for i, text in enumerate(texts) if text]
+        if not indices:
+            return embeddings
+
+        keys = [fingerprint(texts[i]) for i in indices]
+        missing = {}
+        for i, key, embedding in zip(indices, keys, runtime.embedding_cache.get_many(keys)):
+            if embedding is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                embeddings[i] = embedding
+
+        if missing:
+            positions = list(missing.values())
+            encoded = self._encode_batched(
+                runtime.model, [texts[p[0]] for p in positions], batch_size=batch_size
+            )
+            # Copy rows so cached entries do not pin the whole batch array
+            encoded = [np.array(embedding, dtype=np.float32) for embedding in encoded]
+            runtime.embedding_cache.put_many(missing.keys(), encoded)
+            for p, embedding in zip(positions, encoded):
+                for i in p:
+                    embeddings[i] = embedding
+        return embeddings
+
+    @property
+    def model_available(self):
+        return self.model is not None
+
+    def resolve_engine(self, engine="auto", runtime=None):
+        """Return (engine, fallback) for a requested engine name."""
+        runtime = runtime or self.active
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown scoring engine: {engine}")
+        if engine == "auto":
+            return ("model" if runtime.model is not None else "lite"), True
+        if engine == "model" and runtime.model is None:
+            raise RuntimeError(f"Model is not available: {runtime.model_error}")
+        return engine, False
+
+    def _encode_with(self, engine, texts, batch_size=32, runtime=None):
+        """Section vectors for texts from the given engine (None for empty texts)."""
+        if engine == "lite":
+            return self.lite.encode(texts)
+        return self._encode_texts(texts, batch_size=batch_size, runtime=runtime)
+
+    def _job_vectors(self, prepared_job, engine):
+        vectors = prepared_job.vectors.get(engine)
+        if vectors is None:
+            sections = prepared_job.features.sections
+            vectors = dict(
+                zip(
+                    sections,
+                    self._encode_with(
+                        engine, list(sections.values()), runtime=prepared_job.runtime
+                    ),
+                )
+            )
+            prepared_job.vectors[engine] = vectors
+        return vectors
+
+    def fit_lite(self, jobs=(), candidates=()):
+        """Fit the lite engine on the section texts of a corpus and persist it."""
+        texts = []
+        for job_data in jobs:
+            job = extract_job_features(self._as_dict(job_data))
+            texts.extend(job.sections.values())
+        for candidate_data in candidates:
+            candidate = extract_candidate_features(self._as_dict(candidate_data))
+            texts.extend(candidate.sections.values())
+        self.lite.fit(texts)
+        if self.lite.path:
+            self.lite.save()
+        # Lite scores computed with the old statistics are stale
+        self.score_cache.invalidate(engine="lite")
+        return self.lite.stats()
+
+    def _as_dict(self, data):
+        """Return a plain dict for a validated pydantic model or a dict payload."""
+        if hasattr(data, "model_dump"):
+            return data.model_dump(exclude_none=True)
+        return data
 
     def calculate_match_score(self, job_data, candidate_data):
         """Calculate the match score between a job and a candidate."""
-        # Process job data
-        job_required_skills = self._extract_job_required_skills(job_data)
-        job_preferred_skills = self._extract_job_preferred_skills(job_data)
-        job_summary = self._extract_job_summary(job_data)
-        job_responsibilities = self._extract_job_responsibilities(job_data)
-        job_qualifications = self._extract_job_qualifications(job_data)
-        job_tech_stack = self._extract_job_tech_stack(job_data)
-        job_work_requirements = self._extract_job_work_requirements(job_data)
-
-        # Process candidate data
-        candidate_skills = self._extract_candidate_skills(candidate_data)
-        candidate_education = self._extract_candidate_education(candidate_data)
-        candidate_summary = self._extract_candidate_summary(candidate_data)
-        candidate_experience = self._extract_candidate_work_experience(candidate_data)
-
-        # Create embeddings for job data
-        job_required_skills_embedding = self._get_text_embedding(job_required_skills)
-        job_preferred_skills_embedding = self._get_text_embedding(job_preferred_skills)
-        job_responsibilities_embedding = self._get_text_embedding(job_responsibilities)
-        job_qualifications_embedding = self._get_text_embedding(job_qualifications)
-        job_tech_stack_embedding = self._get_text_embedding(job_tech_stack)
-        job_work_requirements_embedding = self._get_text_embedding(job_work_requirements)
-
-        # Create embeddings for candidate data
-        candidate_skills_embedding = self._get_text_embedding(candidate_skills)
-        candidate_education_embedding = self._get_text_embedding(candidate_education)
-        candidate_experience_embedding = self._get_text_embedding(candidate_experience)
+        match_result = self.score_batch(self.prepare_job(job_data), [candidate_data])[0][1]
+        return {
+            "overall_match_score": match_result["overall_match_score"],
+            "category_scores": match_result["category_scores"],
+        }
 
-        # Calculate similarities for each category using embeddings
-        category_scores = {}
+    def match(self, job_data, candidate_data, engine="auto", weights=None):
+        """Calculate the match score and matching skills in a single pass.
+
+        Accepts validated `Job`/`Candidate` models or plain dicts; each side
+        is walked once and its feature record is reused for scoring and skills.
+        """
+        prepared_job = self.prepare_job(job_data, engine, weights)
+        match_result = self.score_batch(prepared_job, [candidate_data], include_skills=True)[0][1]
+        match_result.pop("raw_scores")
+        match_result.pop("job_type_bonus")
+        return match_result
+
+    def resolve_weights(self, *overrides):
+        """Category weights with the given overrides applied in order.
+
+        Overrides may name any subset of the categories; unknown categories,
+        negative weights or all-zero weights raise ValueError.
+        """
+        weights = dict(self.weights)
+        for override in overrides:
+            for category, weight in (override or {}).items():
+                if category not in weights:
+                    raise ValueError(f"Unknown weight category: {category}")
+                if weight < 0:
+                    raise ValueError(f"Weight for {category} must not be negative")
+                weights[category] = float(weight)
+        if not any(weights.values()):
+            raise ValueError("At least one weight must be positive")
+        return weights
+
+    def prepare_job(self, job_data, engine="auto", weights=None):
+        """Extract and encode the job features once for repeated scoring.
+
+        With the "auto" engine a model failure switches the job (and every
+        batch scored against it afterwards) to the lite engine. Weights come
+        from the defaults, then the job's own `weights`, then `weights`.
+        """
+        runtime = self.active
+        engine, fallback = self.resolve_engine(engine, runtime)
+        job_data = self._as_dict(job_data)
+        job_id = job_data.get("id")
+        prepared_job = PreparedJob(
+            extract_job_features(job_data),
+            engine,
+            fallback,
+            None if job_id is None else str(job_id),
+            self.resolve_weights(job_data.get("weights"), weights),
+            runtime,
+        )
+        try:
+            self._job_vectors(prepared_job, engine)
+        except Exception as e:
+            if not (fallback and engine == "model"):
+                raise
+            logging.warning(f"Model encoding failed, falling back to lite scoring: {e}")
+            prepared_job.engine = "lite"
+            self._job_vectors(prepared_job, "lite")
+        return prepared_job
+
+    def score_batch(
+        self, prepared_job, candidates, include_skills=False, features=None, engine=None
+    ):
+        """Score one micro-batch of candidates against a prepared job.
+
+        All candidate sections of the micro-batch are encoded with a single
+        model call. Returns a list of (candidate, match_result) pairs, where
+        candidate is the dict form of the input and match_result carries
+        `matching_skills` when `include_skills` is set. Already extracted
+        candidate feature records can be passed in `features`, and `engine`
+        overrides the job's engine for this batch. Each match_result names
+        the `engine` that produced it.
+
+        When the job and a candidate both have an id, the pair score cache
+        is consulted: unchanged pairs are not rescored at all, and for pairs
+        where some sections changed only the categories depending on those
+        sections are rescored (and only those sections encoded).
+        """
+        job = prepared_job.features
+        score_cache = prepared_job.runtime.score_cache
+        candidates = [self._as_dict(c) for c in candidates]
+        engine = engine or prepared_job.engine
+        if features is None:
+            features = [extract_candidate_features(c) for c in candidates]
+
+        keys = [None] * len(candidates)
+        cached = [None] * len(candidates)
+        if prepared_job.job_id is not None:
+            for i, candidate_data in enumerate(candidates):
+                if candidate_data.get("id") is not None:
+                    keys[i] = (str(candidate_data["id"]), candidate_fingerprints(features[i]))
+            lookups = [i for i, key in enumerate(keys) if key is not None]
+            found = score_cache.get_many(
+                prepared_job.job_id, prepared_job.sections, engine, [keys[i] for i in lookups]
+            )
+            for i, entry in zip(lookups, found):
+                cached[i] = entry
+
+        def plan():
+            """(index, categories to score, cached raw scores, store?) per candidate."""
+            plans = []
+            for i, entry in enumerate(cached):
+                if entry is None:
+                    plans.append((i, CATEGORIES, None, keys[i] is not None))
+                    continue
+                status, (job_sections, candidate_sections, record) = entry
+                if status == "hit":
+                    plans.append((i, (), record["raw_scores"], False))
+                    continue
+                job_changed = {
+                    s for s, fp in prepared_job.sections.items() if job_sections.get(s) != fp
+                }
+                candidate_changed = {
+                    s for s, fp in keys[i][1].items() if candidate_sections.get(s) != fp
+                }
+                affected = changed_categories(job_changed, candidate_changed)
+                plans.append(
+                    (i, tuple(c for c in CATEGORIES if c in affected), record["raw_scores"], True)
+                )
+            return plans
+
+        def encode(plans, engine):
+            """Encode only the candidate sections the planned categories need."""
+            needed = []
+            for i, categories, _, _ in plans:
+                sections = {s for c in categories for s in CATEGORY_SECTIONS[c][1]}
+                needed.append([s for s in features[i].sections if s in sections])
+            flat_texts = [
+                features[i].sections[s] for (i, *_), names in zip(plans, needed) for s in names
+            ]
+            flat_embeddings = iter(
+                self._encode_with(
+                    engine,
+                    flat_texts,
+                    batch_size=max(1, len(flat_texts)),
+                    runtime=prepared_job.runtime,
+                )
+            )
+            return [
+                {s: next(flat_embeddings) for s in names} for names in needed
+            ]
+
+        plans = plan()
+        try:
+            embeddings = encode(plans, engine)
+        except Exception as e:
+            if not (prepared_job.fallback and engine == "model"):
+                raise
+            logging.warning(f"Model encoding failed, falling back to lite scoring: {e}")
+            engine = prepared_job.engine = "lite"
+            # Cached model scores cannot be mixed with lite ones
+            plans = [(i, CATEGORIES, None, keys[i] is not None) for i, *_ in plans]
+            embeddings = encode(plans, engine)
+        job_embeddings = self._job_vectors(prepared_job, engine)
+
+        results = []
+        stored = []
+        for (i, categories, raw_scores, store), candidate_embeddings in zip(plans, embeddings):
+            candidate = features[i]
+            if categories:
+                rescored = self._category_scores(
+                    job, job_embeddings, candidate, candidate_embeddings, categories
+                )
+                raw_scores = {
+                    c: rescored[c] if c in rescored else raw_scores[c] for c in CATEGORIES
+                }
+            job_type_bonus = self._job_type_bonus(job, candidate)
+            match_result = self._combine_scores(raw_scores, job_type_bonus, prepared_job.weights)
+            match_result["engine"] = engine
+            # Kept so results can be re-weighted later without rescoring
+            match_result["raw_scores"] = raw_scores
+            match_result["job_type_bonus"] = job_type_bonus
+
+            # Skills are cheap, and cached records always carry them
+            if include_skills or store:
+                matching_skills = self._matching_skills(job, candidate)
+                if include_skills:
+                    match_result["matching_skills"] = matching_skills
+                if store:
+                    stored.append(
+                        (
+                            *keys[i],
+                            {
+                                "raw_scores": raw_scores,
+                                "job_type_bonus": job_type_bonus,
+                                "matching_skills": matching_skills,
+                            },
+                        )
+                    )
+            results.append((candidates[i], match_result))
+
+        if stored:
+            score_cache.put_many(prepared_job.job_id, prepared_job.sections, engine, stored)
+        return results
+
+    def iter_batch_scores(
+        self,
+        job_data,
+        candidates,
+        batch_size=32,
+        include_skills=False,
+        engine="auto",
+        weights=None,
+        features=None,
+    ):
+        """Score candidates against a job in encoded micro-batches.
+
+        The job sections are encoded once. Candidates (any iterable) are
+        consumed `batch_size` at a time and the scored pairs of each
+        micro-batch are yielded as a list. Already extracted feature
+        records can be passed in `features`, in candidate order.
+        """
+        prepared_job = self.prepare_job(job_data, engine, weights)
+
+        candidates = iter(candidates)
+        features = iter(features) if features is not None else None
+        while True:
+            batch = list(islice(candidates, batch_size))
+            if not batch:
+                return
+            batch_features = list(islice(features, len(batch))) if features is not None else None
+            yield self.score_batch(prepared_job, batch, include_skills, batch_features)
+
+    def _store_profiles(self, store_name, ids, features, meta, batch_size):
+        """Encode the sections of extracted profiles and write them to a store.
+
+        While a hot swap re-embeds the stores, profiles are also written
+        (encoded with the new model) to the pending runtime's store.
+        """
+        runtimes = [self.active]
+        if self.pending is not None:
+            runtimes.append(self.pending)
+        self.resolve_engine("model", runtimes[0])
+        for runtime in runtimes:
+            store = getattr(runtime, store_name)
+            flat_texts = [f.sections[s] for f in features for s in store.sections]
+            flat_embeddings = iter(
+                self._encode_texts(flat_texts, batch_size=batch_size, runtime=runtime)
+            )
+            vectors = [{s: next(flat_embeddings) for s in store.sections} for _ in features]
+            store.put_many(ids, features, vectors, meta)
+        return len(ids)
+
+    def reembed_rows(self, source, target, start, end, runtime):
+        """Copy rows [start, end) of a store into another, encoded by `runtime`.
+
+        Profiles written to the target meanwhile are newer and kept, and
+        profiles removed from the source meanwhile are removed again.
+        Returns the number of profiles copied.
+        """
+        ids, features, meta = [], [], []
+        for row in range(start, end):
+            profile_id, record, row_meta, _ = source.entry(row)
+            if profile_id is None or profile_id in target:
+                continue
+            ids.append(profile_id)
+            features.append(record)
+            meta.append(row_meta)
+        if not ids:
+            return 0
+        flat_texts = [f.sections[s] for f in features for s in target.sections]
+        flat_embeddings = iter(self._encode_texts(flat_texts, runtime=runtime))
+        vectors = [{s: next(flat_embeddings) for s in target.sections} for _ in features]
+        copied = target.put_many(ids, features, vectors, meta, replace=False)
+        for profile_id in ids:
+            if profile_id not in source:
+                target.remove(profile_id)
+        return copied
+
+    def remove_profile(self, store_name, profile_id):
+        """Remove a stored candidate or job (also from a pending runtime)."""
+        removed = getattr(self.active, store_name).remove(profile_id)
+        if self.pending is not None:
+            getattr(self.pending, store_name).remove(profile_id)
+        return removed
+
+    def store_candidates(self, candidates, batch_size=32):
+        """Encode candidates with the model and add them to the candidate store."""
+        candidates = [self._as_dict(c) for c in candidates]
+        if any(c.get("id") is None for c in candidates):
+            raise ValueError("Stored candidates need an id")
+        features = [extract_candidate_features(c) for c in candidates]
+        return self._store_profiles(
+            "candidate_store",
+            [str(c["id"]) for c in candidates],
+            features,
+            [{"facets": candidate_facets(c, f)} for c, f in zip(candidates, features)],
+            batch_size,
+        )
 
-        # Required Skills - combine embedding similarity with direct skill matching
-        embedding_similarity = self._calculate_similarity(
-            job_required_skills_embedding, candidate_skills_embedding
+    def store_jobs(self, jobs, batch_size=32):
+        """Encode jobs with the model and add them to the job store."""
+        jobs = [self._as_dict(j) for j in jobs]
+        if any(j.get("id") is None for j in jobs):
+            raise ValueError("Stored jobs need an id")
+        features = [extract_job_features(j) for j in jobs]
+        return self._store_profiles(
+            "job_store",
+            [str(j["id"]) for j in jobs],
+            features,
+            [{"weights": j.get("weights"), "facets": job_facets(j, f)} for j, f in zip(jobs, features)],
+            batch_size,
         )
-        direct_skill_match = self._calculate_direct_skill_match(
-            job_required_skills, candidate_skills
+
+    def stored_ids(self, store_name, profile_filter=None):
+        """Ids of the stored candidates or jobs, optionally only those passing a facet filter."""
+        store = getattr(self.active, store_name)
+        if profile_filter is None:
+            return [profile_id for profile_id in store.ids if profile_id is not None]
+        return [store.ids[row] for row in np.flatnonzero(store.filter_rows(profile_filter))]
+
+    def filter_candidates(self, candidates, profile_filter):
+        """The candidates passing a facet filter, in order; nothing is encoded.
+
+        Returns (kept candidates, their feature records), so scoring them
+        does not extract the records again.
+        """
+        kept = []
+        kept_features = []
+        for candidate in candidates:
+            data = self._as_dict(candidate)
+            features = extract_candidate_features(data)
+            if passes_filter(candidate_facets(data, features), skill_keys(features), profile_filter):
+                kept.append(candidate)
+                kept_features.append(features)
+        return kept, kept_features
+
+    def publish_stores(self, root):
+        """Publish the candidate and job stores as a new snapshot; returns its version."""
+        runtime = self.active
+        version = publish_snapshot(
+            root,
+            {"candidates": runtime.candidate_store, "jobs": runtime.job_store},
+            {"model_name": runtime.model_name},
         )
+        runtime.store_version = version
+        return version
 
-        # Weight direct matching higher for skills
-        category_scores["required_skills"] = (
-            0.3 * embedding_similarity + 0.7 * direct_skill_match
+    def load_stores(self, root, version=None):
+        """Switch to the stores of a published snapshot (the current one by default).
+
+        Returns the loaded version, or None when there is nothing to load.
+        Snapshots built with another model raise ValueError.
+        """
+        return self._load_stores(self.active, root, version)
+
+    def _load_stores(self, runtime, root, version=None):
+        snapshot = load_snapshot(root, version)
+        if snapshot is None:
+            return None
+        metadata, stores = snapshot
+        if metadata.get("model_name") != runtime.model_name:
+            raise ValueError(
+                f"Snapshot {metadata['version']} was built with {metadata.get('model_name')}, "
+                f"not {runtime.model_name}"
+            )
+        # Requests already holding the old stores finish on them
+        runtime.candidate_store, runtime.job_store = stores["candidates"], stores["jobs"]
+        runtime.store_version = metadata["version"]
+        return runtime.store_version
+
+    def prepare_stored_job(self, job_id, weights=None):
+        """A PreparedJob built from the job store, without encoding (None if unknown)."""
+        runtime = self.active
+        job_store = runtime.job_store
+        row = job_store.row(str(job_id))
+        if row is None:
+            return None
+        job_id, features, meta, vectors = job_store.entry(row)
+        prepared_job = PreparedJob(
+            features,
+            "model",
+            False,
+            job_id,
+            self.resolve_weights(meta.get("weights"), weights),
+            runtime,
+        )
+        prepared_job.vectors["model"] = vectors
+        return prepared_job
+
+    def _scan_queries(self, prepared_job):
+        """One query vector per candidate section for approximate store scans.
+
+        Cosine similarity is linear in the (normalized) candidate vector, so
+        the weighted embedding terms of every category that reads a
+        candidate section fold into a single query for that section.
+        """
+        weights = prepared_job.weights
+        job_embeddings = self._job_vectors(prepared_job, "model")
+        # Share of each category score that comes from embedding similarity
+        terms = (
+            ("required_skills", "required_skills", "skills", 0.3),
+            ("preferred_skills", "preferred_skills", "skills", 0.3),
+            ("tech_stack", "tech_stack", "skills", 0.3),
+            ("qualification", "qualifications", "education", 1.0),
+            ("work_experience", "work_requirements", "experience", 0.4),
+            ("work_experience", "responsibilities", "experience", 0.6),
+        )
+        queries = {}
+        for category, job_section, candidate_section, share in terms:
+            embedding = job_embeddings.get(job_section)
+            if embedding is None or not weights[category]:
+                continue
+            norm = np.linalg.norm(embedding)
+            if norm == 0:
+                continue
+            term = (weights[category] * share / norm) * np.asarray(embedding, dtype=np.float32)
+            queries[candidate_section] = queries.get(candidate_section, 0) + term
+        return queries
+
+    def top_candidates(
+        self, prepared_job, top_k=10, rerank_k=None, include_skills=False, profile_filter=None
+    ):
+        """Best stored candidates for a job, exactly scored.
+
+        The candidate store is scanned with the quantized section vectors
+        for the `rerank_k` (default 4 x top_k, at least 50) best approximate
+        matches, which are then scored exactly from their full-precision
+        vectors. With a `profile_filter` (see features.facet_filter) only
+        the candidates passing it are scanned. Returns (ranked
+        [(score, (candidate_id, match_result))], number of candidates scanned).
+        """
+        if prepared_job.engine != "model":
+            raise RuntimeError("Stored candidates can only be ranked with the model engine")
+        rerank_k = max(top_k, rerank_k or max(4 * top_k, 50))
+        job = prepared_job.features
+        job_embeddings = self._job_vectors(prepared_job, "model")
+        # The job's runtime, so the store matches the model that encoded the job
+        store = prepared_job.runtime.candidate_store
+        mask = store.filter_rows(profile_filter) if profile_filter is not None else None
+
+        ranking = TopK(top_k)
+        for row, approximate in store.scan(self._scan_queries(prepared_job), rerank_k, mask):
+            candidate_id, candidate, _, candidate_embeddings = store.entry(row)
+            if candidate_id is None:
+                continue
+            raw_scores = self._category_scores(job, job_embeddings, candidate, candidate_embeddings)
+            match_result = self._combine_scores(
+                raw_scores, self._job_type_bonus(job, candidate), prepared_job.weights
+            )
+            match_result["engine"] = "model"
+            match_result["scan_score"] = round(approximate, 4)
+            if include_skills:
+                match_result["matching_skills"] = self._matching_skills(job, candidate)
+            ranking.push(match_result["overall_match_score"], (candidate_id, match_result))
+        return ranking.ranked(), len(store) if mask is None else int(mask.sum())
+
+    def match_matrix(self, job_ids, candidate_ids, weights=None):
+        """Overall scores of stored jobs against stored candidates, from stored vectors.
+
+        Returns (scores, missing job ids, missing candidate ids), where
+        scores[i][j] is the match score of job i and candidate j (None when
+        either is not stored). Nothing is encoded.
+        """
+        entries = {}
+
+        def stored_candidates(runtime):
+            # Read from the job's runtime, so both were encoded by one model
+            if runtime.version not in entries:
+                store = runtime.candidate_store
+                rows = [store.row(str(candidate_id)) for candidate_id in candidate_ids]
+                entries[runtime.version] = [
+                    None if row is None else store.entry(row) for row in rows
+                ]
+            return entries[runtime.version]
+
+        scores = []
+        missing_jobs = []
+        for job_id in job_ids:
+            prepared_job = self.prepare_stored_job(job_id, weights)
+            if prepared_job is None:
+                missing_jobs.append(job_id)
+                scores.append([None] * len(candidate_ids))
+                continue
+            candidates = stored_candidates(prepared_job.runtime)
+            job = prepared_job.features
+            job_embeddings = self._job_vectors(prepared_job, "model")
+            row_scores = []
+            for entry in candidates:
+                if entry is None:
+                    row_scores.append(None)
+                    continue
+                _, candidate, _, candidate_embeddings = entry
+                raw_scores = self._category_scores(
+                    job, job_embeddings, candidate, candidate_embeddings
+                )
+                row_scores.append(
+                    self.overall_score(
+                        raw_scores, self._job_type_bonus(job, candidate), prepared_job.weights
+                    )
+                )
+            scores.append(row_scores)
+        store = self.active.candidate_store
+        missing_candidates = [
+            candidate_id for candidate_id in candidate_ids if str(candidate_id) not in store
+        ]
+        return scores, missing_jobs, missing_candidates
+
+    def prefilter_score(self, job, candidate, job_keywords):
+        """Cheap first-stage score (0-100) that needs no model calls.
+
+        Combines the share of job skills the candidate lists with keyword
+        (Jaccard) similarity between the job's skills/responsibilities text
+        and the candidate's skills and experience.
+        """
+        skill_overlap = self._calculate_direct_skill_match(
+            job.skill_names, tuple(lower for lower, _ in candidate.skill_names)
         )
+        keyword_similarity = self._calculate_keyword_similarity(
+            job_keywords,
+            candidate.sections["skills"] + " " + candidate.sections["experience"],
+            boost_factor=1.0,
+        )
+        return 100 * (0.7 * skill_overlap + 0.3 * keyword_similarity)
+
+    def cascade_scores(
+        self,
+        job_data,
+        candidates,
+        keep_fraction=0.2,
+        floor=None,
+        min_keep=0,
+        include_skills=False,
+        batch_size=32,
+        recall_k=None,
+        engine="auto",
+        weights=None,
+        features=None,
+    ):
+        """Two-stage scoring: cheap prefilter for all, full scoring for the best.
+
+        Every candidate gets a prefilter_score; only those selected by
+        `select_survivors` are encoded and scored with calculate_match_score
+        logic. Returns (results, stats) where results lists
+        (index, candidate, match_result) for the rescored candidates in input
+        order. With `recall_k`, the filtered-out candidates are fully scored
+        too and stats report recall@k of the cascade against the full scorer.
+        Already extracted feature records can be passed in `features`.
+        """
+        prepared_job = self.prepare_job(job_data, engine, weights)
+        job = prepared_job.features
+        candidates = [self._as_dict(c) for c in candidates]
+        if features is None:
+            features = [extract_candidate_features(c) for c in candidates]
+
+        job_keywords = " ".join(
+            job.sections[s] for s in ("required_skills", "tech_stack", "responsibilities")
+        )
+        cheap_scores = [self.prefilter_score(job, f, job_keywords) for f in features]
+        survivors = select_survivors(cheap_scores, keep_fraction, floor, min_keep)
+
+        def full_scores(indices):
+            for start in range(0, len(indices), batch_size):
+                chunk = indices[start:start + batch_size]
+                scored = self.score_batch(
+                    prepared_job,
+                    [candidates[i] for i in chunk],
+                    include_skills,
+                    [features[i] for i in chunk],
+                )
+                for i, (candidate, match_result) in zip(chunk, scored):
+                    match_result["prefilter_score"] = round(cheap_scores[i], 2)
+                    yield i, candidate, match_result
+
+        results = list(full_scores(survivors))
+        stats = {"candidates": len(candidates), "rescored": len(results)}
+
+        if recall_k:
+            # Only for tuning the cut-off: score the rest to compare rankings
+            scores = {i: r["overall_match_score"] for i, _, r in results}
+            kept = set(survivors)
+            dropped = [i for i in range(len(candidates)) if i not in kept]
+            for i, _, match_result in full_scores(dropped):
+                scores[i] = match_result["overall_match_score"]
+            stats["recall_at_k"] = round(recall_at_k(scores, survivors, recall_k), 4)
+            stats["k"] = recall_k
+
+        return results, stats
+
+    def encode_profiles(self, candidates, batch_size=32):
+        """Encode candidate profile sections into normalized section matrices.
+
+        Returns a dict mapping each of PROFILE_SECTIONS to an (n, dim) float32
+        matrix of L2-normalized embeddings, with zero rows for empty sections.
+        """
+        features = [extract_candidate_features(self._as_dict(c)) for c in candidates]
+        flat_texts = [
+            f.summary if section == "summary" else f.sections[section]
+            for section in PROFILE_SECTIONS
+            for f in features
+        ]
+        runtime = self.active
+        flat_embeddings = self._encode_texts(flat_texts, batch_size=batch_size, runtime=runtime)
+
+        n = len(features)
+        dim = runtime.model.get_sentence_embedding_dimension()
+        matrices = {}
+        for s, section in enumerate(PROFILE_SECTIONS):
+            matrix = np.zeros((n, dim), dtype=np.float32)
+            for i, embedding in enumerate(flat_embeddings[s * n:(s + 1) * n]):
+                if embedding is not None:
+                    norm = np.linalg.norm(embedding)
+                    if norm > 0:
+                        matrix[i] = embedding / norm
+            matrices[section] = matrix
+        return matrices
+
+    def profile_vectors(self, candidates, batch_size=32):
+        """Build one L2-normalized profile vector per candidate.
+
+        Section embeddings are concatenated, so the dot product of two
+        profile vectors averages their per-section cosine similarities.
+        """
+        matrices = self.encode_profiles(candidates, batch_size)
+        vectors = np.concatenate([matrices[s] for s in PROFILE_SECTIONS], axis=1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def applicant_vectors(self, applied_candidates, batch_size=32):
+        """Profile vectors of applications, for duplicate checks.
+
+        The summary of a converted application only names the job applied
+        for, which every applicant to a posting shares, so it is left out.
+        """
+        profiles = [
+            dict(self.convert_applied_candidate_format(a), summary="") for a in applied_candidates
+        ]
+        return self.profile_vectors(profiles, batch_size)
+
+    def _category_scores(
+        self, job, job_embeddings, candidate, candidate_embeddings, categories=CATEGORIES
+    ):
+        """Raw (0-1) similarity per scoring category.
+
+        Only the requested `categories` are computed, and only the sections
+        they depend on (see CATEGORY_SECTIONS) need embeddings.
+        """
+        # Calculate similarities for each category using embeddings
+        category_scores = {}
 
-        # Preferred Skills - add as a new category
-        if job_preferred_skills:
-            pref_embedding_similarity = self._calculate_similarity(
-                job_preferred_skills_embedding, candidate_skills_embedding
+        # Required Skills - combine embedding similarity with direct skill matching
+        if "required_skills" in categories:
+            embedding_similarity = self._calculate_similarity(
+                job_embeddings["required_skills"], candidate_embeddings["skills"]
             )
-            pref_direct_skill_match = self._calculate_direct_skill_match(
-                job_preferred_skills, candidate_skills
+            direct_skill_match = self._calculate_direct_skill_match(
+                job.required_skill_terms, candidate.skill_terms
             )
-            
-            category_scores["preferred_skills"] = (
-                0.3 * pref_embedding_similarity + 0.7 * pref_direct_skill_match
+
+            # Weight direct matching higher for skills
+            category_scores["required_skills"] = (
+                0.3 * embedding_similarity + 0.7 * direct_skill_match
             )
-        else:
-            category_scores["preferred_skills"] = 0.0
 
-        # Qualification - check for degree match
-        qual_embedding_similarity = self._calculate_similarity(
-            job_qualifications_embedding, candidate_education_embedding
-        )
+        # Preferred Skills - add as a new category
+        if "preferred_skills" in categories:
+            if job.sections["preferred_skills"]:
+                pref_embedding_similarity = self._calculate_similarity(
+                    job_embeddings["preferred_skills"], candidate_embeddings["skills"]
+                )
+                pref_direct_skill_match = self._calculate_direct_skill_match(
+                    job.preferred_skill_terms, candidate.skill_terms
+                )
+
+                category_scores["preferred_skills"] = (
+                    0.3 * pref_embedding_similarity + 0.7 * pref_direct_skill_match
+                )
+            else:
+                category_scores["preferred_skills"] = 0.0
 
-        # Boost score if there's a CS degree match
-        has_cs_degree = False
-        if "educations" in candidate_data:
-            for edu in candidate_data["educations"]:
-                degree = edu.get("degree", "").lower()
-                field = edu.get("field", "").lower()
-
-                if any(
-                    d in degree for d in self.education_keywords["bachelor"]
-                ) and any(
-                    f in field for f in self.education_keywords["computer science"]
-                ):
-                    has_cs_degree = True
-                    break
+        # Qualification - check for degree match
+        if "qualification" in categories:
+            category_scores["qualification"] = self._calculate_similarity(
+                job_embeddings["qualifications"], candidate_embeddings["education"]
+            )
 
-        category_scores["qualification"] = qual_embedding_similarity
-        if (
-            has_cs_degree
-            and "bachelor" in job_qualifications.lower()
-            and "computer science" in job_qualifications.lower()
-        ):
-            category_scores["qualification"] = max(
-                0.8, category_scores["qualification"]
-            )  # Increased boost
+            # Boost score if there's a CS degree match
+            if candidate.has_cs_degree and job.wants_cs_bachelor:
+                category_scores["qualification"] = max(
+                    0.8, category_scores["qualification"]
+                )  # Increased boost
 
         # Work Experience - check years of experience against requirements
-        exp_embedding_similarity = self._calculate_similarity(
-            job_work_requirements_embedding, candidate_experience_embedding
-        )
-        
-        responsibilities_match = self._calculate_similarity(
-            job_responsibilities_embedding, candidate_experience_embedding
-        )
-        
-        # Combine the two work experience metrics with responsibilities having higher weight
-        exp_combined_score = 0.4 * exp_embedding_similarity + 0.6 * responsibilities_match
-
-        # Extract years of experience required from job data
-        years_of_exp_required = 0
-        if "required_skills" in job_data:
-            for skill in job_data["required_skills"]:
-                if "year" in skill.lower() and "experience" in skill.lower():
-                    # Extract number of years required
-                    years_match = re.search(
-                        r"(\d+)[\+]?\s*(?:years?|yrs?)", skill.lower()
-                    )
-                    if years_match:
-                        years_of_exp_required = int(years_match.group(1))
+        if "work_experience" in categories:
+            exp_embedding_similarity = self._calculate_similarity(
+                job_embeddings["work_requirements"], candidate_embeddings["experience"]
+            )
+
+            responsibilities_match = self._calculate_similarity(
+                job_embeddings["responsibilities"], candidate_embeddings["experience"]
+            )
 
-        years_of_exp_candidate = 0
-        if "summary" in candidate_data:
-            years_match = re.search(
-                r"(\d+)[\+]?\s*(?:years?|yrs?)", candidate_data["summary"].lower()
+            # Combine the two work experience metrics with responsibilities having higher weight
+            category_scores["work_experience"] = (
+                0.4 * exp_embedding_similarity + 0.6 * responsibilities_match
             )
-            if years_match:
-                years_of_exp_candidate = int(years_match.group(1))
-
-        # Calculate total years from work experiences
-        total_years = 0
-        if "workExperiences" in candidate_data and candidate_data["workExperiences"]:
-            for exp in candidate_data["workExperiences"]:
-                if "durationInMonths" in exp:
-                    total_years += exp.get("durationInMonths", 0) / 12
-
-        # Use the maximum of explicit years mentioned or calculated total
-        years_of_exp_candidate = max(years_of_exp_candidate, total_years)
-
-        # Set the work experience score
-        category_scores["work_experience"] = exp_combined_score
-        
-        # Boost work experience score if candidate meets or exceeds required years
-        if years_of_exp_required > 0 and years_of_exp_candidate >= years_of_exp_required:
-            category_scores["work_experience"] = max(0.8, category_scores["work_experience"])
+
+            # Boost work experience score if candidate meets or exceeds required years
+            if job.years_required > 0 and candidate.years >= job.years_required:
+                category_scores["work_experience"] = max(
+                    0.8, category_scores["work_experience"]
+                )
 
         # Tech Stack - combine embedding similarity with direct skill matching
-        tech_embedding_similarity = self._calculate_similarity(
-            job_tech_stack_embedding, candidate_skills_embedding
-        )
-        tech_direct_match = self._calculate_direct_skill_match(
-            job_tech_stack, candidate_skills
-        )
+        if "tech_stack" in categories:
+            tech_embedding_similarity = self._calculate_similarity(
+                job_embeddings["tech_stack"], candidate_embeddings["skills"]
+            )
+            tech_direct_match = self._calculate_direct_skill_match(
+                job.tech_stack_terms, candidate.skill_terms
+            )
 
-        # Increased weight for direct matching in tech stack
-        category_scores["tech_stack"] = (
-            0.3 * tech_embedding_similarity + 0.7 * tech_direct_match
+            # Increased weight for direct matching in tech stack
+            category_scores["tech_stack"] = (
+                0.3 * tech_embedding_similarity + 0.7 * tech_direct_match
+            )
+
+        # Plain floats, so raw scores can be stored and combined again later
+        return {category: float(score) for category, score in category_scores.items()}
+
+    def _job_type_bonus(self, job, candidate):
+        """Bonus when one of the two most recent experiences matches the job type."""
+        job_type_match = job.job_type is not None and any(
+            job.job_type in job_type for job_type in candidate.recent_job_types
         )
 
-        # Add job type match bonus
-        # Check if job type matches candidate's preference or recent job types
-        job_type_match = False
-        if (
-            "job_type" in job_data 
-            and "workExperiences" in candidate_data 
-            and candidate_data["workExperiences"]
-        ):
-            job_type = job_data["job_type"].lower()
-            
-            # Check recent experiences for matching job type
-            for exp in candidate_data["workExperiences"][:2]:  # Consider only most recent 2
-                if "jobType" in exp and job_type in exp["jobType"].lower():
-                    job_type_match = True
-                    break
-        
-        # Apply job type bonus
-        if job_type_match:
-            # Small boost to overall score for job type match
-            job_type_bonus = 0.05
-        else:
-            job_type_bonus = 0.0
+        # Small boost to overall score for job type match
+        return 0.05 if job_type_match else 0.0
+
+    def _combine_scores(self, raw_scores, job_type_bonus, weights=None):
+        """Weighted overall score and percentage category scores from raw scores."""
+        # Format category scores as percentages
+        category_scores = {
+            category: float(round(score * 100, 2)) for category, score in raw_scores.items()
+        }
+        return {
+            "overall_match_score": self.overall_score(raw_scores, job_type_bonus, weights),
+            "category_scores": category_scores,
+        }
+
+    def overall_score(self, raw_scores, job_type_bonus, weights=None):
+        """Weighted overall match percentage from raw category scores.
+
+        Used when scoring and to re-weight stored raw scores (see /rerank/).
+        """
+        weights = weights or self.weights
 
         # Calculate weighted average
         total_score = 0
         applicable_weight_sum = 0
 
-        for category, score in category_scores.items():
+        for category, score in raw_scores.items():
             if score > 0:  # Only include non-zero scores
-                total_score += score * self.weights[category]
-                applicable_weight_sum += self.weights[category]
+                total_score += score * weights[category]
+                applicable_weight_sum += weights[category]
 
         # Normalize by applicable weights
         overall_match_score = (
             total_score / applicable_weight_sum if applicable_weight_sum > 0 else 0
         )
-        
+
         # Add the job type bonus to the overall score
         overall_match_score += job_type_bonus
 
-        # Format category scores as percentages
-        for category in category_scores:
-            category_scores[category] = float(round(category_scores[category] * 100, 2))
-
         # Scale up the overall match score
         scaling_factor = 1.1  # This will help push the scores higher
-        overall_match_percentage = float(
-            min(100, round(overall_match_score * 100 * scaling_factor, 2))
-        )
-
-        # Return the match scores
-        return {
-            "overall_match_score": overall_match_percentage,
-            "category_scores": category_scores,
-        }
+        return float(min(100, round(overall_match_score * 100 * scaling_factor, 2)))
+
+    def _matching_skills(self, job, candidate):
+        """Find candidate skills matching any job skill from feature records."""
+        matching_skills = set()
+        for job_skill in job.skill_names:
+            for candidate_lower, candidate_skill in candidate.skill_names:
+                if job_skill in candidate_lower or candidate_lower in job_skill:
+                    matching_skills.add(candidate_skill)
+                    break
+        return list(matching_skills)
 
     def get_matching_skills(self, job_data, candidate_data):
         """Get the matching skills between a job and a candidate."""
-        # Extract required skills from job
-        required_skills = []
-        if "description" in job_data and "required_skills" in job_data["description"]:
-            required_skills = job_data["description"]["required_skills"]
-            
-        # Add preferred skills
-        if "description" in job_data and "preferred_skills" in job_data["description"]:
-            required_skills.extend(job_data["description"]["preferred_skills"])
-
-        # Extract tech stack skills
-        if "description" in job_data and "technical_skills" in job_data["description"]:
-            for category, skills in job_data["description"]["technical_skills"].items():
-                required_skills.extend(skills)
-
-        # Extract candidate skills
-        candidate_skills = []
-        if "technicalSkills" in candidate_data and candidate_data["technicalSkills"]:
-            candidate_skills.extend(candidate_data["technicalSkills"])
-            
-        # Add soft skills
-        if "softSkills" in candidate_data and candidate_data["softSkills"]:
-            candidate_skills.extend(candidate_data["softSkills"])
-
-        # Find matching skills
-        matching_skills = []
-        for job_skill in required_skills:
-            for candidate_skill in candidate_skills:
-                if (
-                    job_skill.lower() in candidate_skill.lower()
-                    or candidate_skill.lower() in job_skill.lower()
-                ):
-                    matching_skills.append(candidate_skill)
-                    break
-
-        return list(set(matching_skills))  # Remove duplicates
\ No newline at end of file
+        return self._matching_skills(
+            extract_job_features(self._as_dict(job_data)),
+            extract_candidate_features(self._as_dict(candidate_data)),
+        )
\ No newline at end of file
@@ -1,6 +1,6 @@
 # models.py
 from typing import List, Dict, Optional, Any
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class Education(BaseModel):
     degree: Optional[str] = None
@@ -32,6 +32,10 @@ class Project(BaseModel):
     link: Optional[str] = None
 
 class Candidate(BaseModel):
+    # Fields the API does not know are kept, so batch results echo the
+    # candidate as it was sent
+    model_config = ConfigDict(extra="allow")
+
     id: Optional[str] = None
     name: Optional[str] = None
     email: Optional[str] = None
@@ -53,6 +57,40 @@ class Candidate(BaseModel):
     portfolio: Optional[str] = None
     languages: Optional[List[str]] = []
 
+# Applied candidates as stored with a job application
+class AppliedCandidateEducation(BaseModel):
+    degree: Optional[str] = None
+    endYear: Optional[str] = None
+    fieldOfStudy: Optional[str] = None
+    institution: Optional[str] = None
+    startYear: Optional[str] = None
+
+class AppliedCandidateWorkExperience(BaseModel):
+    company: Optional[str] = None
+    description: Optional[str] = None
+    endDate: Optional[str] = None
+    position: Optional[str] = None
+    startDate: Optional[str] = None
+
+class AppliedCandidate(BaseModel):
+    applicantEmail: Optional[str] = None
+    applicantName: Optional[str] = None
+    applicantPhone: Optional[str] = None
+    applicantProfileUrl: Optional[str] = None
+    applicantResumeUrl: Optional[str] = None
+    appliedAt: Optional[str] = None
+    candidateId: Optional[str] = None
+    companyName: Optional[str] = None
+    educations: Optional[List[AppliedCandidateEducation]] = []
+    jobId: Optional[str] = None
+    jobTitle: Optional[str] = None
+    languages: Optional[List[str]] = []
+    location: Optional[str] = None
+    softSkills: Optional[List[str]] = []
+    status: Optional[str] = None
+    technicalSkills: Optional[List[str]] = []
+    workExperiences: Optional[List[AppliedCandidateWorkExperience]] = []
+
 class JobDescription(BaseModel):
     position_summary: Optional[str] = None
 
@@ -73,10 +111,65 @@ class Job(BaseModel):
     posted_on: Optional[str] = None
     preferred_skills: Optional[List[str]] = []
     what_we_offer: Optional[List[str]] = []
+    # Per-job category weight overrides
+    weights: Optional[Dict[str, float]] = None
 
 class MatchRequest(BaseModel):
     job: Job
     candidate: Candidate
+    weights: Optional[Dict[str, float]] = None
+
+class BatchMatchRequest(BaseModel):
+    job: Optional[Job] = None
+    candidates: List[Candidate] = []
+    weights: Optional[Dict[str, float]] = None
+
+class AppliedCandidateMatchRequest(BaseModel):
+    job: Job
+    applied_candidates: List[AppliedCandidate]
+    weights: Optional[Dict[str, float]] = None
+
+class RerankRequest(BaseModel):
+    result_set_id: str
+    weights: Dict[str, float]
+    top_k: Optional[int] = None
+    min_score: Optional[float] = None
+    offset: int = 0
+    limit: Optional[int] = None
+
+# Rank stored candidates for a job that is not stored itself
+class TopCandidatesRequest(BaseModel):
+    job: Job
+    weights: Optional[Dict[str, float]] = None
+
+# Scores of stored jobs against stored candidates, by id
+class MatchMatrixRequest(BaseModel):
+    job_ids: List[str]
+    candidate_ids: List[str]
+    weights: Optional[Dict[str, float]] = None
+
+# Hot swap to a new model and/or a published store snapshot
+class SwapRequest(BaseModel):
+    model_name: Optional[str] = None
+    snapshot_version: Optional[str] = None
+
+class DuplicateCheckRequest(BaseModel):
+    applied_candidates: List[AppliedCandidate]
+    similarity_threshold: Optional[float] = 0.85
+
+class CompareCandidatesRequest(BaseModel):
+    candidate1: AppliedCandidate
+    candidate2: AppliedCandidate
+    similarity_threshold: Optional[float] = 0.85
+
+class BulkCompareCandidatesRequest(BaseModel):
+    candidate: AppliedCandidate
+    candidates: List[AppliedCandidate]
+    similarity_threshold: Optional[float] = 0.85
+
+class LiteFitRequest(BaseModel):
+    jobs: List[Job] = []
+    candidates: List[Candidate] = []
 
 class CategoryScore(BaseModel):
     required_skills: float
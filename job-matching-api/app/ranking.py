@@ -0,0 +1,91 @@
+# ranking.py
+import heapq
+import math
+from itertools import count
+
+
+class TopK:
+    """Bounded min-heap keeping the k best scored items seen so far.
+
+    Items are pushed one at a time (e.g. per scored micro-batch), so memory
+    stays O(k) however many candidates are scored. Ties keep input order.
+    With `k` of 0 (e.g. an empty page) nothing is kept.
+    """
+
+    def __init__(self, k=None, min_score=None):
+        self.k = k
+        self.min_score = min_score
+        self.seen = 0
+        self.accepted = 0
+        self._heap = []
+        self._order = count()
+
+    def push(self, score, item):
+        """Offer a scored item; items below `min_score` are dropped."""
+        self.seen += 1
+        if self.min_score is not None and score < self.min_score:
+            return
+        self.accepted += 1
+
+        # Negated order so earlier items win ties when popped from the min-heap
+        entry = (score, -next(self._order), item)
+        if self.k is not None and self.k <= 0:
+            return
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def ranked(self):
+        """Return the kept (score, item) pairs, best first."""
+        return [(score, item) for score, _, item in sorted(self._heap, reverse=True)]
+
+
+def page_size(top_k=None, offset=0, limit=None):
+    """Number of ranked items needed to serve a page within the top-k."""
+    needed = None if limit is None else offset + limit
+    if top_k is None:
+        return needed
+    return top_k if needed is None else min(top_k, needed)
+
+
+def paginate(ranked, offset=0, limit=None):
+    """Slice a ranked list, attaching 1-based ranks to each entry."""
+    end = None if limit is None else offset + limit
+    return [
+        (offset + i + 1, score, item)
+        for i, (score, item) in enumerate(ranked[offset:end])
+    ]
+
+
+def select_survivors(scores, keep_fraction=0.2, floor=None, min_keep=0):
+    """Pick which prefiltered candidates go on to full scoring.
+
+    Keeps those scoring at least `floor` when a floor is given, otherwise
+    the best `keep_fraction` of them; never fewer than `min_keep` (so a
+    requested top-k can still be filled). Returns indices in input order.
+    """
+    n = len(scores)
+    if floor is not None:
+        keep = sum(1 for score in scores if score >= floor)
+    else:
+        keep = math.ceil(max(0.0, min(1.0, keep_fraction)) * n)
+    keep = max(keep, min(min_keep, n))
+
+    best = heapq.nlargest(keep, range(n), key=lambda i: (scores[i], -i))
+    return sorted(best)
+
+
+def recall_at_k(full_scores, survivors, k):
+    """Share of the true top-k (by full score) that the cascade also ranks top-k.
+
+    `full_scores` maps every candidate index to its full score and
+    `survivors` are the indices that passed the prefilter.
+    """
+    k = min(k, len(full_scores))
+    if k <= 0:
+        return 1.0
+    ranked = lambda indices: heapq.nlargest(k, indices, key=lambda i: (full_scores[i], -i))
+    true_top = set(ranked(full_scores))
+    cascade_top = set(ranked(survivors))
+    return len(true_top & cascade_top) / k
\ No newline at end of file
@@ -0,0 +1,78 @@
+# responses.py
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+# Fast serializers are optional; fall back to the standard JSON encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def parse_fields(fields):
+    """Parse a comma separated `fields=` query value into dotted paths."""
+    if not fields:
+        return None
+    paths = [f.strip() for f in fields.split(",") if f.strip()]
+    return [path.split(".") for path in paths] or None
+
+
+def wants_field(paths, name):
+    """Return True if a top-level result field is selected by the projection."""
+    if paths is None:
+        return True
+    return any(path[0] == name for path in paths)
+
+
+def project(result, paths):
+    """Keep only the selected (possibly nested) fields of a result dict."""
+    if paths is None:
+        return result
+
+    projected = {}
+    for path in paths:
+        source = result
+        for key in path:
+            if not isinstance(source, dict) or key not in source:
+                break
+            source = source[key]
+        else:
+            # Rebuild the nested structure down to the selected leaf
+            target = projected
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            target[path[-1]] = source
+    return projected
+
+
+def dumps(content):
+    """Serialize content to JSON bytes using the fastest available encoder."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, separators=(",", ":")).encode("utf-8")
+
+
+def negotiated_response(content, accept=None):
+    """Build a response encoded according to the client's Accept header."""
+    accept = (accept or "").lower()
+
+    if msgpack is not None:
+        for media_type in MSGPACK_MEDIA_TYPES:
+            if media_type in accept:
+                return Response(
+                    content=msgpack.packb(content, use_bin_type=True),
+                    media_type=media_type,
+                )
+
+    if orjson is not None:
+        return Response(content=dumps(content), media_type="application/json")
+
+    return JSONResponse(content=content)
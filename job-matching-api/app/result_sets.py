@@ -0,0 +1,46 @@
+# result_sets.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class ResultSets:
+    """Recently scored result sets kept for re-weighting, by result set id.
+
+    A result set is a list of entries (record, raw_scores, job_type_bonus),
+    where record is the formatted result, and the category weights the set
+    was scored with. Sets expire after `ttl` seconds and at most `max_sets`
+    are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl=1800.0, max_sets=256):
+        self.ttl = ttl
+        self.max_sets = max_sets
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, entries, weights):
+        """Store a result set and the weights it was scored with; returns its id."""
+        result_set_id = uuid.uuid4().hex
+        with self._lock:
+            self._sets[result_set_id] = (time.monotonic() + self.ttl, (entries, weights))
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+        return result_set_id
+
+    def get(self, result_set_id):
+        """Return (entries, weights) of a result set, or None if unknown or expired."""
+        with self._lock:
+            stored = self._sets.get(result_set_id)
+            if stored is None:
+                return None
+            if stored[0] < time.monotonic():
+                del self._sets[result_set_id]
+                return None
+            self._sets.move_to_end(result_set_id)
+            return stored[1]
+
+    def stats(self):
+        with self._lock:
+            return {"sets": len(self._sets), "max_sets": self.max_sets}
@@ -0,0 +1,212 @@
+# score_cache.py
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+def _copy_record(record):
+    """Copy a cached record so callers can use it without touching the cache."""
+    return {
+        "raw_scores": dict(record["raw_scores"]),
+        "job_type_bonus": record["job_type_bonus"],
+        "matching_skills": list(record["matching_skills"]),
+    }
+
+
+class PairScoreCache:
+    """Raw category scores per (job id, candidate id, engine) pair.
+
+    Every entry records the section fingerprints of both profiles and the
+    scorer version (model and weights) it was computed with. A lookup is a
+    "hit" when all of them are unchanged and "stale" when only some
+    sections changed, in which case the stored entry is returned so just
+    the affected categories need rescoring; a different scorer version is
+    a miss. Storing a pair replaces its previous entry.
+
+    Records hold `raw_scores`, `job_type_bonus` and `matching_skills`.
+    Entries live in a bounded in-memory LRU in front of an optional SQLite
+    store, so they survive restarts and are shared by worker processes.
+    With `read_only` the SQLite store is only read: stored entries are
+    queued instead, for the process owning the store to write (see
+    `take_unsaved`), so worker processes never contend for its write lock.
+    """
+
+    def __init__(self, scorer_version, max_entries=50000, path=None, read_only=False):
+        self.scorer_version = scorer_version
+        self.max_entries = max_entries
+        self.path = path
+        self.read_only = read_only
+        self.unsaved = []
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path and read_only:
+            # The owning process creates the file and its table
+            if os.path.exists(path):
+                self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        elif path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pair_scores ("
+                " job_id TEXT NOT NULL, candidate_id TEXT NOT NULL, engine TEXT NOT NULL,"
+                " job_sections TEXT NOT NULL, candidate_sections TEXT NOT NULL,"
+                " scorer_version TEXT NOT NULL, record TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, candidate_id, engine))"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS pair_scores_candidate ON pair_scores (candidate_id)"
+            )
+            self._db.commit()
+
+    def _load(self, job_id, engine, candidate_ids):
+        """Read stored entries for candidate ids from SQLite."""
+        rows = {}
+        for start in range(0, len(candidate_ids), 500):
+            chunk = candidate_ids[start:start + 500]
+            for row in self._db.execute(
+                "SELECT candidate_id, job_sections, candidate_sections, scorer_version,"
+                " record FROM pair_scores WHERE job_id = ? AND engine = ?"
+                f" AND candidate_id IN ({','.join('?' * len(chunk))})",
+                (job_id, engine, *chunk),
+            ):
+                rows[row[0]] = (
+                    json.loads(row[1]),
+                    json.loads(row[2]),
+                    row[3],
+                    json.loads(row[4]),
+                )
+        return rows
+
+    def get_many(self, job_id, job_sections, engine, candidates):
+        """Look up (candidate_id, candidate_sections) pairs.
+
+        Returns, per candidate, ("hit", entry), ("stale", entry) or None,
+        where entry is (job_sections, candidate_sections, record).
+        """
+        found = [None] * len(candidates)
+        with self._lock:
+            entries = [self._entries.get((job_id, c, engine)) for c, _ in candidates]
+            missing = [i for i, entry in enumerate(entries) if entry is None]
+            if missing and self._db is not None:
+                rows = self._load(job_id, engine, [candidates[i][0] for i in missing])
+                for i in missing:
+                    entries[i] = rows.get(candidates[i][0])
+                    if entries[i] is not None:
+                        self._remember((job_id, candidates[i][0], engine), entries[i])
+
+            for i, ((candidate_id, candidate_sections), entry) in enumerate(
+                zip(candidates, entries)
+            ):
+                if entry is None or entry[2] != self.scorer_version:
+                    self.misses += 1
+                    continue
+                if (job_id, candidate_id, engine) in self._entries:
+                    self._entries.move_to_end((job_id, candidate_id, engine))
+                status = (
+                    "hit"
+                    if entry[0] == job_sections and entry[1] == candidate_sections
+                    else "stale"
+                )
+                if status == "hit":
+                    self.hits += 1
+                else:
+                    self.stale += 1
+                found[i] = (status, (entry[0], entry[1], _copy_record(entry[3])))
+        return found
+
+    def put_many(self, job_id, job_sections, engine, entries):
+        """Store (candidate_id, candidate_sections, record) entries."""
+        if not entries:
+            return
+        with self._lock:
+            for candidate_id, candidate_sections, record in entries:
+                self._remember(
+                    (job_id, candidate_id, engine),
+                    (job_sections, candidate_sections, self.scorer_version, _copy_record(record)),
+                )
+            if self.read_only:
+                self.unsaved.append((job_id, job_sections, engine, entries))
+            elif self._db is not None:
+                job_sections_json = json.dumps(job_sections, sort_keys=True)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO pair_scores VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            job_id,
+                            candidate_id,
+                            engine,
+                            job_sections_json,
+                            json.dumps(candidate_sections, sort_keys=True),
+                            self.scorer_version,
+                            json.dumps(record),
+                        )
+                        for candidate_id, candidate_sections, record in entries
+                    ],
+                )
+                self._db.commit()
+
+    def take_unsaved(self):
+        """Return and forget the put_many arguments queued by a read-only cache."""
+        with self._lock:
+            unsaved, self.unsaved = self.unsaved, []
+        return unsaved
+
+    def _remember(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, job_id=None, candidate_id=None, engine=None):
+        """Drop every entry of a job, a candidate and/or an engine.
+
+        Returns the number of entries removed.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if (job_id is not None and key[0] == job_id)
+                or (candidate_id is not None and key[1] == candidate_id)
+                or (engine is not None and key[2] == engine)
+            ]
+            for key in keys:
+                del self._entries[key]
+            removed = len(keys)
+            if self._db is not None and not self.read_only:
+                cursor = self._db.execute(
+                    "DELETE FROM pair_scores WHERE job_id = ? OR candidate_id = ? OR engine = ?",
+                    (job_id, candidate_id, engine),
+                )
+                self._db.commit()
+                removed = max(removed, cursor.rowcount)
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None and not self.read_only:
+                self._db.execute("DELETE FROM pair_scores")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale": self.stale,
+                "misses": self.misses,
+                "path": self.path,
+            }
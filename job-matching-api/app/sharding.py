@@ -0,0 +1,229 @@
+# sharding.py
+import json
+import logging
+import multiprocessing
+import os
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from .responses import dumps
+
+# Shards per worker process, so a slow shard does not leave cores idle
+SHARDS_PER_PROCESS = 2
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(options):
+    # One compute thread per process; the pool supplies the parallelism
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = "1"
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+    # Imported here so the parent does not pay for it again
+    from .matcher import JobCandidateMatchingSystem
+
+    _worker["options"] = options
+    _worker["matcher"] = JobCandidateMatchingSystem(
+        model_name=options["model_name"],
+        cache_size=options["cache_size"],
+        lite_path=options["lite_path"],
+        # Read through the SQLite file only, so invalidations are seen; new
+        # pair scores go back to the parent, the file's only writer
+        score_cache_size=0,
+        score_cache_path=options["score_cache_path"],
+        score_cache_read_only=True,
+        token_budget=options["token_budget"],
+        store_path=None,
+    )
+
+
+def _sync_worker(model_name, lite_state):
+    """Follow a model swap or lite refit made in the parent."""
+    matcher = _worker["matcher"]
+    if matcher.model_name != model_name:
+        matcher.activate(matcher.build_runtime(model_name))
+    lite = matcher.lite
+    if lite_state != (lite.documents, lite.average_length) and lite.path and os.path.exists(lite.path):
+        lite.load(lite.path)
+
+
+def _job_state(prepared_job):
+    """The picklable part of a prepared job, including its encoded sections."""
+    return (
+        prepared_job.features,
+        prepared_job.engine,
+        prepared_job.fallback,
+        prepared_job.job_id,
+        prepared_job.weights,
+        prepared_job.vectors,
+    )
+
+
+def _score_shard(task):
+    """Score one shard; candidates are read from and results written to shared memory."""
+    name, start, end, job_state, options = task
+    matcher = _worker["matcher"]
+    _sync_worker(options["model_name"], options["lite_state"])
+
+    from .matcher import PreparedJob
+
+    features, engine, fallback, job_id, weights, vectors = job_state
+    prepared_job = PreparedJob(features, engine, fallback, job_id, weights, matcher.active)
+    prepared_job.vectors.update(vectors)
+
+    inputs = shared_memory.SharedMemory(name=name)
+    try:
+        candidates = json.loads(bytes(inputs.buf[start:end]))
+    finally:
+        inputs.close()
+
+    results = []
+    batch_size = options["batch_size"]
+    for i in range(0, len(candidates), batch_size):
+        for _, match_result in matcher.score_batch(
+            prepared_job, candidates[i:i + batch_size], options["include_skills"]
+        ):
+            # Plain floats survive the JSON round trip exactly
+            match_result["raw_scores"] = {
+                category: float(score) for category, score in match_result["raw_scores"].items()
+            }
+            results.append(match_result)
+
+    # Pair scores to store, as (job_id, job_sections, engine, entries)
+    unsaved = prepared_job.runtime.score_cache.take_unsaved()
+    for _, _, _, entries in unsaved:
+        for _, _, record in entries:
+            record["raw_scores"] = {
+                category: float(score) for category, score in record["raw_scores"].items()
+            }
+    data = dumps({"results": results, "unsaved": unsaved})
+    output = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    output.buf[:len(data)] = data
+    output.close()
+    # The parent unlinks the segment once it has read it
+    resource_tracker.unregister(output._name, "shared_memory")
+    return output.name, len(data)
+
+
+class ShardedScorer:
+    """Scores large batches across a pool of warm worker processes.
+
+    Every worker loads the model when the pool starts, so requests never
+    wait for it. The candidates of a batch are serialized once into a
+    shared memory segment, each shard decodes only its own slice, and each
+    shard's results come back through a segment of its own; only segment
+    names and the prepared job cross the process boundary. The job is
+    prepared (and encoded) once in the parent, and shards are merged in
+    input order.
+
+    Workers keep their own embedding caches and read pair scores from the
+    SQLite score cache file. Pair scores they compute are returned with
+    their results and written by the parent, so the file has one writer.
+    Workers follow model swaps and lite refits (when the lite index is
+    persisted) of the parent on the next shard.
+    """
+
+    def __init__(self, matcher, processes, min_candidates, cache_size):
+        self.matcher = matcher
+        self.processes = processes
+        self.min_candidates = min_candidates
+        self.cache_size = cache_size
+        self.batches = 0
+        self.candidates = 0
+        self.seconds = 0.0
+        self._pool = None
+
+    def start(self):
+        """Start the worker processes (a no-op when sharding is disabled)."""
+        if self.processes <= 0 or self._pool is not None:
+            return
+        options = {
+            "model_name": self.matcher.model_name,
+            "cache_size": self.cache_size,
+            "lite_path": self.matcher.lite.path,
+            "score_cache_path": self.matcher.score_cache_path,
+            "token_budget": self.matcher.token_budget,
+        }
+        # Forking a process that already runs the model's threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(self.processes, _init_worker, (options,))
+        logging.info(f"Started {self.processes} scoring worker processes")
+
+    def applies(self, candidates):
+        return self._pool is not None and len(candidates) >= self.min_candidates
+
+    def score(self, job, candidates, batch_size=32, include_skills=False, engine="auto", weights=None):
+        """Score candidates against a job; returns (candidate, match_result) pairs in order."""
+        started = time.perf_counter()
+        candidates = [self.matcher._as_dict(c) for c in candidates]
+        prepared_job = self.matcher.prepare_job(job, engine, weights)
+        job_state = _job_state(prepared_job)
+        score_cache = prepared_job.runtime.score_cache
+
+        shards = max(1, min(len(candidates), self.processes * SHARDS_PER_PROCESS))
+        bounds = [len(candidates) * i // shards for i in range(shards + 1)]
+        chunks = [dumps(candidates[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+        lite = self.matcher.lite
+        options = {
+            "model_name": self.matcher.model_name,
+            "lite_state": (lite.documents, lite.average_length),
+            "batch_size": batch_size,
+            "include_skills": include_skills,
+        }
+        inputs = shared_memory.SharedMemory(create=True, size=max(1, sum(map(len, chunks))))
+        try:
+            tasks = []
+            offset = 0
+            for chunk in chunks:
+                inputs.buf[offset:offset + len(chunk)] = chunk
+                tasks.append((inputs.name, offset, offset + len(chunk), job_state, options))
+                offset += len(chunk)
+
+            results = []
+            error = None
+            pending = [self._pool.apply_async(_score_shard, (task,)) for task in tasks]
+            for result in pending:
+                try:
+                    name, size = result.get()
+                except Exception as e:
+                    error = error or e
+                    continue
+                # Every output segment is unlinked, even after a failed shard
+                output = shared_memory.SharedMemory(name=name)
+                try:
+                    if error is None:
+                        shard = json.loads(bytes(output.buf[:size]))
+                        results.extend(shard["results"])
+                        for job_id, job_sections, engine_used, entries in shard["unsaved"]:
+                            score_cache.put_many(job_id, job_sections, engine_used, entries)
+                finally:
+                    output.close()
+                    output.unlink()
+            if error is not None:
+                raise error
+        finally:
+            inputs.close()
+            inputs.unlink()
+
+        self.batches += 1
+        self.candidates += len(candidates)
+        self.seconds += time.perf_counter() - started
+        return list(zip(candidates, results))
+
+    def stats(self):
+        return {
+            "processes": self.processes if self._pool is not None else 0,
+            "min_candidates": self.min_candidates,
+            "batches": self.batches,
+            "candidates": self.candidates,
+            "candidates_per_second": round(self.candidates / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,87 @@
+# singleflight.py
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+
+def canonical_key(*parts):
+    """Content hash of JSON-compatible parts, independent of dict key order."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent computations and caches results briefly.
+
+    The first caller for a key runs the computation; callers arriving while
+    it is in flight await the same result instead of recomputing it.
+    Successful results are then served from a bounded cache for `ttl`
+    seconds; failures are shared with the waiting callers but not cached.
+    Used from the event loop only.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._in_flight = {}
+
+    def _cached(self, key):
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._results[key]
+            return None
+        return entry
+
+    async def run(self, key, compute):
+        """Return the result of `await compute()`, shared by identical callers."""
+        entry = self._cached(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.misses += 1
+            # A task of its own, so a caller going away does not cancel the others
+            task = asyncio.ensure_future(self._compute(key, compute))
+            self._in_flight[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, compute):
+        try:
+            value = await compute()
+            self._store(key, value)
+            return value
+        finally:
+            del self._in_flight[key]
+
+    def _store(self, key, value):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self._results[key] = (time.monotonic() + self.ttl, value)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._results),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+        }
@@ -0,0 +1,96 @@
+# snapshots.py
+import json
+import os
+import shutil
+import time
+import uuid
+
+from .stores import SectionStore
+
+# Names the published snapshot version, replaced atomically on publish
+CURRENT_FILE = "CURRENT"
+
+# Published snapshots kept on disk, newest first (older ones are deleted)
+SNAPSHOTS_KEPT = 3
+
+
+def publish_snapshot(root, stores, metadata=None):
+    """Export stores as a new versioned snapshot under root and make it current.
+
+    The snapshot is written to a hidden temporary directory and renamed into
+    place, then the CURRENT file is replaced, so readers only ever see a
+    complete snapshot. Returns the new version.
+    """
+    # Microseconds keep versions published within one second in order
+    now = time.time()
+    version = (
+        f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(now))}"
+        f".{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+    )
+    os.makedirs(root, exist_ok=True)
+    tmp_path = os.path.join(root, f".{version}.tmp")
+    try:
+        contents = {name: store.export(os.path.join(tmp_path, name)) for name, store in stores.items()}
+        with open(os.path.join(tmp_path, "snapshot.json"), "w") as f:
+            json.dump(
+                {"version": version, "created": time.time(), "stores": contents, **(metadata or {})},
+                f,
+            )
+        os.rename(tmp_path, os.path.join(root, version))
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    current_tmp = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(current_tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILE))
+    _prune(root, version)
+    return version
+
+
+def current_version(root):
+    """The published snapshot version under root (None if nothing is published)."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot(root, version=None):
+    """Open a snapshot (the current one by default) memory-mapped.
+
+    Returns (metadata, {store name: SectionStore}), or None when there is no
+    snapshot to load.
+    """
+    version = version or current_version(root)
+    if version is None:
+        return None
+    if os.path.basename(version) != version or version in (".", ".."):
+        raise ValueError(f"Invalid snapshot version {version!r}")
+    path = os.path.join(root, version)
+    with open(os.path.join(path, "snapshot.json")) as f:
+        metadata = json.load(f)
+    stores = {name: SectionStore.open(os.path.join(path, name)) for name in metadata["stores"]}
+    return metadata, stores
+
+
+def list_snapshots(root):
+    """Published snapshot versions under root, newest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        (name for name in os.listdir(root) if not name.startswith(".") and name != CURRENT_FILE),
+        reverse=True,
+    )
+
+
+def _prune(root, current):
+    # Processes still mapping a deleted snapshot keep reading it until they
+    # switch, since unlinked files stay readable while mapped
+    for version in list_snapshots(root)[SNAPSHOTS_KEPT:]:
+        if version != current:
+            shutil.rmtree(os.path.join(root, version), ignore_errors=True)
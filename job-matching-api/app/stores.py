@@ -0,0 +1,504 @@
+# stores.py
+import json
+import os
+import threading
+
+import numpy as np
+
+from .features import FACETS, features_from_dict, features_to_dict, skill_keys
+
+# How the scan copy of each section embedding is kept: full float32 ("none"),
+# float16 (half the memory) or int8 with a per-vector scale (a quarter)
+QUANTIZATIONS = ("none", "float16", "int8")
+
+# Rows dequantized at a time during a scan, bounding temporary memory
+SCAN_BLOCK = 65536
+
+# Rows allocated up front; capacity doubles when it runs out
+INITIAL_CAPACITY = 1024
+
+
+def quantize(matrix, quantization):
+    """Return (codes, scales) for the rows of a float32 matrix.
+
+    int8 codes are symmetric per row, so row i is approximately
+    codes[i] * scales[i]; scales is None for the other formats.
+    """
+    if quantization == "int8":
+        scales = (np.abs(matrix).max(axis=1) / 127).astype(np.float32)
+        safe = np.where(scales > 0, scales, 1.0)
+        codes = np.rint(matrix / safe[:, None]).astype(np.int8)
+        return codes, scales
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    return matrix.astype(np.float32), None
+
+
+class SectionStore:
+    """Normalized section embeddings of stored profiles, by profile id.
+
+    Each section keeps a (possibly quantized) scan copy in memory for bulk
+    similarity scans, and the full-precision float32 vectors either in
+    memory or, with `path`, in memory-mapped files under that directory, so
+    the top rows of a scan can be re-scored exactly. Rows also carry the
+    profile's feature record and a small metadata dict. Removed rows are
+    tombstoned, not reused.
+
+    Rows are also indexed by facet (the `facets` entry of their metadata,
+    see features.FACETS) and by skill: each value maps to the set of rows
+    having it, so filters select rows before any vectors are touched.
+
+    A store can be exported to a directory of `.npy` files and opened from
+    one memory-mapped (see snapshots.py): the mapped pages are shared by
+    every process that opens the same files, and copied only when written.
+    """
+
+    def __init__(self, sections, dim, quantization="int8", path=None):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.sections = tuple(sections)
+        self.dim = dim
+        self.quantization = quantization
+        self.path = path
+        self.ids = []
+        self._records = []
+        self._rows = {}
+        self._capacity = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._present = {}
+        self._codes = {}
+        self._scales = {}
+        self._full = {}
+        self._postings = {name: {} for name in (*FACETS, "skills")}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, profile_id):
+        return profile_id in self._rows
+
+    def _grow(self, rows):
+        """Make room for at least `rows` rows, keeping existing ones."""
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, 2 * self._capacity, INITIAL_CAPACITY)
+        n = self._capacity
+
+        live = np.zeros(capacity, dtype=bool)
+        live[:n] = self._live
+        self._live = live
+        for section in self.sections:
+            present = np.zeros(capacity, dtype=bool)
+            if section in self._present:
+                present[:n] = self._present[section]
+            self._present[section] = present
+            self._full[section] = self._grow_full(section, capacity)
+            if self.quantization == "none":
+                # The full-precision vectors double as the scan copy
+                self._codes[section] = self._full[section]
+                continue
+            codes_dtype = np.int8 if self.quantization == "int8" else np.float16
+            codes = np.zeros((capacity, self.dim), dtype=codes_dtype)
+            if section in self._codes:
+                codes[:n] = self._codes[section]
+            self._codes[section] = codes
+            if self.quantization == "int8":
+                scales = np.zeros(capacity, dtype=np.float32)
+                if section in self._scales:
+                    scales[:n] = self._scales[section]
+                self._scales[section] = scales
+        self._capacity = capacity
+
+    def _grow_full(self, section, capacity):
+        old = self._full.get(section)
+        if not self.path:
+            full = np.zeros((capacity, self.dim), dtype=np.float32)
+            if old is not None:
+                full[:self._capacity] = old
+            return full
+
+        os.makedirs(self.path, exist_ok=True)
+        file_path = os.path.join(self.path, f"{section}.f32")
+        if old is not None:
+            old.flush()
+        # Extending the file keeps the rows already written; a new store
+        # starts from an empty file
+        with open(file_path, "r+b" if old is not None else "wb") as f:
+            f.truncate(capacity * self.dim * 4)
+        return np.memmap(file_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def put_many(self, ids, features, vectors, meta=None, replace=True):
+        """Insert or replace profiles; returns how many were written.
+
+        `vectors` holds one dict per profile mapping each section to its
+        embedding (None for empty sections); vectors are normalized here.
+        With `replace=False` profiles already stored are left untouched.
+        """
+        if self.dim is None:
+            raise RuntimeError("The store has no embedding dimension (model unavailable)")
+        meta = meta if meta is not None else [{}] * len(ids)
+        with self._lock:
+            if not replace:
+                keep = [j for j, profile_id in enumerate(ids) if profile_id not in self._rows]
+                ids = [ids[j] for j in keep]
+                features = [features[j] for j in keep]
+                vectors = [vectors[j] for j in keep]
+                meta = [meta[j] for j in keep]
+            rows = []
+            for profile_id in ids:
+                row = self._rows.get(profile_id)
+                if row is None:
+                    row = len(self.ids)
+                    self._rows[profile_id] = row
+                    self.ids.append(profile_id)
+                    self._records.append(None)
+                rows.append(row)
+            self._grow(len(self.ids))
+            rows = np.asarray(rows, dtype=np.int64)
+
+            for section in self.sections:
+                matrix = np.zeros((len(rows), self.dim), dtype=np.float32)
+                present = np.zeros(len(rows), dtype=bool)
+                for j, profile_vectors in enumerate(vectors):
+                    vector = profile_vectors.get(section)
+                    if vector is None:
+                        continue
+                    norm = np.linalg.norm(vector)
+                    if norm > 0:
+                        matrix[j] = vector / norm
+                        present[j] = True
+                self._full[section][rows] = matrix
+                if self.quantization != "none":
+                    codes, scales = quantize(matrix, self.quantization)
+                    self._codes[section][rows] = codes
+                    if scales is not None:
+                        self._scales[section][rows] = scales
+                self._present[section][rows] = present
+
+            self._live[rows] = True
+            for row, record, row_meta in zip(rows.tolist(), features, meta):
+                previous = self._records[row]
+                if previous is not None:
+                    self._index(row, *previous, add=False)
+                self._records[row] = (record, row_meta)
+                self._index(row, record, row_meta, add=True)
+        return len(rows)
+
+    def _index(self, row, record, meta, add):
+        """Add a row to, or drop it from, the facet and skill postings."""
+        facets = (meta or {}).get("facets") or {}
+        keys = [(facet, value) for facet in FACETS for value in facets.get(facet, ())]
+        if record is not None:
+            keys.extend(("skills", skill) for skill in skill_keys(record))
+        for name, value in keys:
+            postings = self._postings[name]
+            rows = postings.get(value)
+            if rows is None:
+                rows = set()
+            elif isinstance(rows, np.ndarray):
+                # Mapped from a snapshot; copied on the first change
+                rows = set(rows.tolist())
+            if add:
+                rows.add(row)
+            else:
+                rows.discard(row)
+            if rows:
+                postings[value] = rows
+            else:
+                postings.pop(value, None)
+
+    def remove(self, profile_id):
+        """Forget a profile; returns whether it was stored."""
+        with self._lock:
+            row = self._rows.pop(profile_id, None)
+            if row is None:
+                return False
+            self._live[row] = False
+            self.ids[row] = None
+            if self._records[row] is not None:
+                self._index(row, *self._records[row], add=False)
+            self._records[row] = None
+            return True
+
+    def filter_rows(self, profile_filter):
+        """Boolean mask of the live rows passing a features.facet_filter.
+
+        Each filtered facet selects the union of its accepted values'
+        postings, and each must-have skill its own postings; a row passes
+        when it is selected by all of them.
+        """
+        facets, skills = profile_filter
+        with self._lock:
+            n = len(self.ids)
+            mask = np.array(self._live[:n], dtype=bool)
+            selections = [(facet, accepted) for facet, accepted in facets.items()]
+            selections += [("skills", (skill,)) for skill in skills]
+            for name, accepted in selections:
+                selected = np.zeros(n, dtype=bool)
+                for value in accepted:
+                    rows = self._postings[name].get(value)
+                    if rows is not None:
+                        selected[_posting_rows(rows)] = True
+                mask &= selected
+            return mask
+
+    def scan(self, queries, k, mask=None):
+        """Best `k` rows by approximate score, best first.
+
+        `queries` maps sections to query vectors; a row scores the sum of
+        the dot products of its (dequantized) section vectors with them.
+        With a `mask` (see filter_rows) only the selected rows are scored.
+        Returns a list of (row, approximate score).
+        """
+        if mask is not None:
+            return self._scan_rows(queries, k, mask)
+        with self._lock:
+            n = len(self.ids)
+            if not self._rows or k <= 0:
+                return []
+            scores = np.zeros(n, dtype=np.float32)
+            for section, query in queries.items():
+                query = np.asarray(query, dtype=np.float32)
+                codes = self._codes[section]
+                scales = self._scales.get(section)
+                for start in range(0, n, SCAN_BLOCK):
+                    end = min(n, start + SCAN_BLOCK)
+                    block = codes[start:end].astype(np.float32) @ query
+                    if scales is not None:
+                        block *= scales[start:end]
+                    scores[start:end] += block
+            scores[~self._live[:n]] = -np.inf
+            k = min(k, len(self._rows))
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def _scan_rows(self, queries, k, mask):
+        with self._lock:
+            n = len(self.ids)
+            rows = np.flatnonzero(mask[:n] & self._live[:n])
+            if not len(rows) or k <= 0:
+                return []
+            scores = np.zeros(len(rows), dtype=np.float32)
+            for section, query in queries.items():
+                query = np.asarray(query, dtype=np.float32)
+                codes = self._codes[section]
+                scales = self._scales.get(section)
+                for start in range(0, len(rows), SCAN_BLOCK):
+                    block_rows = rows[start:start + SCAN_BLOCK]
+                    block = codes[block_rows].astype(np.float32) @ query
+                    if scales is not None:
+                        block *= scales[block_rows]
+                    scores[start:start + len(block_rows)] += block
+            k = min(k, len(rows))
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def entry(self, row):
+        """(id, feature record, metadata, full-precision section vectors) of a row."""
+        with self._lock:
+            vectors = {
+                section: np.array(self._full[section][row]) if self._present[section][row] else None
+                for section in self.sections
+            }
+            record, meta = self._records[row] or (None, None)
+            return self.ids[row], record, meta, vectors
+
+    def row(self, profile_id):
+        return self._rows.get(profile_id)
+
+    def export(self, directory):
+        """Write the store to a directory of .npy files plus metadata."""
+        os.makedirs(directory)
+        with self._lock:
+            n = len(self.ids)
+            np.save(os.path.join(directory, "ids.npy"), np.array([i or "" for i in self.ids], dtype=str))
+            np.save(os.path.join(directory, "live.npy"), self._live[:n])
+            for section in self.sections:
+                if section not in self._present:
+                    # Nothing was ever stored, so the section has no arrays yet
+                    self._export_empty(directory, section)
+                    continue
+                np.save(os.path.join(directory, f"{section}.present.npy"), self._present[section][:n])
+                np.save(os.path.join(directory, f"{section}.full.npy"), self._full[section][:n])
+                if self.quantization != "none":
+                    np.save(os.path.join(directory, f"{section}.codes.npy"), self._codes[section][:n])
+                if self.quantization == "int8":
+                    np.save(os.path.join(directory, f"{section}.scales.npy"), self._scales[section][:n])
+
+            # Feature records as JSON lines, decoded one at a time when read
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            with open(os.path.join(directory, "records.jsonl"), "wb") as f:
+                for row in range(n):
+                    entry = self._records[row]
+                    if entry is not None:
+                        f.write(
+                            json.dumps(
+                                {"features": features_to_dict(entry[0]), "meta": entry[1]}
+                            ).encode("utf-8")
+                        )
+                    f.write(b"\n")
+                    offsets[row + 1] = f.tell()
+            np.save(os.path.join(directory, "record_offsets.npy"), offsets)
+
+            # Postings as one row array per index, sliced by value offsets
+            posting_values = {}
+            for name, postings in self._postings.items():
+                values = list(postings)
+                arrays = [np.sort(_posting_rows(postings[value])) for value in values]
+                np.save(
+                    os.path.join(directory, f"{name}.postings.npy"),
+                    np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64),
+                )
+                np.save(
+                    os.path.join(directory, f"{name}.posting_offsets.npy"),
+                    np.cumsum([0, *(len(a) for a in arrays)]),
+                )
+                posting_values[name] = values
+            with open(os.path.join(directory, "postings.json"), "w") as f:
+                json.dump(posting_values, f)
+
+            metadata = {
+                "sections": list(self.sections),
+                "dim": self.dim,
+                "quantization": self.quantization,
+                "rows": n,
+                "entries": len(self._rows),
+            }
+        with open(os.path.join(directory, "metadata.json"), "w") as f:
+            json.dump(metadata, f)
+        return metadata
+
+    def _export_empty(self, directory, section):
+        dim = self.dim or 0
+        np.save(os.path.join(directory, f"{section}.present.npy"), np.zeros(0, dtype=bool))
+        np.save(os.path.join(directory, f"{section}.full.npy"), np.zeros((0, dim), dtype=np.float32))
+        if self.quantization != "none":
+            codes_dtype = np.int8 if self.quantization == "int8" else np.float16
+            np.save(os.path.join(directory, f"{section}.codes.npy"), np.zeros((0, dim), dtype=codes_dtype))
+        if self.quantization == "int8":
+            np.save(os.path.join(directory, f"{section}.scales.npy"), np.zeros(0, dtype=np.float32))
+
+    @classmethod
+    def open(cls, directory):
+        """Open an exported store with its arrays memory-mapped copy-on-write."""
+        with open(os.path.join(directory, "metadata.json")) as f:
+            metadata = json.load(f)
+        store = cls(metadata["sections"], metadata["dim"], metadata["quantization"])
+
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="c")
+
+        n = metadata["rows"]
+        store.ids = [profile_id or None for profile_id in load("ids.npy").tolist()]
+        store._live = load("live.npy")
+        store._rows = {
+            profile_id: row for row, profile_id in enumerate(store.ids) if store._live[row]
+        }
+        for section in store.sections:
+            store._present[section] = load(f"{section}.present.npy")
+            store._full[section] = load(f"{section}.full.npy")
+            if store.quantization == "none":
+                store._codes[section] = store._full[section]
+            else:
+                store._codes[section] = load(f"{section}.codes.npy")
+            if store.quantization == "int8":
+                store._scales[section] = load(f"{section}.scales.npy")
+        store._records = _SnapshotRecords(
+            os.path.join(directory, "records.jsonl"), load("record_offsets.npy")
+        )
+        store._capacity = n
+
+        postings_path = os.path.join(directory, "postings.json")
+        if os.path.exists(postings_path):
+            with open(postings_path) as f:
+                posting_values = json.load(f)
+            for name, values in posting_values.items():
+                rows = load(f"{name}.postings.npy")
+                offsets = load(f"{name}.posting_offsets.npy")
+                store._postings[name] = {
+                    _as_key(value): rows[offsets[i]:offsets[i + 1]] for i, value in enumerate(values)
+                }
+        else:
+            # Snapshots published without postings are indexed from their records
+            for row in store._rows.values():
+                if store._records[row] is not None:
+                    store._index(row, *store._records[row], add=True)
+        return store
+
+    def stats(self):
+        with self._lock:
+            n = len(self.ids)
+            dim = self.dim or 0
+            full_bytes = n * dim * 4 * len(self.sections)
+            if self.quantization == "none":
+                scan_bytes = full_bytes
+            else:
+                itemsize = 1 if self.quantization == "int8" else 2
+                scan_bytes = n * len(self.sections) * (dim * itemsize)
+                if self.quantization == "int8":
+                    scan_bytes += n * len(self.sections) * 4
+            return {
+                "entries": len(self._rows),
+                "rows": n,
+                "quantization": self.quantization,
+                "scan_bytes": scan_bytes,
+                "full_bytes": full_bytes,
+                "full_on_disk": bool(self.path),
+                "facet_values": {name: len(postings) for name, postings in self._postings.items()},
+            }
+
+
+def _posting_rows(rows):
+    """Row numbers of a posting (a set, or an array mapped from a snapshot)."""
+    if isinstance(rows, np.ndarray):
+        return rows
+    return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+
+def _as_key(value):
+    # JSON has no tuples, but facet values are plain strings and numbers
+    return tuple(value) if isinstance(value, list) else value
+
+
+class _SnapshotRecords:
+    """Feature records of an opened store, decoded from the file on access.
+
+    Rows written after opening are kept in memory on top of the file.
+    """
+
+    def __init__(self, path, offsets):
+        self._offsets = offsets
+        self._base = len(offsets) - 1
+        self._data = (
+            np.memmap(path, dtype=np.uint8, mode="r") if offsets[-1] > 0 else b""
+        )
+        self._changed = {}
+        self._appended = []
+
+    def __len__(self):
+        return self._base + len(self._appended)
+
+    def __getitem__(self, row):
+        if row >= self._base:
+            return self._appended[row - self._base]
+        if row in self._changed:
+            return self._changed[row]
+        line = bytes(self._data[self._offsets[row]:self._offsets[row + 1]]).strip()
+        if not line:
+            return None
+        data = json.loads(line)
+        return features_from_dict(data["features"]), data["meta"]
+
+    def __setitem__(self, row, value):
+        if row >= self._base:
+            self._appended[row - self._base] = value
+        else:
+            self._changed[row] = value
+
+    def append(self, value):
+        self._appended.append(value)
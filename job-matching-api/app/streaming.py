@@ -0,0 +1,275 @@
+# streaming.py
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+# Largest single record (NDJSON line or JSON value) an upload may contain,
+# in characters; larger ones are rejected rather than buffered
+MAX_RECORD_CHARS = 1 << 20
+
+# What a number or literal cut off at the end of the buffer can look like
+_PARTIAL_TOKEN_RE = re.compile(r"[\w.+\-]*\Z")
+
+
+class UploadFormatError(ValueError):
+    """Raised when a streamed upload body is not in the expected shape."""
+
+
+class InvalidRecord:
+    """Yielded in place of an NDJSON line that could not be decoded."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+async def _iter_text(chunks):
+    """Decode an async stream of UTF-8 byte chunks into text chunks."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def _record_too_long():
+    return f"Records may be at most {MAX_RECORD_CHARS} characters"
+
+
+def _check_record_size(size):
+    if size > MAX_RECORD_CHARS:
+        raise UploadFormatError(_record_too_long())
+
+
+def _decode_line(line, skip_invalid):
+    if skip_invalid and len(line) > MAX_RECORD_CHARS:
+        return InvalidRecord(_record_too_long())
+    _check_record_size(len(line))
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        if not skip_invalid:
+            raise
+        return InvalidRecord(f"Invalid JSON: {e}")
+
+
+async def iter_ndjson(chunks, skip_invalid=False):
+    """Yield one decoded record per non-empty line of an NDJSON body.
+
+    With `skip_invalid`, a line that is not valid JSON or is too long is
+    yielded as an InvalidRecord (the rest of a long line is not buffered)
+    instead of ending the body with an error.
+    """
+    # Parts of the line being received, joined once it is complete; None
+    # while skipping a line that is already too long
+    pending = []
+    size = 0
+    async for text in _iter_text(chunks):
+        lines = text.split("\n")
+        if len(lines) > 1:
+            lines[0] = None if pending is None else "".join(pending) + lines[0]
+            pending = []
+            size = 0
+        last = lines.pop()
+        for line in lines:
+            if line is None:
+                yield InvalidRecord(_record_too_long())
+            elif line.strip():
+                yield _decode_line(line, skip_invalid)
+        if pending is not None:
+            pending.append(last)
+            size += len(last)
+            if size > MAX_RECORD_CHARS:
+                if not skip_invalid:
+                    raise UploadFormatError(_record_too_long())
+                pending = None
+    if pending is None:
+        yield InvalidRecord(_record_too_long())
+        return
+    line = "".join(pending)
+    if line.strip():
+        yield _decode_line(line, skip_invalid)
+
+
+class _JsonReader:
+    """Pull-style reader that decodes JSON tokens from a growing text buffer.
+
+    Only the unconsumed tail of the body is kept, so memory stays bounded by
+    the largest single value (at most MAX_RECORD_CHARS) rather than the
+    whole upload. An incomplete value is decoded again only once the buffer
+    has doubled, so large values are not re-parsed after every chunk.
+    """
+
+    def __init__(self, chunks):
+        self._texts = _iter_text(chunks).__aiter__()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _next_text(self):
+        """The next text chunk, or None at end of body."""
+        if self._eof:
+            return None
+        try:
+            return await self._texts.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            return None
+
+    async def _fill(self):
+        """Append the next text chunk; return False at end of body."""
+        text = await self._next_text()
+        if text is None:
+            return False
+        # Drop the consumed prefix before growing the buffer
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    async def _grow(self):
+        """Read until the unconsumed text has doubled, or the body ends."""
+        parts = [self._buffer[self._pos:]]
+        size = len(parts[0])
+        wanted = max(1, 2 * size)
+        while size < wanted:
+            _check_record_size(size)
+            text = await self._next_text()
+            if text is None:
+                break
+            parts.append(text)
+            size += len(text)
+        self._buffer = "".join(parts)
+        self._pos = 0
+
+    async def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._fill():
+                return None
+
+    async def expect(self, chars):
+        """Consume the next character, which must be one of `chars`."""
+        char = await self.peek()
+        if char is None or char not in chars:
+            raise UploadFormatError(f"Expected one of {chars!r}, got {char!r}")
+        self._pos += 1
+        return char
+
+    async def value(self):
+        """Decode and consume one complete JSON value."""
+        await self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if not _maybe_truncated(e, self._buffer):
+                    raise UploadFormatError(f"Invalid JSON: {e.msg}")
+                if self._eof:
+                    raise UploadFormatError("Truncated JSON body")
+                await self._grow()
+                continue
+            # A number at the buffer end may continue in the next chunk
+            if end == len(self._buffer) and not self._eof and not isinstance(value, (dict, list, str)):
+                if await self._fill():
+                    continue
+            self._pos = end
+            return value
+
+
+def _maybe_truncated(error, buffer):
+    """Whether a decode error may only mean the buffer ends mid-value.
+
+    Anything else is a syntax error, reported without reading further.
+    """
+    if error.msg.startswith("Unterminated string"):
+        return True
+    rest = buffer[error.pos:]
+    if error.msg.startswith("Invalid \\uXXXX escape"):
+        return len(rest) < 6
+    return _PARTIAL_TOKEN_RE.match(rest) is not None
+
+
+async def iter_batch_upload(chunks):
+    """Incrementally parse a `{"job": ..., "candidates": [...]}` JSON body.
+
+    Yields ("job", job) once, ("weights", weights) if the body has category
+    weights, then ("candidate", candidate) for each element of the
+    candidates array as soon as it has been received. The job and weights
+    must precede the candidates so scoring can start before the upload ends.
+    """
+    reader = _JsonReader(chunks)
+    job_seen = False
+    weights_seen = False
+    candidates_seen = False
+
+    await reader.expect("{")
+    if await reader.peek() == "}":
+        return
+
+    while True:
+        key = await reader.value()
+        if not isinstance(key, str):
+            raise UploadFormatError("Object keys must be strings")
+        await reader.expect(":")
+
+        if key == "candidates":
+            if not job_seen:
+                raise UploadFormatError("`job` must precede `candidates` in streamed uploads")
+            candidates_seen = True
+            await reader.expect("[")
+            if await reader.peek() == "]":
+                await reader.expect("]")
+            else:
+                while True:
+                    yield "candidate", await reader.value()
+                    if await reader.expect(",]") == "]":
+                        break
+        elif key == "job":
+            # A second job would replace the one candidates are scored against
+            if job_seen:
+                raise UploadFormatError("Duplicate `job` key in upload")
+            job_seen = True
+            yield "job", await reader.value()
+        elif key == "weights":
+            if weights_seen:
+                raise UploadFormatError("Duplicate `weights` key in upload")
+            if candidates_seen:
+                raise UploadFormatError("`weights` must precede `candidates` in streamed uploads")
+            weights_seen = True
+            yield "weights", await reader.value()
+        else:
+            # Unknown keys are skipped
+            await reader.value()
+
+        if await reader.expect(",}") == "}":
+            return
+
+
+async def iter_ndjson_upload(chunks):
+    """Parse an NDJSON upload whose first record is `{"job": ...}`.
+
+    The first record may also carry category `weights`. Every following
+    line is a candidate record.
+    """
+    job_seen = False
+    async for record in iter_ndjson(chunks):
+        if not job_seen:
+            if not isinstance(record, dict) or "job" not in record:
+                raise UploadFormatError("The first NDJSON record must be {\"job\": ...}")
+            job_seen = True
+            yield "job", record["job"]
+            if record.get("weights") is not None:
+                yield "weights", record["weights"]
+        else:
+            yield "candidate", record
@@ -0,0 +1,138 @@
+"""Compare naive and length-bucketed batching of section texts.
+
+Builds a mix of synthetic candidates whose sections range from a few skills
+to long multi-role experience blobs, then encodes their section texts:
+
+- naive: fixed `batch_size` chunks in input order, one model call each
+- single call: one model call over all texts (sentence-transformers sorts
+  them by character length internally)
+- bucketed: the API's length buckets capped by a token budget
+
+Usage: python benchmark_batching.py [--candidates 500] [--batch-size 32]
+       [--token-budget 8192] [--model all-MiniLM-L6-v2] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+from sentence_transformers import SentenceTransformer
+
+from app.batching import TOKEN_BUDGET, length_batches, token_lengths
+from app.features import CANDIDATE_SECTIONS, extract_candidate_features
+
+WORDS = (
+    "built maintained designed scalable services pipelines dashboards python java "
+    "react kubernetes docker aws postgres kafka spark led team of engineers migrated "
+    "legacy monolith to microservices improved latency by reducing cost for clients "
+    "across retail banking healthcare logistics platforms using agile delivery"
+).split()
+SKILLS = (
+    "Python Java Go Rust SQL React Angular Docker Kubernetes AWS GCP Azure Django "
+    "FastAPI Flask Spark Kafka Terraform Linux Git TensorFlow PyTorch Pandas"
+).split()
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def synthetic_candidate(rng, i):
+    """A candidate whose sections vary in length the way real profiles do."""
+    return {
+        "id": f"bench-{i}",
+        "summary": sentence(rng, 5, 60),
+        "technicalSkills": rng.sample(SKILLS, rng.randint(2, 15)),
+        "softSkills": ["Communication"],
+        "educations": [
+            {"degree": "BS", "field": "Computer Science", "school": "University"}
+            for _ in range(rng.randint(0, 2))
+        ],
+        "workExperiences": [
+            {
+                "title": "Engineer",
+                "company": f"Company {j}",
+                "description": sentence(rng, 10, 120),
+                "jobType": "Full-time",
+                "durationInMonths": rng.randint(3, 60),
+            }
+            for j in range(rng.choice((0, 1, 1, 2, 3, 6)))
+        ],
+        "projects": [
+            {"title": "Project", "description": sentence(rng, 5, 80)}
+            for _ in range(rng.randint(0, 4))
+        ],
+    }
+
+
+def section_texts(candidates):
+    texts = []
+    for candidate in candidates:
+        sections = extract_candidate_features(candidate).sections
+        texts.extend(sections[name] for name in CANDIDATE_SECTIONS if sections[name])
+    return texts
+
+
+def padded_tokens(lengths, batches):
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
+
+
+def run(label, encode, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(texts)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<12} {best * 1000:9.1f} ms  {len(texts) / best:9.1f} texts/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = section_texts(synthetic_candidate(rng, i) for i in range(args.candidates))
+    model = SentenceTransformer(args.model)
+    lengths = token_lengths(model, texts)
+
+    naive = [
+        list(range(start, min(start + args.batch_size, len(texts))))
+        for start in range(0, len(texts), args.batch_size)
+    ]
+    bucketed = length_batches(lengths, args.batch_size, args.token_budget)
+    print(
+        f"{len(texts)} section texts, {min(lengths)}-{max(lengths)} tokens, "
+        f"mean {sum(lengths) / len(lengths):.1f}"
+    )
+    print(f"padded tokens: naive {padded_tokens(lengths, naive)}, "
+          f"bucketed {padded_tokens(lengths, bucketed)} ({len(bucketed)} batches), "
+          f"real {sum(lengths)}")
+
+    def encode_naive(texts):
+        for batch in naive:
+            model.encode([texts[i] for i in batch], batch_size=len(batch))
+
+    def encode_single(texts):
+        model.encode(texts, batch_size=args.batch_size)
+
+    def encode_bucketed(texts):
+        for batch in bucketed:
+            model.encode([texts[i] for i in batch], batch_size=len(batch))
+
+    # Warm up the model before timing
+    model.encode(texts[: args.batch_size], batch_size=args.batch_size)
+    naive_time = run("naive", encode_naive, texts, args.repeat)
+    run("single call", encode_single, texts, args.repeat)
+    bucketed_time = run("bucketed", encode_bucketed, texts, args.repeat)
+    print(f"bucketed speedup over naive: {naive_time / bucketed_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Score jobs against candidates offline, without going through HTTP.
+
+Reads jobs and candidates as JSON lines (a file, or `-` for stdin), scores
+every job against every candidate with the batched engine across worker
+processes, and writes one result row per pair (or the best `--top-k` per
+job) as JSONL or Parquet. Each worker loads the model once and keeps the
+candidates' section embeddings cached, so they are encoded once per worker.
+
+Progress goes to stderr. Completed jobs are recorded in a checkpoint file,
+so running the same command again after an interruption resumes where it
+stopped. With `--publish-snapshot` the candidates and jobs are also encoded
+into a store snapshot that the API memory-maps on startup.
+
+Usage: python bulk_score.py --jobs jobs.jsonl --candidates candidates.jsonl
+       --output results.jsonl [--processes 4] [--top-k 100] [--engine auto]
+       [--publish-snapshot /tmp/store/snapshots]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from pydantic import ValidationError
+
+from app.models import Candidate, Job
+from app.ranking import TopK
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Progress is reported at most this often, in seconds
+PROGRESS_INTERVAL = 2.0
+
+# Profiles encoded per task when publishing a snapshot
+EMBED_CHUNK = 512
+
+# Per-process state, set up once by _init_worker
+_worker = {}
+
+
+def read_records(path, model, kind):
+    """Validated records from a JSON lines file or stdin; invalid lines are skipped."""
+    records = []
+    skipped = 0
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(model.model_validate_json(line).model_dump(exclude_none=True))
+            except ValidationError as e:
+                skipped += 1
+                logging.warning(f"Skipping invalid {kind} on line {line_number}: {e.errors()[:1]}")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if skipped:
+        logging.warning(f"Skipped {skipped} invalid {kind} records")
+    return records
+
+
+def _init_worker(options, candidates):
+    # Imported here so the parent process does not load the model
+    from app.matcher import JobCandidateMatchingSystem
+
+    _worker["options"] = options
+    _worker["candidates"] = candidates
+    _worker["matcher"] = JobCandidateMatchingSystem(
+        model_name=options["model"],
+        # Room for every candidate section, so each is encoded once per worker
+        cache_size=max(20000, 4 * len(candidates)),
+        lite_path=options["lite_path"],
+        score_cache_size=0,
+    )
+
+
+def _score_job(task):
+    """Score one job against all candidates; returns (index, rows)."""
+    index, job = task
+    options = _worker["options"]
+    matcher = _worker["matcher"]
+    ranking = TopK(options["top_k"])
+    position = 0
+    for batch in matcher.iter_batch_scores(
+        job,
+        _worker["candidates"],
+        options["batch_size"],
+        options["include_skills"],
+        options["engine"],
+    ):
+        for candidate, match_result in batch:
+            ranking.push(match_result["overall_match_score"], (position, candidate, match_result))
+            position += 1
+
+    rows = []
+    for rank, (score, (_, candidate, match_result)) in enumerate(ranking.ranked(), 1):
+        row = {
+            "job_id": job.get("id"),
+            "candidate_id": candidate.get("id"),
+            "rank": rank,
+            "match_score": score,
+            "category_scores": match_result["category_scores"],
+            "engine": match_result["engine"],
+        }
+        if options["include_skills"]:
+            row["matching_skills"] = match_result["matching_skills"]
+        rows.append(row)
+    return index, rows
+
+
+def _embed_profiles(task):
+    """Encode a chunk of profiles for the store snapshot."""
+    kind, profiles = task
+    matcher = _worker["matcher"]
+    store = matcher.job_store if kind == "jobs" else matcher.candidate_store
+    # Encode into this worker's store, then hand the rows to the parent
+    if kind == "jobs":
+        matcher.store_jobs(profiles)
+    else:
+        matcher.store_candidates(profiles)
+    entries = [store.entry(store.row(str(profile["id"]))) for profile in profiles]
+    for profile in profiles:
+        store.remove(str(profile["id"]))
+    return kind, entries
+
+
+class Checkpoint:
+    """Completed job indices and the output size they account for.
+
+    Rewritten atomically after every job, so a crash loses at most the
+    job being written; output past the recorded size is truncated on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = set()
+        self.output_bytes = 0
+        self.parts = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.completed = set(data["completed"])
+            self.output_bytes = data["output_bytes"]
+            self.parts = data["parts"]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "completed": sorted(self.completed),
+                    "output_bytes": self.output_bytes,
+                    "parts": self.parts,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
+
+
+class JsonlWriter:
+    def __init__(self, path, checkpoint):
+        self.checkpoint = checkpoint
+        self._f = open(path, "ab")
+        # Drop rows of a job that was not checkpointed before an interruption
+        self._f.truncate(checkpoint.output_bytes)
+        self._f.seek(checkpoint.output_bytes)
+
+    def write(self, rows):
+        self._f.write(b"".join(json.dumps(row).encode("utf-8") + b"\n" for row in rows))
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self.checkpoint.output_bytes = self._f.tell()
+
+    def close(self):
+        self._f.close()
+
+
+class ParquetWriter:
+    """Writes one Parquet part file per job into the output directory."""
+
+    def __init__(self, path, checkpoint):
+        if pa is None:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self.checkpoint = checkpoint
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, rows):
+        if not rows:
+            return
+        part = os.path.join(self.path, f"part-{self.checkpoint.parts:06d}.parquet")
+        pq.write_table(pa.Table.from_pylist(rows), part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self.checkpoint.parts += 1
+
+    def close(self):
+        pass
+
+
+class Progress:
+    def __init__(self, total, done, candidates):
+        self.total = total
+        self.done = done
+        self.candidates = candidates
+        self.scored = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._reported = 0.0
+
+    def update(self, rows):
+        self.done += 1
+        self.scored += self.candidates
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._reported >= PROGRESS_INTERVAL or self.done == self.total:
+            self._reported = now
+            elapsed = now - self.started
+            sys.stderr.write(
+                f"\r{self.done}/{self.total} jobs, {self.rows} rows, "
+                f"{self.scored / elapsed if elapsed else 0:.0f} pairs/s"
+            )
+            sys.stderr.flush()
+
+    def finish(self):
+        sys.stderr.write("\n")
+
+
+def publish(pool, jobs, candidates, root, model):
+    """Encode every job and candidate and publish them as a store snapshot."""
+    from app.features import CANDIDATE_SECTIONS, JOB_SECTIONS
+    from app.snapshots import publish_snapshot
+    from app.stores import SectionStore
+
+    stores = {}
+    # Stored profiles are addressed by id
+    jobs = [job for job in jobs if job.get("id") is not None]
+    candidates = [candidate for candidate in candidates if candidate.get("id") is not None]
+    tasks = [
+        (kind, profiles[start:start + EMBED_CHUNK])
+        for kind, profiles in (("candidates", candidates), ("jobs", jobs))
+        for start in range(0, len(profiles), EMBED_CHUNK)
+    ]
+    for kind, entries in pool.imap_unordered(_embed_profiles, tasks):
+        if not entries:
+            continue
+        store = stores.get(kind)
+        if store is None:
+            sections = CANDIDATE_SECTIONS if kind == "candidates" else JOB_SECTIONS
+            dim = next(len(v) for *_, vectors in entries for v in vectors.values() if v is not None)
+            store = stores[kind] = SectionStore(sections, dim)
+        store.put_many(
+            [profile_id for profile_id, *_ in entries],
+            [features for _, features, _, _ in entries],
+            [vectors for *_, vectors in entries],
+            [meta for _, _, meta, _ in entries],
+        )
+    for kind, sections in (("candidates", CANDIDATE_SECTIONS), ("jobs", JOB_SECTIONS)):
+        # An empty store still needs its dimension; take it from the other one
+        if kind not in stores:
+            dim = next(iter(stores.values())).dim if stores else None
+            stores[kind] = SectionStore(sections, dim)
+    return publish_snapshot(root, stores, {"model_name": model})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", required=True, help="jobs JSONL file, or - for stdin")
+    parser.add_argument("--candidates", required=True, help="candidates JSONL file, or - for stdin")
+    parser.add_argument("--output", required=True, help="results .jsonl file or .parquet directory")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=None, help="keep the best k candidates per job")
+    parser.add_argument("--engine", default="auto", choices=("auto", "model", "lite"))
+    parser.add_argument("--include-skills", action="store_true")
+    parser.add_argument("--model", default=os.environ.get("MODEL_NAME", "all-MiniLM-L6-v2"))
+    parser.add_argument("--lite-path", default=os.environ.get("LITE_INDEX_PATH", "/tmp/lite/lite_index.npz"))
+    parser.add_argument("--checkpoint", default=None, help="defaults to <output>.checkpoint")
+    parser.add_argument(
+        "--publish-snapshot",
+        default=None,
+        metavar="ROOT",
+        help="also publish the encoded profiles as a store snapshot under ROOT",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.jobs == "-" and args.candidates == "-":
+        parser.error("only one of --jobs and --candidates can be read from stdin")
+    if args.top_k is not None and args.top_k < 1:
+        parser.error("--top-k must be positive")
+
+    candidates = read_records(args.candidates, Candidate, "candidate")
+    jobs = read_records(args.jobs, Job, "job")
+    checkpoint = Checkpoint(args.checkpoint or args.output.rstrip("/") + ".checkpoint")
+    pending = [(i, job) for i, job in enumerate(jobs) if i not in checkpoint.completed]
+    if checkpoint.completed:
+        logging.info(f"Resuming: {len(checkpoint.completed)} of {len(jobs)} jobs already scored")
+
+    writer_type = ParquetWriter if args.output.endswith(".parquet") else JsonlWriter
+    writer = writer_type(args.output, checkpoint)
+    options = {
+        "model": args.model,
+        "lite_path": args.lite_path,
+        "batch_size": args.batch_size,
+        "top_k": args.top_k,
+        "include_skills": args.include_skills,
+        "engine": args.engine,
+    }
+    # Forked workers share the parsed candidates instead of unpickling copies
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    progress = Progress(len(jobs), len(checkpoint.completed), len(candidates))
+    with context.Pool(max(1, args.processes), _init_worker, (options, candidates)) as pool:
+        try:
+            for index, rows in pool.imap_unordered(_score_job, pending):
+                writer.write(rows)
+                checkpoint.completed.add(index)
+                checkpoint.save()
+                progress.update(len(rows))
+        finally:
+            writer.close()
+            progress.finish()
+
+        if args.publish_snapshot:
+            version = publish(pool, jobs, candidates, args.publish_snapshot, args.model)
+            logging.info(f"Published store snapshot {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from stub_encoder import install
+
+# app.main builds its matcher and stores on import; keep them away from the
+# default /tmp paths and load the stub encoder instead of a model
+_state = tempfile.mkdtemp(prefix="job-matching-tests-")
+os.environ.update(
+    {
+        "LITE_INDEX_PATH": os.path.join(_state, "lite", "lite_index.npz"),
+        "SCORE_CACHE_PATH": "",
+        "STORE_PATH": os.path.join(_state, "store"),
+        "SNAPSHOT_PATH": os.path.join(_state, "snapshots"),
+        "RESULT_CACHE_TTL_MS": "0",
+    }
+)
+install()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Test client of the app, started once for the whole session."""
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_state, ignore_errors=True)
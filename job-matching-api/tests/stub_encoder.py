@@ -0,0 +1,61 @@
+import hashlib
+import re
+
+import numpy as np
+
+# Width of the stub embeddings
+DIMENSION = 32
+
+
+class StubSentenceTransformer:
+    """Deterministic stand-in for a SentenceTransformer model.
+
+    A text is embedded as its hashed bag of words, so texts sharing words
+    are similar and the same text always gets the same vector. Counts the
+    texts it encodes in `encoded`.
+    """
+
+    def __init__(self, model_name, *args, **kwargs):
+        self.model_name = model_name
+        self.max_seq_length = 256
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        vectors = np.full((len(texts), DIMENSION), 0.01, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                digest = hashlib.sha1(word.encode("utf-8")).digest()
+                vectors[row, int.from_bytes(digest[:4], "big") % DIMENSION] += 1.0
+        self.encoded += len(texts)
+        return vectors[0] if single else vectors
+
+
+def install():
+    """Make the matcher load the stub instead of downloading a model."""
+    from app import matcher
+
+    matcher.SentenceTransformer = StubSentenceTransformer
+
+
+def init_worker(options):
+    """Scoring pool initializer that loads the stub in each worker process."""
+    from app import sharding
+
+    install()
+    sharding._init_worker(options)
+
+
+if __name__ == "__main__":
+    # Serve the real app with the stub: python tests/stub_encoder.py PORT
+    import sys
+
+    import uvicorn
+
+    install()
+    uvicorn.run("app.main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
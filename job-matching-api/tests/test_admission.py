@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_disabled_controller_admits_everything():
+    admission = AdmissionController(0)
+    assert run(admission.acquire(10_000)) == 0
+    admission.release(0)
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_small_requests_use_the_reserve():
+    admission = AdmissionController(100, reserve=10, small_cost=1)
+
+    async def scenario():
+        large = await admission.acquire(1000)
+        # Large requests are capped at their share, so only the reserve is left
+        assert large == 90
+        small = await admission.acquire(1)
+        assert admission.stats()["in_flight"] == 91
+        admission.release(small)
+        admission.release(large)
+
+    run(scenario())
+    assert admission.stats()["in_flight"] == 0
+    assert admission.stats()["peak_in_flight"] == 91
+
+
+def test_small_request_passes_queued_large_ones():
+    admission = AdmissionController(100, reserve=10, small_cost=1, queue_timeout=5)
+
+    async def scenario():
+        held = await admission.acquire(90)
+        queued = asyncio.ensure_future(admission.acquire(50))
+        await asyncio.sleep(0)
+        assert admission.stats()["queue_depth"] == 1
+        small = await admission.acquire(1)
+        admission.release(small)
+        admission.release(held)
+        assert await queued == 50
+        admission.release(50)
+
+    run(scenario())
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_queue_timeout_rejects_with_503():
+    admission = AdmissionController(10, queue_timeout=0.05, retry_after=3)
+
+    async def scenario():
+        held = await admission.acquire(10)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(5)
+        admission.release(held)
+        return rejected.value
+
+    rejected = run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.retry_after == 3
+    assert admission.stats()["rejected_timeout"] == 1
+    assert admission.stats()["queue_depth"] == 0
+
+
+def test_full_queue_rejects_with_429():
+    admission = AdmissionController(10, max_queue=1, queue_timeout=5)
+
+    async def scenario():
+        held = await admission.acquire(10)
+        queued = asyncio.ensure_future(admission.acquire(5))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(5)
+        admission.release(held)
+        admission.release(await queued)
+        return rejected.value
+
+    assert run(scenario()).status_code == 429
+    assert admission.stats()["rejected_busy"] == 1
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    admission = AdmissionController(10, queue_timeout=5)
+
+    async def scenario():
+        held = await admission.acquire(10)
+        queued = asyncio.ensure_future(admission.acquire(5))
+        await asyncio.sleep(0)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert admission.stats()["queue_depth"] == 0
+        admission.release(held)
+
+    run(scenario())
+    assert admission.stats()["in_flight"] == 0
+
+
+def test_large_requests_are_admitted_in_order():
+    admission = AdmissionController(10, queue_timeout=5)
+    order = []
+
+    async def request(name, cost):
+        charge = await admission.acquire(cost)
+        order.append(name)
+        return charge
+
+    async def scenario():
+        held = await admission.acquire(10)
+        first = asyncio.ensure_future(request("first", 8))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(request("second", 2))
+        await asyncio.sleep(0)
+        admission.release(held)
+        for charge in await asyncio.gather(first, second):
+            admission.release(charge)
+
+    run(scenario())
+    assert order == ["first", "second"]
@@ -0,0 +1,43 @@
+import json
+
+JOB = {
+    "title": "Backend Engineer",
+    "description": {"required_skills": ["Python"], "position_summary": "Build APIs"},
+}
+CANDIDATE = {
+    "id": "c1",
+    "technicalSkills": ["Python"],
+    "referral": {"source": "job fair"},
+    "tags": ["priority"],
+}
+
+
+def test_batch_match_echoes_unknown_candidate_fields(client):
+    response = client.post("/batch-match/", json={"job": JOB, "candidates": [CANDIDATE]})
+    assert response.status_code == 200
+    echoed = response.json()["matches"][0]["candidate"]
+    assert echoed["referral"] == {"source": "job fair"}
+    assert echoed["tags"] == ["priority"]
+
+    streamed = client.post("/batch-match/stream/", json={"job": JOB, "candidates": [CANDIDATE]})
+    assert json.loads(streamed.text.splitlines()[0])["candidate"]["referral"] == {"source": "job fair"}
+
+
+def test_top_k_must_be_positive_everywhere(client):
+    applicant = {"candidateId": "a1", "applicantName": "Ada", "technicalSkills": ["Python"]}
+    for top_k in (0, -1):
+        batch = client.post(
+            f"/batch-match/?top_k={top_k}", json={"job": JOB, "candidates": [CANDIDATE]}
+        )
+        applied = client.post(
+            f"/applied-candidates-match/?top_k={top_k}",
+            json={"job": JOB, "applied_candidates": [applicant]},
+        )
+        assert (batch.status_code, applied.status_code) == (400, 400)
+        assert batch.json() == applied.json() == {"detail": "top_k must be positive"}
+
+    applied = client.post(
+        "/applied-candidates-match/?top_k=1", json={"job": JOB, "applied_candidates": [applicant]}
+    )
+    assert applied.status_code == 200
+    assert applied.json()["total_matches"] == 1
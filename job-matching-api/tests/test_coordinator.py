@@ -0,0 +1,190 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+
+from app.coordinator import Coordinator, ShardError, shard_for
+from app.streaming import InvalidRecord
+
+SCORES = {f"c{i}": float(10 * i + 5) for i in range(10)}
+JOBS = {"j1": 0.0, "j2": -1.0}
+
+
+def _shard_app(shard, shards):
+    """A stand-in shard server holding the candidates `shard_for` assigns it."""
+    app = FastAPI()
+    app.state.delay = 0.0
+    app.state.writes = []
+    owned = {c: s for c, s in SCORES.items() if shard_for(c, shards) == shard}
+
+    @app.get("/jobs/{job_id}/top-candidates/")
+    async def top_candidates(job_id: str, top_k: int = 10):
+        await asyncio.sleep(app.state.delay)
+        ranked = sorted(owned.items(), key=lambda item: -item[1])[:top_k]
+        return {
+            "matches": [
+                {"candidate_id": c, "match_score": s, "rank": rank}
+                for rank, (c, s) in enumerate(ranked, 1)
+            ],
+            "total_candidates": len(owned),
+        }
+
+    @app.post("/match-matrix/")
+    async def match_matrix(request: Request):
+        await asyncio.sleep(app.state.delay)
+        body = await request.json()
+        return {
+            "scores": [
+                [SCORES[c] + JOBS[j] if c in owned and j in JOBS else None for c in body["candidate_ids"]]
+                for j in body["job_ids"]
+            ],
+            "missing_jobs": [j for j in body["job_ids"] if j not in JOBS],
+            "missing_candidates": [c for c in body["candidate_ids"] if c not in owned],
+        }
+
+    @app.post("/ingest/{kind}/")
+    async def ingest(kind: str, request: Request):
+        records = [json.loads(line) for line in (await request.body()).splitlines()]
+        app.state.writes.extend((kind, record["id"], record) for record in records)
+        return {"stored": len(records), "rejected": 0, "errors": []}
+
+    @app.put("/{kind}/{profile_id}")
+    async def store(kind: str, profile_id: str, request: Request):
+        app.state.writes.append((kind, profile_id, await request.json()))
+        return {"id": profile_id, "shard": shard}
+
+    return app
+
+
+def _serve(app):
+    """Run an app on an ephemeral local port; returns (server, thread, url)."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@pytest.fixture(scope="module")
+def shards():
+    apps = [_shard_app(shard, 2) for shard in range(2)]
+    running = [_serve(app) for app in apps]
+    yield apps, [url for _, _, url in running]
+    for server, thread, _ in running:
+        server.should_exit = True
+        thread.join()
+
+
+def _run(urls, query, timeout=2.0):
+    async def main():
+        coordinator = Coordinator(urls, timeout=timeout)
+        try:
+            return await query(coordinator)
+        finally:
+            await coordinator.close()
+
+    return asyncio.run(main())
+
+
+def test_candidates_are_spread_over_both_shards():
+    assert {shard_for(c, 2) for c in SCORES} == {0, 1}
+
+
+def test_top_k_merge(shards):
+    _, urls = shards
+    merged = _run(urls, lambda c: c.top_candidates("GET", "/jobs/j1/top-candidates/", 3, params={"top_k": 3}))
+    assert [m["candidate_id"] for m in merged["matches"]] == ["c9", "c8", "c7"]
+    assert [m["rank"] for m in merged["matches"]] == [1, 2, 3]
+    assert merged["total_candidates"] == len(SCORES)
+    assert merged["shards"] == {"answered": 2, "failed": [], "partial": False}
+
+
+def test_match_matrix_is_stitched_in_request_order(shards):
+    _, urls = shards
+    candidates = ["c3", "c0", "c9", "c4", "missing"]
+    result = _run(urls, lambda c: c.match_matrix(["j1", "j2", "j3"], candidates))
+    assert result["candidate_ids"] == candidates
+    assert result["scores"] == [
+        [SCORES[c] + JOBS[j] if c in SCORES else None for c in candidates] for j in ("j1", "j2")
+    ] + [[None] * len(candidates)]
+    assert result["missing_jobs"] == ["j3"]
+    assert result["missing_candidates"] == ["missing"]
+    assert result["shards"]["partial"] is False
+
+
+def test_timed_out_shard_gives_partial_results(shards):
+    apps, urls = shards
+    apps[1].state.delay = 1.0
+    try:
+        merged = _run(
+            urls,
+            lambda c: c.top_candidates("GET", "/jobs/j1/top-candidates/", 10, params={"top_k": 10}),
+            timeout=0.2,
+        )
+        matrix = _run(urls, lambda c: c.match_matrix(["j1"], list(SCORES)), timeout=0.2)
+    finally:
+        apps[1].state.delay = 0.0
+
+    shard0 = [c for c in SCORES if shard_for(c, 2) == 0]
+    shard1 = [c for c in SCORES if shard_for(c, 2) == 1]
+    assert sorted(m["candidate_id"] for m in merged["matches"]) == sorted(shard0)
+    assert merged["shards"] == {"answered": 1, "failed": [urls[1]], "partial": True}
+    assert matrix["unavailable_candidates"] == shard1
+    assert all(matrix["scores"][0][list(SCORES).index(c)] is None for c in shard1)
+    assert matrix["shards"]["partial"] is True
+
+
+def test_all_shards_timing_out_is_an_error(shards):
+    apps, urls = shards
+    for app in apps:
+        app.state.delay = 1.0
+    try:
+        with pytest.raises(ShardError) as e:
+            _run(urls, lambda c: c.top_candidates("GET", "/jobs/j1/top-candidates/", 3), timeout=0.2)
+    finally:
+        for app in apps:
+            app.state.delay = 0.0
+    assert e.value.status_code == 503
+    assert sorted(e.value.failed) == sorted(urls)
+
+
+def test_write_fan_out(shards):
+    apps, urls = shards
+    for app in apps:
+        app.state.writes.clear()
+
+    # Candidate writes go to the owning shard only
+    response = _run(urls, lambda c: c.write("PUT", "/candidates/c3", "c3", json={"id": "c3"}))
+    owner = shard_for("c3", 2)
+    assert response.json() == {"id": "c3", "shard": owner}
+    assert apps[owner].state.writes == [("candidates", "c3", {"id": "c3"})]
+    assert apps[1 - owner].state.writes == []
+
+    # Job writes are broadcast to every shard
+    _run(urls, lambda c: c.write("PUT", "/jobs/j1", json={"id": "j1"}))
+    for app in apps:
+        assert app.state.writes[-1] == ("jobs", "j1", {"id": "j1"})
+
+
+def test_ingest_skips_lines_that_were_not_decoded(shards):
+    apps, urls = shards
+    for app in apps:
+        app.state.writes.clear()
+
+    records = [{"id": "c1"}, InvalidRecord("Invalid JSON: x"), {"id": "c2"}, {"name": "no id"}]
+    stored, rejected, errors = _run(urls, lambda c: c.ingest("candidates", records, offset=10))
+    assert (stored, rejected) == (2, 2)
+    assert errors == [(11, "Invalid JSON: x"), (13, "Stored profiles need an id")]
+
+    stored, rejected, errors = _run(urls, lambda c: c.ingest("jobs", records[:2]))
+    assert (stored, rejected, errors) == (1, 1, [(1, "Invalid JSON: x")])
+    for app in apps:
+        assert app.state.writes[-1] == ("jobs", "c1", {"id": "c1"})
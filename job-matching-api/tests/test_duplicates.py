@@ -0,0 +1,52 @@
+import numpy as np
+
+from app.duplicates import (
+    EXACT_LIMIT,
+    UnionFind,
+    find_duplicate_groups,
+    identity_keys,
+    lsh_buckets,
+)
+
+
+def _normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_union_find_groups():
+    union_find = UnionFind(6)
+    union_find.union(4, 1)
+    union_find.union(1, 3)
+    union_find.union(5, 2)
+    assert union_find.groups() == [[1, 3, 4], [2, 5]]
+    assert union_find.find(3) == union_find.find(4)
+
+
+def test_identity_keys_normalize_contacts():
+    applicant = {"applicantEmail": " Ali@Example.com ", "applicantPhone": "+92 (300) 123-4567"}
+    assert identity_keys(applicant) == ["email:ali@example.com", "phone:923001234567"]
+    assert identity_keys({}) == []
+
+
+def test_exact_groups_and_identity_matches():
+    vectors = _normalized(
+        np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.99, 0.05, 0.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    )
+    keys = [[], ["email:a@b.c"], [], ["email:a@b.c"]]
+    groups, similarities = find_duplicate_groups(vectors, 0.9, keys)
+    assert groups == [[0, 2], [1, 3]]
+    assert similarities[(1, 3)] == 1.0
+    assert similarities[(0, 2)] > 0.9
+
+
+def test_lsh_finds_near_duplicates_in_large_lists():
+    rng = np.random.default_rng(1)
+    n = EXACT_LIMIT + 200
+    vectors = rng.standard_normal((n, 64)).astype(np.float32)
+    vectors[n - 1] = vectors[3] + 0.01 * rng.standard_normal(64)
+    vectors[n - 2] = vectors[10] + 0.01 * rng.standard_normal(64)
+    vectors = _normalized(vectors)
+
+    groups, _ = find_duplicate_groups(vectors, 0.95)
+    assert groups == [[3, n - 1], [10, n - 2]]
+    assert all(len(bucket) > 1 for bucket in lsh_buckets(vectors))
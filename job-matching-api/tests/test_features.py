@@ -0,0 +1,66 @@
+from app.features import (
+    candidate_facets,
+    extract_candidate_features,
+    extract_job_features,
+    facet_filter,
+    job_facets,
+    passes_filter,
+    skill_keys,
+    years_bucket,
+)
+
+
+def _candidate(**data):
+    return candidate_facets(data, extract_candidate_features(data))
+
+
+def test_degree_facet_matches_whole_words():
+    assert _candidate(educations=[{"degree": "BS Information Systems"}])["degree"] == ("bachelor",)
+    assert _candidate(educations=[{"degree": "MS Computer Science"}])["degree"] == ("bachelor", "master")
+    assert _candidate(educations=[{"degree": "Master's"}])["degree"] == ("bachelor", "master")
+    assert _candidate(educations=[{"degree": "Diploma in Systems"}])["degree"] == ()
+
+
+def test_candidate_facets():
+    facets = _candidate(
+        location="Lahore, Pakistan",
+        workExperiences=[{"title": "Dev", "jobType": "Full-time", "durationInMonths": 50}],
+    )
+    assert facets["location"] == ("lahore, pakistan", "lahore", "pakistan")
+    assert facets["job_type"] == ("full-time",)
+    assert facets["years"] == (3,)
+    assert "contract_type" not in facets
+
+
+def test_job_facets():
+    job_data = {
+        "title": "Engineer",
+        "location": "Karachi",
+        "job_type": "Full-time",
+        "contract_type": "Permanent",
+        "description": {"required_skills": ["Master's degree"]},
+        "required_skills": ["5 years experience"],
+    }
+    facets = job_facets(job_data, extract_job_features(job_data))
+    assert facets["contract_type"] == ("permanent",)
+    assert facets["degree"] == ("master",)
+    assert facets["years"] == (5,)
+
+
+def test_facet_filter_normalizes_and_buckets_years():
+    assert facet_filter() is None
+    facets, skills = facet_filter(location=[" Lahore "], min_years=4, skills=["Python", ""])
+    assert facets == {"location": ("lahore",), "years": (3, 5, 10)}
+    assert skills == ("python",)
+    assert years_bucket(0.5) == 0
+    assert years_bucket(12) == 10
+
+
+def test_passes_filter():
+    data = {"location": "Lahore", "technicalSkills": ["Python", "SQL"]}
+    features = extract_candidate_features(data)
+    facets = candidate_facets(data, features)
+    skills = skill_keys(features)
+    assert passes_filter(facets, skills, facet_filter(location=["lahore", "berlin"], skills=["sql"]))
+    assert not passes_filter(facets, skills, facet_filter(skills=["python", "go"]))
+    assert not passes_filter(facets, skills, facet_filter(location=["karachi"]))
@@ -0,0 +1,53 @@
+import io
+import json
+
+import pyarrow as pa
+import pytest
+
+from app import main
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(main, "INGEST_BATCH_ROWS", 2)
+
+
+def _candidate(i):
+    return {"id": f"ingest-{i}", "name": f"Candidate {i}", "technicalSkills": ["Python"]}
+
+
+def test_bad_ndjson_lines_are_reported_and_skipped(client):
+    lines = [json.dumps(_candidate(i)) for i in range(5)]
+    lines.insert(1, '{"id": "broken",')
+    lines.insert(4, "not json")
+    response = client.post(
+        "/ingest/candidates/",
+        content="\n".join(lines),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["received"], body["stored"], body["rejected"]) == (7, 5, 2)
+    assert [error["row"] for error in body["errors"]] == [1, 4]
+    assert all(error["error"].startswith("Invalid JSON") for error in body["errors"])
+    assert all(f"ingest-{i}" in main.matcher.candidate_store for i in range(5))
+
+
+def test_unreadable_body_reports_progress(client):
+    sink = io.BytesIO()
+    table = pa.Table.from_pylist([_candidate(i) for i in range(10, 16)])
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=2):
+            writer.write_batch(batch)
+    data = sink.getvalue()
+    # Cut the stream inside its last record batch
+    response = client.post(
+        "/ingest/candidates/",
+        content=data[: len(data) - 40],
+        headers={"Content-Type": main.ARROW_STREAM_TYPE},
+    )
+    assert response.status_code == 400
+    detail = response.json()["detail"]
+    assert detail["error"].startswith("Invalid upload body")
+    assert detail["received"] == detail["stored"] == 4
+    assert all(f"ingest-{i}" in main.matcher.candidate_store for i in range(10, 14))
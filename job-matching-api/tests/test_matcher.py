@@ -0,0 +1,196 @@
+import pytest
+
+from app.matcher import JobCandidateMatchingSystem
+
+JOB = {
+    "id": "job-1",
+    "title": "Backend Engineer",
+    "job_type": "Full-time",
+    "description": {
+        "position_summary": "Build and run REST APIs",
+        "required_skills": ["Python", "FastAPI", "3+ years experience", "Bachelor degree in Computer Science"],
+        "preferred_skills": ["Docker", "Kubernetes"],
+        "responsibilities": ["Design REST services", "Write tests"],
+        "technical_skills": {"Languages": ["Python", "Go"], "Databases": ["PostgreSQL"]},
+    },
+    "required_skills": ["3 years experience in backend"],
+}
+CANDIDATES = [
+    {
+        "id": "c1",
+        "name": "Ada",
+        "summary": "Backend engineer working with Python",
+        "technicalSkills": ["Python", "FastAPI", "PostgreSQL"],
+        "educations": [{"degree": "BS", "field": "Computer Science", "school": "LUMS"}],
+        "workExperiences": [
+            {
+                "title": "Developer",
+                "company": "X",
+                "description": "Built REST services with FastAPI",
+                "jobType": "Full-time",
+                "durationInMonths": 48,
+            }
+        ],
+        "projects": [{"title": "Deployer", "description": "Kubernetes deploys"}],
+    },
+    {
+        "id": "c2",
+        "name": "Grace",
+        "technicalSkills": ["Go", "Docker"],
+        "educations": [{"degree": "MSc", "field": "Mathematics"}],
+        "workExperiences": [{"title": "SRE", "description": "Ran Kubernetes clusters"}],
+    },
+    {"id": "c3", "name": "Linus", "technicalSkills": ["C"], "summary": "Kernel hacker"},
+]
+
+
+def _matcher(score_cache_size=50000):
+    return JobCandidateMatchingSystem(
+        model_name="stub", lite_path=None, score_cache_size=score_cache_size, store_path=None
+    )
+
+
+@pytest.fixture
+def spy(monkeypatch):
+    """Record the categories scored and the texts encoded by a matcher."""
+
+    def attach(matcher):
+        calls = {"categories": [], "texts": []}
+        category_scores = matcher._category_scores
+        encode_with = matcher._encode_with
+
+        def scored(job, job_embeddings, candidate, candidate_embeddings, categories):
+            calls["categories"].append(tuple(categories))
+            return category_scores(job, job_embeddings, candidate, candidate_embeddings, categories)
+
+        def encoded(engine, texts, *args, **kwargs):
+            calls["texts"].extend(texts)
+            return encode_with(engine, texts, *args, **kwargs)
+
+        monkeypatch.setattr(matcher, "_category_scores", scored)
+        monkeypatch.setattr(matcher, "_encode_with", encoded)
+        return calls
+
+    return attach
+
+
+def _score(matcher, candidates, weights=None):
+    prepared_job = matcher.prepare_job(JOB, weights=weights)
+    return matcher.score_batch(prepared_job, candidates, include_skills=True)
+
+
+def _results(scored):
+    return [
+        (
+            candidate["id"],
+            match_result["overall_match_score"],
+            match_result["category_scores"],
+            sorted(match_result["matching_skills"]),
+        )
+        for candidate, match_result in scored
+    ]
+
+
+def test_cached_scores_equal_uncached_scores(spy):
+    uncached = _results(_score(_matcher(score_cache_size=0), CANDIDATES))
+
+    matcher = _matcher()
+    assert _results(_score(matcher, CANDIDATES)) == uncached
+
+    prepared_job = matcher.prepare_job(JOB)
+    calls = spy(matcher)
+    assert _results(matcher.score_batch(prepared_job, CANDIDATES, include_skills=True)) == uncached
+    # Every pair was a hit: nothing was encoded or scored again
+    assert calls == {"categories": [], "texts": []}
+    assert matcher.score_cache.stats()["hits"] == len(CANDIDATES)
+
+    # Raw scores do not depend on the weights, so hits are re-weighted
+    weights = {"tech_stack": 1.0, "qualification": 0.0}
+    assert _results(_score(matcher, CANDIDATES, weights)) == _results(
+        _score(_matcher(score_cache_size=0), CANDIDATES, weights)
+    )
+
+
+def test_changed_section_rescores_only_its_category(spy):
+    matcher = _matcher()
+    before = _score(matcher, CANDIDATES[:1])[0][1]
+
+    changed = dict(CANDIDATES[0], educations=[{"degree": "MS", "field": "Physics", "school": "MIT"}])
+    prepared_job = matcher.prepare_job(JOB)
+    calls = spy(matcher)
+    after = matcher.score_batch(prepared_job, [changed], include_skills=True)[0][1]
+
+    assert matcher.score_cache.stats()["stale"] == 1
+    assert calls["categories"] == [("qualification",)]
+    # Only the changed education section was encoded
+    assert len(calls["texts"]) == 1 and "Physics" in calls["texts"][0]
+
+    # The other categories kept their cached scores, and every score is what
+    # scoring the changed profile from scratch gives
+    for category, score in before["category_scores"].items():
+        if category != "qualification":
+            assert after["category_scores"][category] == score
+    assert _results([(changed, after)]) == _results(_score(_matcher(score_cache_size=0), [changed]))
+
+
+# Scores of the fixture from the scorer before per-category raw scores were
+# introduced, with the same stub encoder
+EXPECTED = {
+    "c1": (
+        90.5,
+        {"required_skills": 78.95, "preferred_skills": 9.97, "qualification": 80.0, "work_experience": 80.0, "tech_stack": 85.46},
+    ),
+    "c2": (
+        31.67,
+        {"required_skills": 5.31, "preferred_skills": 81.04, "qualification": 45.86, "work_experience": 18.57, "tech_stack": 46.66},
+    ),
+    "c3": (
+        49.71,
+        {"required_skills": 70.71, "preferred_skills": 70.64, "qualification": 0.0, "work_experience": 0.0, "tech_stack": 0.54},
+    ),
+}
+
+
+def test_scores_match_fixed_values():
+    matcher = _matcher(score_cache_size=0)
+    for candidate, match_result in _score(matcher, CANDIDATES):
+        overall, categories = EXPECTED[candidate["id"]]
+        assert match_result["overall_match_score"] == pytest.approx(overall, abs=0.01)
+        assert match_result["category_scores"] == pytest.approx(categories, abs=0.01)
+        # The overall score is recomputed from the raw scores it came from
+        assert matcher.overall_score(
+            match_result["raw_scores"], match_result["job_type_bonus"]
+        ) == match_result["overall_match_score"]
+
+    # /match/ goes through the same scorer
+    for candidate in CANDIDATES:
+        match_result = matcher.match(JOB, candidate)
+        assert match_result["overall_match_score"] == pytest.approx(EXPECTED[candidate["id"]][0], abs=0.01)
+
+
+def test_combine_scores():
+    matcher = _matcher(score_cache_size=0)
+    raw_scores = {
+        "required_skills": 0.5,
+        "preferred_skills": 0.0,
+        "qualification": 1.0,
+        "work_experience": 0.25,
+        "tech_stack": 0.0,
+    }
+    # Zero categories are left out: (0.3 * 0.5 + 0.2 * 1.0 + 0.25 * 0.25) / 0.75,
+    # plus the job type bonus, scaled by 1.1
+    assert matcher._combine_scores(raw_scores, 0.05) == {
+        "overall_match_score": 66.0,
+        "category_scores": {
+            "required_skills": 50.0,
+            "preferred_skills": 0.0,
+            "qualification": 100.0,
+            "work_experience": 25.0,
+            "tech_stack": 0.0,
+        },
+    }
+    assert matcher.overall_score(raw_scores, 0.05, dict(matcher.weights, qualification=0.0)) == pytest.approx(
+        (0.3 * 0.5 + 0.25 * 0.25) / 0.55 * 110 + 5.5, abs=0.01
+    )
+    assert matcher.overall_score({c: 1.0 for c in raw_scores}, 0.05) == 100.0
+    assert matcher.overall_score({c: 0.0 for c in raw_scores}, 0.0) == 0.0
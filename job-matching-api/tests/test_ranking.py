@@ -0,0 +1,54 @@
+from app.ranking import TopK, page_size, paginate, recall_at_k, select_survivors
+
+
+def test_top_k_keeps_best_in_order():
+    ranking = TopK(3)
+    for i, score in enumerate([5, 9, 1, 9, 7, 3]):
+        ranking.push(score, i)
+    assert ranking.ranked() == [(9, 1), (9, 3), (7, 4)]
+    assert ranking.seen == 6
+    assert ranking.accepted == 6
+
+
+def test_top_k_unbounded_and_min_score():
+    ranking = TopK(min_score=4)
+    for i, score in enumerate([5, 1, 4, 2]):
+        ranking.push(score, i)
+    assert ranking.ranked() == [(5, 0), (4, 2)]
+    assert ranking.accepted == 2
+
+
+def test_top_k_zero_keeps_nothing():
+    ranking = TopK(0)
+    ranking.push(1.0, "a")
+    ranking.push(2.0, "b")
+    assert ranking.ranked() == []
+    assert ranking.accepted == 2
+
+
+def test_page_size():
+    assert page_size() is None
+    assert page_size(top_k=10) == 10
+    assert page_size(offset=5, limit=10) == 15
+    assert page_size(top_k=10, offset=5, limit=10) == 10
+    assert page_size(top_k=10, limit=0) == 0
+
+
+def test_paginate_ranks_from_offset():
+    ranked = [(9, "a"), (8, "b"), (7, "c")]
+    assert paginate(ranked, 1, 1) == [(2, 8, "b")]
+    assert paginate(ranked) == [(1, 9, "a"), (2, 8, "b"), (3, 7, "c")]
+
+
+def test_select_survivors():
+    scores = [0.1, 0.9, 0.5, 0.7, 0.3]
+    assert select_survivors(scores, keep_fraction=0.4) == [1, 3]
+    assert select_survivors(scores, floor=0.5) == [1, 2, 3]
+    assert select_survivors(scores, floor=0.95, min_keep=1) == [1]
+
+
+def test_recall_at_k():
+    full = {0: 0.1, 1: 0.9, 2: 0.5, 3: 0.7}
+    assert recall_at_k(full, [1, 3], 2) == 1.0
+    assert recall_at_k(full, [1, 2], 2) == 0.5
+    assert recall_at_k(full, [], 0) == 1.0
@@ -0,0 +1,57 @@
+from test_matcher import CANDIDATES, JOB
+
+# Scored with job weights and request weights on top of the defaults
+WEIGHTED_JOB = dict(JOB, weights={"preferred_skills": 0.5})
+WEIGHTS = {"tech_stack": 1.0, "required_skills": 0.0}
+
+
+def _batch(client, weights, **params):
+    response = client.post(
+        "/batch-match/",
+        params=params,
+        json={"job": WEIGHTED_JOB, "candidates": CANDIDATES, "weights": weights},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _ranking(matches):
+    return [(m["candidate"]["id"], m["match_score"]) for m in matches]
+
+
+def _rerank(client, result_set_id, weights, **body):
+    return client.post("/rerank/", json={"result_set_id": result_set_id, "weights": weights, **body})
+
+
+def test_rerank_keeps_the_weights_the_set_was_scored_with(client):
+    scored = _batch(client, WEIGHTS, result_set="true")
+    expected = sorted(_ranking(scored["matches"]), key=lambda item: -item[1])
+
+    response = _rerank(client, scored["result_set_id"], {})
+    assert response.status_code == 200
+    assert [(m["candidate"]["id"], m["match_score"]) for m in response.json()["matches"]] == expected
+    assert response.json()["weights"]["preferred_skills"] == 0.5
+    assert response.json()["weights"]["tech_stack"] == 1.0
+
+
+def test_partial_override_applies_on_top(client):
+    scored = _batch(client, WEIGHTS, result_set="true")
+    reranked = _rerank(client, scored["result_set_id"], {"qualification": 0.9}).json()
+
+    # The same as scoring from scratch with the override merged in
+    fresh = _batch(client, dict(WEIGHTS, qualification=0.9), top_k=len(CANDIDATES))
+    assert [(m["candidate"]["id"], m["match_score"]) for m in reranked["matches"]] == _ranking(
+        fresh["matches"]
+    )
+    assert [m["rank"] for m in reranked["matches"]] == [1, 2, 3]
+
+
+def test_rerank_pages_and_validates(client):
+    scored = _batch(client, None, result_set="true")
+    page = _rerank(client, scored["result_set_id"], {}, offset=1, limit=1).json()
+    assert page["total_candidates"] == len(CANDIDATES)
+    assert [m["rank"] for m in page["matches"]] == [2]
+
+    assert _rerank(client, "missing", {}).status_code == 404
+    assert _rerank(client, scored["result_set_id"], {"unknown": 1.0}).status_code == 400
+    assert _rerank(client, scored["result_set_id"], {}, top_k=0).status_code == 400
@@ -0,0 +1,69 @@
+from app.score_cache import PairScoreCache
+
+RECORD = {"raw_scores": {"skills": 0.5}, "job_type_bonus": 0.0, "matching_skills": ["python"]}
+
+
+def test_hit_stale_and_miss():
+    cache = PairScoreCache("v1")
+    cache.put_many("j", {"skills": "a"}, "semantic", [("c1", {"skills": "x"}, RECORD)])
+
+    hit, stale, miss = cache.get_many(
+        "j", {"skills": "a"}, "semantic", [("c1", {"skills": "x"}), ("c1", {"skills": "y"}), ("c2", {})]
+    )
+    assert hit[0] == "hit" and hit[1][2] == RECORD
+    assert stale[0] == "stale"
+    assert miss is None
+    assert cache.get_many("j", {"skills": "a"}, "lite", [("c1", {"skills": "x"})]) == [None]
+
+    # Returned records are copies
+    hit[1][2]["matching_skills"].append("java")
+    assert cache.get_many("j", {"skills": "a"}, "semantic", [("c1", {"skills": "x"})])[0][1][2] == RECORD
+
+
+def test_other_scorer_version_is_a_miss():
+    cache = PairScoreCache("v1")
+    cache.put_many("j", {}, "semantic", [("c1", {}, RECORD)])
+    cache.scorer_version = "v2"
+    assert cache.get_many("j", {}, "semantic", [("c1", {})]) == [None]
+
+
+def test_invalidate_and_bound():
+    cache = PairScoreCache("v1", max_entries=3)
+    cache.put_many("j1", {}, "semantic", [("c1", {}, RECORD), ("c2", {}, RECORD)])
+    cache.put_many("j2", {}, "semantic", [("c1", {}, RECORD), ("c3", {}, RECORD)])
+    assert cache.stats()["entries"] == 3
+
+    assert cache.invalidate(candidate_id="c1") == 1
+    assert cache.invalidate(job_id="j2") == 1
+    assert cache.get_many("j1", {}, "semantic", [("c2", {})])[0][0] == "hit"
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    path = str(tmp_path / "scores" / "pairs.sqlite")
+    cache = PairScoreCache("v1", path=path)
+    cache.put_many("j", {"skills": "a"}, "semantic", [("c1", {"skills": "x"}, RECORD)])
+
+    reopened = PairScoreCache("v1", path=path)
+    assert reopened.get_many("j", {"skills": "a"}, "semantic", [("c1", {"skills": "x"})])[0] == (
+        "hit",
+        ({"skills": "a"}, {"skills": "x"}, RECORD),
+    )
+    assert reopened.invalidate(job_id="j") == 1
+    assert PairScoreCache("v1", path=path).get_many("j", {"skills": "a"}, "semantic", [("c1", {})]) == [None]
+
+
+def test_read_only_store_queues_writes(tmp_path):
+    path = str(tmp_path / "pairs.sqlite")
+    owner = PairScoreCache("v1", path=path)
+    owner.put_many("j", {}, "semantic", [("c1", {}, RECORD)])
+
+    # Uncached reads go to the file; writes are queued for the owner
+    reader = PairScoreCache("v1", max_entries=0, path=path, read_only=True)
+    assert reader.get_many("j", {}, "semantic", [("c1", {})])[0][0] == "hit"
+    reader.put_many("j", {}, "semantic", [("c2", {}, RECORD)])
+    assert reader.get_many("j", {}, "semantic", [("c2", {})]) == [None]
+
+    for args in reader.take_unsaved():
+        owner.put_many(*args)
+    assert reader.take_unsaved() == []
+    assert reader.get_many("j", {}, "semantic", [("c2", {})])[0][0] == "hit"
@@ -0,0 +1,138 @@
+import copy
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from app.coordinator import shard_for
+from test_matcher import CANDIDATES, JOB
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(TESTS)
+
+POOL = [
+    dict(copy.deepcopy(candidate), id=f"{candidate['id']}-{n}")
+    for n in range(3)
+    for candidate in CANDIDATES
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start(tmp_path, name, shard_servers=()):
+    """Run the real app with the stub encoder in a process of its own."""
+    state = tmp_path / name
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join([ROOT, *(p for p in sys.path if p)]),
+        STORE_PATH=str(state / "store"),
+        SNAPSHOT_PATH="",
+        SCORE_CACHE_PATH="",
+        LITE_INDEX_PATH=str(state / "lite_index.npz"),
+        RESULT_CACHE_TTL_MS="0",
+        SHARD_PROCESSES="0",
+        SHARD_SERVERS=",".join(shard_servers),
+    )
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(TESTS, "stub_encoder.py"), str(port)], cwd=ROOT, env=env
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+def _wait_until_up(process, url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server {url} exited with {process.returncode}")
+        try:
+            if httpx.get(url + "/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Server {url} did not start")
+
+
+@pytest.fixture(scope="module")
+def servers(tmp_path_factory):
+    """Two shard servers, their coordinator and a single server holding everything."""
+    tmp_path = tmp_path_factory.mktemp("servers")
+    shards = [_start(tmp_path, f"shard{i}") for i in range(2)]
+    shard_urls = [url for _, url in shards]
+    running = shards + [_start(tmp_path, "coordinator", shard_urls), _start(tmp_path, "single")]
+    try:
+        for process, url in running:
+            _wait_until_up(process, url)
+        yield shard_urls, running[2][1], running[3][1]
+    finally:
+        for process, _ in running:
+            process.terminate()
+        for process, _ in running:
+            process.wait(timeout=30)
+
+
+@pytest.fixture(scope="module")
+def stored(servers):
+    shard_urls, coordinator, single = servers
+    for url in (coordinator, single):
+        assert httpx.put(f"{url}/jobs/{JOB['id']}", json=JOB, timeout=30).status_code == 200
+        for candidate in POOL:
+            response = httpx.put(f"{url}/candidates/{candidate['id']}", json=candidate, timeout=30)
+            assert response.json() == {"candidate_id": candidate["id"], "stored": True}
+    return servers
+
+
+def test_candidates_are_stored_on_their_shard(stored):
+    shard_urls, _, _ = stored
+    ids = [c["id"] for c in POOL]
+    for shard, url in enumerate(shard_urls):
+        matrix = httpx.post(
+            f"{url}/match-matrix/", json={"job_ids": [JOB["id"]], "candidate_ids": ids}
+        ).json()
+        assert matrix["missing_jobs"] == []
+        assert matrix["missing_candidates"] == [c for c in ids if shard_for(c, 2) != shard]
+    assert {shard_for(c, 2) for c in ids} == {0, 1}
+
+
+def test_top_candidates_match_a_single_server(stored):
+    _, coordinator, single = stored
+    path = f"/jobs/{JOB['id']}/top-candidates/"
+    merged = httpx.get(coordinator + path, params={"top_k": 6}).json()
+    expected = httpx.get(single + path, params={"top_k": 6}).json()
+
+    assert merged["shards"] == {"answered": 2, "failed": [], "partial": False}
+    assert merged["total_candidates"] == expected["total_candidates"] == len(POOL)
+    assert [m["rank"] for m in merged["matches"]] == [1, 2, 3, 4, 5, 6]
+    # Copies of a candidate tie and may be ordered differently; the cut
+    # after six falls between two groups of copies
+    assert [m["match_score"] for m in merged["matches"]] == [
+        m["match_score"] for m in expected["matches"]
+    ]
+    assert sorted((m["candidate_id"], m["match_score"]) for m in merged["matches"]) == sorted(
+        (m["candidate_id"], m["match_score"]) for m in expected["matches"]
+    )
+
+
+def test_match_matrix_matches_a_single_server(stored):
+    _, coordinator, single = stored
+    body = {
+        "job_ids": [JOB["id"], "unknown"],
+        "candidate_ids": [c["id"] for c in reversed(POOL)] + ["missing"],
+    }
+    merged = httpx.post(coordinator + "/match-matrix/", json=body).json()
+    expected = httpx.post(single + "/match-matrix/", json=body).json()
+
+    assert merged["candidate_ids"] == body["candidate_ids"]
+    assert merged["scores"] == expected["scores"]
+    assert merged["missing_jobs"] == ["unknown"]
+    assert merged["missing_candidates"] == ["missing"]
+    assert merged["shards"]["partial"] is False
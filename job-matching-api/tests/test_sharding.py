@@ -0,0 +1,64 @@
+import copy
+import sqlite3
+
+import pytest
+
+import stub_encoder
+from app import sharding
+from app.matcher import JobCandidateMatchingSystem
+from app.sharding import ShardedScorer
+from test_matcher import CANDIDATES, JOB
+
+# Enough candidates for every shard of two workers to get some
+POOL = [
+    dict(copy.deepcopy(candidate), id=f"{candidate['id']}-{n}")
+    for n in range(3)
+    for candidate in CANDIDATES
+]
+
+
+@pytest.fixture
+def scorer(monkeypatch, tmp_path):
+    # Workers are spawned, so they load the stub through the pool initializer
+    monkeypatch.setattr(sharding, "_init_worker", stub_encoder.init_worker)
+    matcher = JobCandidateMatchingSystem(
+        model_name="stub",
+        lite_path=None,
+        score_cache_path=str(tmp_path / "pair_scores.sqlite3"),
+        store_path=None,
+    )
+    scorer = ShardedScorer(matcher, processes=2, min_candidates=1, cache_size=1000)
+    scorer.start()
+    yield scorer
+    scorer.close()
+
+
+def _skills_as_sets(results):
+    # Matching skills come from a set, ordered by each process's hash seed
+    for _, match_result in results:
+        match_result["matching_skills"] = set(match_result["matching_skills"])
+    return results
+
+
+def test_sharded_scores_match_in_process_scores(scorer):
+    sharded = scorer.score(JOB, POOL, batch_size=2, include_skills=True, weights={"tech_stack": 0.5})
+
+    matcher = JobCandidateMatchingSystem(model_name="stub", lite_path=None, store_path=None)
+    prepared_job = matcher.prepare_job(JOB, weights={"tech_stack": 0.5})
+    expected = matcher.score_batch(prepared_job, POOL, include_skills=True)
+    assert _skills_as_sets(sharded) == _skills_as_sets(expected)
+
+
+def test_parent_stores_the_pair_scores_of_workers(scorer):
+    first = scorer.score(JOB, POOL, batch_size=2)
+    path = scorer.matcher.score_cache_path
+    with sqlite3.connect(path) as db:
+        stored = db.execute("SELECT candidate_id FROM pair_scores").fetchall()
+    assert sorted(row[0] for row in stored) == sorted(c["id"] for c in POOL)
+
+    # The second batch is answered from the cache the workers read
+    prepared_job = scorer.matcher.prepare_job(JOB)
+    cached = scorer.matcher.score_batch(prepared_job, POOL)
+    assert cached == first
+    assert scorer.matcher.score_cache.stats()["hits"] == len(POOL)
+    assert scorer.score(JOB, POOL, batch_size=2) == first
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight, canonical_key
+
+
+def test_canonical_key_ignores_dict_order():
+    assert canonical_key("a", {"x": 1, "y": [1, 2]}) == canonical_key("a", {"y": [1, 2], "x": 1})
+    assert canonical_key("a", {"x": 1}) != canonical_key("b", {"x": 1})
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        results = await asyncio.gather(*(flight.run("k", compute) for _ in range(5)))
+        # Served from the cache afterwards
+        results.append(await flight.run("k", compute))
+        return results
+
+    assert asyncio.run(main()) == ["result"] * 6
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 4, 1)
+
+
+def test_failures_are_shared_but_not_cached():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(*(flight.run("k", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flight.run("k", fail)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+    assert flight.stats()["entries"] == 0
+
+
+def test_clear_and_zero_ttl():
+    async def main(flight):
+        counter = []
+
+        async def compute():
+            counter.append(1)
+            return len(counter)
+
+        first = await flight.run("k", compute)
+        flight.clear()
+        return first, await flight.run("k", compute)
+
+    assert asyncio.run(main(SingleFlight(ttl=60))) == (1, 2)
+    assert asyncio.run(main(SingleFlight(ttl=0))) == (1, 2)
+
+
+def test_cache_is_bounded():
+    flight = SingleFlight(ttl=60, max_entries=2)
+
+    async def main():
+        for key in "abc":
+            await flight.run(key, lambda key=key: asyncio.sleep(0, key))
+
+    asyncio.run(main())
+    assert flight.stats()["entries"] == 2
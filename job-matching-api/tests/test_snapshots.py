@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from app.features import extract_candidate_features
+from app.snapshots import (
+    SNAPSHOTS_KEPT,
+    current_version,
+    list_snapshots,
+    load_snapshot,
+    publish_snapshot,
+)
+from app.stores import SectionStore
+
+
+def _store(ids):
+    store = SectionStore(("skills",), 8)
+    store.put_many(
+        ids,
+        [extract_candidate_features({"technicalSkills": ["Python"]}) for _ in ids],
+        [{"skills": np.ones(8)} for _ in ids],
+    )
+    return store
+
+
+def test_publish_and_load(tmp_path):
+    root = str(tmp_path)
+    assert current_version(root) is None
+    assert load_snapshot(root) is None
+
+    version = publish_snapshot(root, {"candidates": _store(["a", "b"])}, {"model_name": "m"})
+    assert current_version(root) == version
+    assert list_snapshots(root) == [version]
+
+    metadata, stores = load_snapshot(root)
+    assert metadata["version"] == version
+    assert metadata["model_name"] == "m"
+    assert sorted(stores["candidates"].ids) == ["a", "b"]
+    # No temporary directories are left behind
+    assert sorted(os.listdir(root)) == sorted(["CURRENT", version])
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    root = str(tmp_path)
+    versions = [publish_snapshot(root, {"candidates": _store([str(i)])}) for i in range(SNAPSHOTS_KEPT + 2)]
+    assert current_version(root) == versions[-1]
+    assert len(list_snapshots(root)) == SNAPSHOTS_KEPT
+    assert versions[-1] in list_snapshots(root)
+
+    _, stores = load_snapshot(root, list_snapshots(root)[-1])
+    assert len(stores["candidates"]) == 1
+
+
+@pytest.mark.parametrize("version", ["..", "../other", "a/b"])
+def test_versions_outside_the_root_are_rejected(tmp_path, version):
+    with pytest.raises(ValueError):
+        load_snapshot(str(tmp_path), version)
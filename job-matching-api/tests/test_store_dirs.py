@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from app.matcher import JobCandidateMatchingSystem, remove_stale_store_dirs
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_stale_store_dirs_are_removed(tmp_path):
+    root = str(tmp_path)
+    dead = f"{_exited_pid()}-1"
+    own = f"{os.getpid()}-3"
+    alive = f"{os.getppid()}-2"
+    for name in (dead, own, alive, "snapshots", "notes-1"):
+        os.makedirs(os.path.join(root, name, "candidates"))
+
+    assert sorted(remove_stale_store_dirs(root)) == sorted([dead, own])
+    assert sorted(os.listdir(root)) == sorted([alive, "notes-1", "snapshots"])
+    assert remove_stale_store_dirs(os.path.join(root, "missing")) == []
+
+
+def test_matcher_cleans_up_on_start_and_retire(tmp_path):
+    root = str(tmp_path)
+    os.makedirs(os.path.join(root, f"{_exited_pid()}-1"))
+
+    matcher = JobCandidateMatchingSystem(model_name="stub", lite_path=None, store_path=root)
+    matcher.store_candidates([{"id": "c1", "technicalSkills": ["Python"]}])
+    assert os.listdir(root) == [os.path.basename(matcher.active.store_dir)]
+
+    matcher.active.retire()
+    assert os.listdir(root) == []
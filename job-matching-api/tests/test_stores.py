@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from app.features import extract_candidate_features, facet_filter
+from app.stores import QUANTIZATIONS, SectionStore
+
+SECTIONS = ("skills", "experience")
+DIM = 16
+
+
+def _profiles(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ids = [f"c{i}" for i in range(n)]
+    features = [
+        extract_candidate_features({"technicalSkills": ["Python"] if i % 2 else ["Go", "SQL"]})
+        for i in range(n)
+    ]
+    vectors = [
+        {"skills": rng.standard_normal(DIM), "experience": None if i % 5 == 0 else rng.standard_normal(DIM)}
+        for i in range(n)
+    ]
+    meta = [{"facets": {"location": ("lahore",) if i % 3 == 0 else ("berlin",)}} for i in range(n)]
+    return ids, features, vectors, meta
+
+
+def _exact_scores(vectors, query):
+    scores = []
+    for profile in vectors:
+        score = 0.0
+        for section, vector in profile.items():
+            if vector is not None:
+                score += float(vector @ query[section] / np.linalg.norm(vector))
+        scores.append(score)
+    return np.array(scores)
+
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_scan_approximates_exact_scores(quantization):
+    store = SectionStore(SECTIONS, DIM, quantization)
+    ids, features, vectors, meta = _profiles(200)
+    assert store.put_many(ids, features, vectors, meta) == 200
+
+    rng = np.random.default_rng(1)
+    query = {section: rng.standard_normal(DIM).astype(np.float32) for section in SECTIONS}
+    exact = _exact_scores(vectors, query)
+    scanned = store.scan(query, 10)
+    assert len(scanned) == 10
+    for row, score in scanned:
+        assert score == pytest.approx(exact[row], abs=0.05 if quantization == "int8" else 1e-2)
+    # The exact best profile is found by the scan
+    assert int(np.argmax(exact)) in {row for row, _ in scanned}
+
+
+def test_replace_remove_and_entries():
+    store = SectionStore(SECTIONS, DIM)
+    ids, features, vectors, meta = _profiles(5)
+    store.put_many(ids, features, vectors, meta)
+    assert len(store) == 5
+
+    # Replacing keeps the row; replace=False leaves stored profiles alone
+    store.put_many(["c1"], [features[0]], [vectors[0]], [meta[0]])
+    assert store.row("c1") == 1
+    assert store.entry(1)[1] is features[0]
+    assert store.put_many(["c1", "c9"], features[:2], vectors[:2], meta[:2], replace=False) == 1
+
+    assert store.remove("c2")
+    assert not store.remove("c2")
+    assert "c2" not in store
+    assert 2 not in {row for row, _ in store.scan({"skills": np.ones(DIM)}, 10)}
+    entry = store.entry(0)
+    assert entry[0] == "c0"
+    assert entry[3]["experience"] is None
+    assert np.linalg.norm(entry[3]["skills"]) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_filter_rows_follow_puts_and_removes():
+    store = SectionStore(SECTIONS, DIM)
+    ids, features, vectors, meta = _profiles(12)
+    store.put_many(ids, features, vectors, meta)
+
+    lahore = facet_filter(location=["lahore"])
+    assert np.flatnonzero(store.filter_rows(lahore)).tolist() == [0, 3, 6, 9]
+    both = facet_filter(location=["lahore"], skills=["python"])
+    assert np.flatnonzero(store.filter_rows(both)).tolist() == [3, 9]
+
+    store.put_many(["c3"], [features[3]], [vectors[3]], [{"facets": {"location": ("oslo",)}}])
+    store.remove("c9")
+    assert np.flatnonzero(store.filter_rows(lahore)).tolist() == [0, 6]
+    mask = store.filter_rows(both)
+    assert store.scan({"skills": np.ones(DIM)}, 5, mask) == []
+
+
+@pytest.mark.parametrize("quantization", QUANTIZATIONS)
+def test_export_and_open_round_trip(tmp_path, quantization):
+    store = SectionStore(SECTIONS, DIM, quantization)
+    ids, features, vectors, meta = _profiles(30)
+    store.put_many(ids, features, vectors, meta)
+    store.remove("c4")
+    store.export(str(tmp_path / "store"))
+
+    opened = SectionStore.open(str(tmp_path / "store"))
+    assert len(opened) == 29
+    query = {"skills": np.ones(DIM, dtype=np.float32)}
+    assert opened.scan(query, 5) == store.scan(query, 5)
+    assert opened.entry(3)[1].skill_names == features[3].skill_names
+    lahore = facet_filter(location=["lahore"], skills=["python"])
+    assert (opened.filter_rows(lahore) == store.filter_rows(lahore)).all()
+
+    # Writes to an opened store do not touch the exported files
+    opened.put_many(["new"], features[:1], vectors[:1], meta[:1])
+    opened.remove("c0")
+    reopened = SectionStore.open(str(tmp_path / "store"))
+    assert "c0" in reopened
+    assert "new" not in reopened
+
+
+def test_export_empty_store(tmp_path):
+    SectionStore(SECTIONS, DIM).export(str(tmp_path / "store"))
+    opened = SectionStore.open(str(tmp_path / "store"))
+    assert len(opened) == 0
+    ids, features, vectors, meta = _profiles(3)
+    opened.put_many(ids, features, vectors, meta)
+    assert len(opened.scan({"skills": np.ones(DIM)}, 5)) == 3
@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+from app import streaming
+from app.streaming import UploadFormatError, iter_batch_upload, iter_ndjson, iter_ndjson_upload
+
+
+def _chunks(data, size):
+    async def chunks():
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    return chunks()
+
+
+def _collect(records):
+    async def collect():
+        return [record async for record in records]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 3, 64, 10_000])
+def test_batch_upload_across_chunk_sizes(size):
+    body = {
+        "job": {"title": "Engineer", "salary": 1234.5},
+        "extra": [1, {"nested": "x"}],
+        "candidates": [{"id": i, "name": f"Ünïcode {i}", "score": -12e3} for i in range(5)],
+    }
+    records = _collect(iter_batch_upload(_chunks(json.dumps(body).encode(), size)))
+    assert records[0] == ("job", body["job"])
+    assert records[1:] == [("candidate", c) for c in body["candidates"]]
+
+
+def test_batch_upload_needs_job_first():
+    body = b'{"candidates": [], "job": {}}'
+    with pytest.raises(UploadFormatError):
+        _collect(iter_batch_upload(_chunks(body, 4)))
+
+
+def test_batch_upload_reports_truncation():
+    body = b'{"job": {}, "candidates": [{"id": 1}, {"id": '
+    with pytest.raises(UploadFormatError, match="Truncated"):
+        _collect(iter_batch_upload(_chunks(body, 4)))
+
+
+def test_syntax_error_is_raised_without_reading_the_rest():
+    read = []
+
+    async def chunks():
+        yield b'{"job": {}, "candidates": [{"id": 1 "name": "x"}, '
+        for i in range(1000):
+            read.append(i)
+            yield b'{"id": 2}, '
+
+    with pytest.raises(UploadFormatError, match="Invalid JSON"):
+        _collect(iter_batch_upload(chunks()))
+    assert len(read) <= 1
+
+
+def test_oversized_value_is_rejected(monkeypatch):
+    monkeypatch.setattr(streaming, "MAX_RECORD_CHARS", 100)
+    body = json.dumps({"job": {}, "candidates": [{"summary": "x" * 500}]}).encode()
+    with pytest.raises(UploadFormatError, match="at most 100"):
+        _collect(iter_batch_upload(_chunks(body, 16)))
+
+
+def test_ndjson_lines_across_chunks():
+    lines = [{"id": i, "text": "a" * i} for i in range(20)]
+    body = ("\n".join(json.dumps(line) for line in lines) + "\n\n").encode()
+    assert _collect(iter_ndjson(_chunks(body, 7))) == lines
+    # The last line needs no trailing newline
+    assert _collect(iter_ndjson(_chunks(body.rstrip(), 5))) == lines
+
+
+def test_ndjson_oversized_line_is_rejected(monkeypatch):
+    monkeypatch.setattr(streaming, "MAX_RECORD_CHARS", 100)
+    body = json.dumps({"text": "x" * 500}).encode()
+    with pytest.raises(UploadFormatError):
+        _collect(iter_ndjson(_chunks(body, 16)))
+
+
+def test_ndjson_upload_starts_with_job():
+    body = b'{"job": {"title": "x"}}\n{"id": 1}\n'
+    assert _collect(iter_ndjson_upload(_chunks(body, 5))) == [
+        ("job", {"title": "x"}),
+        ("candidate", {"id": 1}),
+    ]
+    with pytest.raises(UploadFormatError):
+        _collect(iter_ndjson_upload(_chunks(b'{"id": 1}\n', 5)))
+
+
+def test_batch_upload_yields_weights_before_candidates():
+    body = {"job": {"title": "x"}, "weights": {"tech_stack": 1.0}, "candidates": [{"id": 1}]}
+    records = _collect(iter_batch_upload(_chunks(json.dumps(body).encode(), 4)))
+    assert records == [
+        ("job", {"title": "x"}),
+        ("weights", {"tech_stack": 1.0}),
+        ("candidate", {"id": 1}),
+    ]
+
+    ndjson = b'{"job": {"title": "x"}, "weights": {"tech_stack": 1.0}}\n{"id": 1}\n'
+    assert _collect(iter_ndjson_upload(_chunks(ndjson, 5))) == records
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"job": {"title": "a"}, "candidates": [], "job": {"title": "b"}}',
+        b'{"job": {}, "weights": {}, "weights": {}}',
+        b'{"job": {}, "candidates": [{"id": 1}], "weights": {"tech_stack": 1}}',
+    ],
+)
+def test_batch_upload_rejects_duplicate_or_late_keys(body):
+    with pytest.raises(UploadFormatError):
+        _collect(iter_batch_upload(_chunks(body, 8)))
+
+
+def test_ndjson_skip_invalid_lines(monkeypatch):
+    monkeypatch.setattr(streaming, "MAX_RECORD_CHARS", 100)
+    body = b'{"id": 1}\n{"id": 2,\n' + json.dumps({"text": "x" * 500}).encode() + b'\n{"id": 3}\n{"id"'
+    for size in (3, 16, len(body)):
+        records = _collect(iter_ndjson(_chunks(body, size), skip_invalid=True))
+        assert records[0] == {"id": 1} and records[3] == {"id": 3}
+        assert [type(r).__name__ for r in records] == [
+            "dict", "InvalidRecord", "InvalidRecord", "dict", "InvalidRecord"
+        ]
+        assert records[1].error.startswith("Invalid JSON")
+        assert records[2].error == "Records may be at most 100 characters"
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+JOB = {
+    "title": "Backend Engineer",
+    "description": {"required_skills": ["Python", "FastAPI"], "position_summary": "Build APIs"},
+    "technical_skills": {"Languages": ["Python", "Go"]},
+}
+CANDIDATES = [
+    {"id": "c1", "technicalSkills": ["Python", "FastAPI"], "summary": "Backend developer"},
+    {"id": "c2", "technicalSkills": ["Go"], "educations": [{"degree": "BS", "field": "CS"}]},
+]
+WEIGHTS = {"tech_stack": 1.0, "required_skills": 0.0}
+
+
+def _scores(matches):
+    return {m["candidate"]["id"]: (m["match_score"], m["category_scores"]) for m in matches}
+
+
+def _upload(client, body, **kwargs):
+    response = client.post("/batch-match/upload/", content=body, **kwargs)
+    assert response.status_code == 200, response.text
+    return _scores(json.loads(line) for line in response.text.splitlines())
+
+
+def test_upload_honours_weights_like_batch_match(client):
+    expected = client.post(
+        "/batch-match/", json={"job": JOB, "candidates": CANDIDATES, "weights": WEIGHTS}
+    ).json()["matches"]
+    unweighted = client.post("/batch-match/", json={"job": JOB, "candidates": CANDIDATES}).json()
+    assert _scores(expected) != _scores(unweighted["matches"])
+
+    body = json.dumps({"job": JOB, "weights": WEIGHTS, "candidates": CANDIDATES})
+    assert _upload(client, body) == _scores(expected)
+
+    ndjson = "\n".join(
+        json.dumps(record) for record in [{"job": JOB, "weights": WEIGHTS}, *CANDIDATES]
+    )
+    assert _upload(client, ndjson, headers={"Content-Type": "application/x-ndjson"}) == _scores(
+        expected
+    )
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"job": JOB, "candidates": CANDIDATES[:1], "job ": None},
+        {"job": JOB, "weights": {"unknown": 1.0}, "candidates": CANDIDATES},
+        {"job": JOB, "weights": "heavy", "candidates": CANDIDATES},
+    ],
+)
+def test_upload_rejects_bad_bodies(client, body):
+    text = json.dumps(body).replace('"job ": null', '"job": ' + json.dumps(JOB))
+    response = client.post("/batch-match/upload/", content=text)
+    assert response.status_code == 400